@@ -0,0 +1,6 @@
+"""
+性能基准测试脚本
+
+在项目根目录下以模块方式运行，例如：
+    python -m benchmarks.async_load
+"""
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+异步对话接口压测：对比线程池同步chat与单事件循环achat的吞吐量
+
+运行：
+    python -m benchmarks.async_load --users 200 --turns 3 --threads 32
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_openai_server import start_server
+
+
+def run_threaded(agents, turns: int, threads: int) -> float:
+    """线程池方式执行同步chat，返回耗时"""
+    def converse(agent):
+        for i in range(turns):
+            agent.chat(f"第{i}轮消息")
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(converse, agents))
+    return time.perf_counter() - start
+
+
+async def run_async(agents, turns: int) -> float:
+    """单事件循环并发执行achat，返回耗时"""
+    async def converse(agent):
+        for i in range(turns):
+            await agent.achat(f"第{i}轮消息")
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(converse(agent) for agent in agents))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="achat与线程池chat的吞吐量对比")
+    parser.add_argument("--users", type=int, default=200, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=3, help="每个会话的轮数")
+    parser.add_argument("--threads", type=int, default=32, help="同步方式的线程数")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟服务延迟（秒）")
+    args = parser.parse_args()
+    
+    server = start_server(latency=args.latency)
+    os.environ["API_KEY"] = "fake-key"
+    os.environ["BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    
+    from src.agents import SimpleAgent
+    
+    total = args.users * args.turns
+    
+    sync_agents = [SimpleAgent(f"user_{i}") for i in range(args.users)]
+    sync_elapsed = run_threaded(sync_agents, args.turns, args.threads)
+    
+    async_agents = [SimpleAgent(f"user_{i}") for i in range(args.users)]
+    async_elapsed = asyncio.run(run_async(async_agents, args.turns))
+    
+    print(f"会话数: {args.users}, 每会话轮数: {args.turns}, 模拟延迟: {args.latency}s")
+    print(f"同步chat ({args.threads}线程): {sync_elapsed:.2f}s, {total / sync_elapsed:.1f} 轮/秒")
+    print(f"异步achat (单事件循环): {async_elapsed:.2f}s, {total / async_elapsed:.1f} 轮/秒")
+    print(f"吞吐量提升: {sync_elapsed / async_elapsed:.1f}x")
+    
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+批量提取与逐轮提取的调用次数和提取质量对比
+
+模拟一段多轮对话（按--turns循环），分别按逐轮（N=1）和每N轮一批的方式提取，
+统计每百轮对话的LLM提取调用次数和提示词token数（不发起网络请求，token数使用count_tokens估算），
+门控与MemoryAgent中的用法相同：逐轮时跳过门控判断不含画像信息的轮次，批量时整批都被跳过才不调用。
+
+加--live时使用配置中的LLM实际提取，对比两种方式的提取质量：
+召回为预期信息的关键词出现在提取结果中的比例，归属正确率为关键词出现在对应轮次结果中的比例。
+示例对话中有依赖上下文的轮次（如“跑步，每周三次”回答上一轮的提问、“搬到上海了”更正上一轮），
+逐轮提取时只能看到一问一答。
+
+运行：
+    python -m benchmarks.batched_extraction --turns 100 --batch-turns 1 5 10
+    python -m benchmarks.batched_extraction --live --batch-turns 1 5
+"""
+
+import argparse
+import json
+import os
+from types import SimpleNamespace
+
+# (用户输入, 助手回复, 预期提取信息的关键词)
+SESSION = [
+    ("你好", "你好！有什么可以帮你的？", None),
+    ("我最近迷上了一项运动", "听起来不错！是什么运动呢？", None),
+    ("跑步，每周三次", "很棒的习惯，坚持下去对身体很好。", "跑步"),
+    ("有什么跑鞋推荐吗？", "可以看看缓震型的跑鞋，比如……", None),
+    ("好的谢谢", "不客气！", None),
+    ("我住在北京", "北京的秋天很适合跑步。", "北京"),
+    ("哦不对，上个月刚搬到上海了", "上海也有很多不错的跑步路线，比如滨江步道。", "上海"),
+    ("滨江步道多长？", "徐汇滨江大约有十公里左右。", None),
+    ("我女儿今年三岁了", "这个年纪的孩子很可爱。", "女儿"),
+    ("她最喜欢恐龙", "可以带她去自然博物馆看看恐龙化石。", "恐龙"),
+    ("周末有什么亲子活动？", "可以去公园或者科技馆……", None),
+    ("嗯嗯", "还有其他问题吗？", None),
+    ("我不喝咖啡，只喝茶", "好的，记住了，推荐你试试龙井。", "茶"),
+    ("今天天气怎么样？", "今天上海多云，适合户外活动。", None),
+    ("我打算明年跑一个半马", "很好的目标！可以制定一个循序渐进的训练计划。", "半马"),
+    ("帮我制定一个训练计划", "第一阶段每周跑三次，每次五公里……", None),
+    ("我在一家互联网公司做后端开发", "工作忙的话可以安排早上跑步。", "后端"),
+    ("明白了", "加油！", None),
+    ("对了，我对花生过敏", "好的，之后推荐食物时会注意避开花生。", "花生"),
+    ("晚安", "晚安，好梦！", None)
+]
+
+
+def make_turns(count: int) -> list:
+    """按需要的轮数循环示例对话"""
+    return [
+        {"user_input": SESSION[i % len(SESSION)][0], "assistant_response": SESSION[i % len(SESSION)][1],
+         "timestamp": "", "expected": SESSION[i % len(SESSION)][2]}
+        for i in range(count)
+    ]
+
+
+def plan_calls(turns: list, batch_turns: int, gate, agent) -> list:
+    """
+    按MemoryAgent的规则划分批次，返回需要调用LLM的(批次, 提示词)列表
+    """
+    from src.agents.memory_agent import MemoryAgent
+    from src.memory.extraction_batcher import ExtractionBatcher
+    
+    sizes = []
+    batcher = ExtractionBatcher(lambda batch: sizes.append(len(batch)), batch_turns=max(batch_turns, 1))
+    for turn in turns:
+        batch = batcher.add(turn["user_input"], turn["assistant_response"])
+        if batch:
+            sizes.append(len(batch))
+    # 会话结束时提取未满的批次
+    batcher.flush(trigger="close")
+    
+    # 批次中的轮次换回带预期信息的原始轮次
+    batches = []
+    start = 0
+    for size in sizes:
+        batches.append(turns[start:start + size])
+        start += size
+    
+    calls = []
+    for batch in batches:
+        if gate is not None and not any([gate.check(t["user_input"], t["assistant_response"]) for t in batch]):
+            continue
+        if batch_turns <= 1:
+            prompt = MemoryAgent._extraction_prompt(agent, batch[0]["user_input"], batch[0]["assistant_response"])
+        else:
+            prompt = MemoryAgent._batch_extraction_prompt(agent, batch)
+        calls.append((batch, prompt))
+    return calls
+
+
+def evaluate(turns: list, calls: list, extractor, batch_turns: int) -> dict:
+    """实际调用LLM提取，返回召回和归属正确率"""
+    from src.memory.structured_extraction import split_batch_result
+    
+    infos = {}
+    for batch, prompt in calls:
+        try:
+            data = extractor.extract(prompt)
+        except ValueError:
+            continue
+        results = split_batch_result(data, len(batch)) if batch_turns > 1 else [data]
+        for turn, info in zip(batch, results):
+            infos[id(turn)] = info
+    
+    expected = [turn for turn in turns if turn["expected"]]
+    everything = json.dumps(list(infos.values()), ensure_ascii=False)
+    found = sum(1 for turn in expected if turn["expected"] in everything)
+    attributed = sum(
+        1 for turn in expected
+        if turn["expected"] in json.dumps(infos.get(id(turn), {}), ensure_ascii=False)
+    )
+    return {
+        "recall": found / len(expected) if expected else 1.0,
+        "attribution": attributed / len(expected) if expected else 1.0,
+        "stats": extractor.get_stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量提取的每百轮调用次数与提取质量")
+    parser.add_argument("--turns", type=int, default=100, help="模拟的对话轮数")
+    parser.add_argument("--batch-turns", type=int, nargs="+", default=[1, 5, 10], help="每批轮数，1为逐轮提取")
+    parser.add_argument("--no-gate", action="store_true", help="不使用提取门控")
+    parser.add_argument("--live", action="store_true", help="使用配置中的LLM实际提取并评估质量")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from src.memory.context_window import count_tokens
+    from src.memory.extraction_gate import ExtractionGate
+    from src.prompts import PromptManager
+    
+    agent = SimpleNamespace(prompt_manager=PromptManager(), user_name="chenkx")
+    turns = make_turns(args.turns)
+    scale = 100 / len(turns)
+    
+    llm = None
+    if args.live:
+        from langchain_openai import ChatOpenAI
+        from src.config import config
+        llm = ChatOpenAI(api_key=config.api_key, base_url=config.base_url, **config.llm_config)
+    
+    print(f"对话 {len(turns)} 轮，门控{'关闭' if args.no_gate else '开启'}")
+    for batch_turns in args.batch_turns:
+        gate = None if args.no_gate else ExtractionGate()
+        calls = plan_calls(turns, batch_turns, gate, agent)
+        tokens = sum(count_tokens(prompt) for _, prompt in calls)
+        # 含预期信息的轮次中，进入了LLM调用的比例（被门控跳过的轮次不可能被提取）
+        covered = {id(turn) for batch, _ in calls for turn in batch}
+        expected = [turn for turn in turns if turn["expected"]]
+        coverage = sum(1 for turn in expected if id(turn) in covered) / len(expected) if expected else 1.0
+        name = "逐轮" if batch_turns <= 1 else f"每{batch_turns}轮"
+        print(f"[{name}] 每百轮 {len(calls) * scale:.1f} 次调用，提示词约 {tokens * scale:.0f} tokens，"
+              f"含信息的轮次送入提取 {coverage:.1%}")
+        
+        if llm is not None:
+            from src.memory.structured_extraction import StructuredExtractor, build_batch_tool
+            extractor = StructuredExtractor(llm, tool=build_batch_tool() if batch_turns > 1 else None)
+            result = evaluate(turns, calls, extractor, batch_turns)
+            print(f"  召回 {result['recall']:.1%}，归属正确 {result['attribution']:.1%}，"
+                  f"浪费调用 {result['stats']['wasted_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
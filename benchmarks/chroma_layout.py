@@ -0,0 +1,131 @@
+"""
+长期记忆存储布局基准测试：per_user与shared布局在大量用户下的打开耗时和内存占用
+
+先为每个用户写入少量记忆，再在独立子进程中为所有用户打开LongTermMemory
+并各检索一次，统计打开耗时、首次检索耗时和进程RSS增量。
+向量由本地伪嵌入生成，不发起网络请求。
+
+运行：
+    python -m benchmarks.chroma_layout --users 1000 --docs 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.fake_openai_server import fake_embedding
+
+
+def current_rss_kb() -> int:
+    """读取当前进程的常驻内存（KB）"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def make_embeddings():
+    """创建本地伪嵌入模型"""
+    from langchain_core.embeddings import Embeddings
+    
+    class FakeEmbeddings(Embeddings):
+        def embed_documents(self, texts: List[str]) -> List[List[float]]:
+            return [fake_embedding(text) for text in texts]
+        
+        def embed_query(self, text: str) -> List[float]:
+            return fake_embedding(text)
+    
+    return FakeEmbeddings()
+
+
+def make_memory(layout: str, user_name: str, root: str, embeddings):
+    """按指定布局创建用户的长期记忆"""
+    from src.memory import LongTermMemory
+    return LongTermMemory(
+        api_key="fake-key",
+        base_url="http://127.0.0.1:1/v1",
+        user_name=user_name,
+        persist_directory_prefix=os.path.join(root, "chroma_db_"),
+        layout=layout,
+        shared_persist_directory=os.path.join(root, "shared"),
+        embeddings=embeddings,
+        retrieval_cache_size=0
+    )
+
+
+def populate(layout: str, users: int, docs: int, root: str) -> None:
+    """为每个用户写入记忆"""
+    embeddings = make_embeddings()
+    for i in range(users):
+        memory = make_memory(layout, f"user{i}", root, embeddings)
+        memory.save_many([
+            {"user_input": f"用户{i}的第{j}条记忆：最近在学习机器学习", "assistant_response": "好的"}
+            for j in range(docs)
+        ])
+
+
+def measure(layout: str, users: int, root: str) -> dict:
+    """在当前进程中打开所有用户的记忆并检索一次"""
+    embeddings = make_embeddings()
+    rss_before = current_rss_kb()
+    start = time.perf_counter()
+    memories = [make_memory(layout, f"user{i}", root, embeddings) for i in range(users)]
+    open_elapsed = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for memory in memories:
+        memory.load("relevant_memories", query="机器学习", k=3)
+    query_elapsed = time.perf_counter() - start
+    
+    return {
+        "open_s": open_elapsed,
+        "query_s": query_elapsed,
+        "rss_mb": (current_rss_kb() - rss_before) / 1024,
+        "open_files": len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else -1
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per_user与shared存储布局对比")
+    parser.add_argument("--users", type=int, default=1000, help="用户数")
+    parser.add_argument("--docs", type=int, default=5, help="每个用户的记忆数")
+    parser.add_argument("--child", choices=["per_user", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    
+    if args.child:
+        print(json.dumps(measure(args.child, args.users, args.root)))
+        return
+    
+    with tempfile.TemporaryDirectory() as root:
+        print(f"用户数: {args.users}, 每用户记忆数: {args.docs}")
+        for layout in ("per_user", "shared"):
+            start = time.perf_counter()
+            populate(layout, args.users, args.docs, root)
+            print(f"[{layout}] 写入耗时: {time.perf_counter() - start:.1f}s")
+            
+            # 在新进程中测量，避免写入阶段的缓存影响打开耗时和内存
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.chroma_layout", "--users", str(args.users),
+                 "--child", layout, "--root", root],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"[{layout}] 打开耗时: {result['open_s']:.2f}s, 首次检索耗时: {result['query_s']:.2f}s, "
+                  f"RSS增量: {result['rss_mb']:.1f}MB, 打开的文件数: {result['open_files']}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
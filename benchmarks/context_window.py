@@ -0,0 +1,78 @@
+"""
+上下文窗口基准测试：500轮会话中每轮提示词token数的变化
+
+对比原先无上限累积历史与ContextWindow按预算裁剪两种方式，
+并统计每轮维护历史所花的Python时间。
+
+运行：
+    python -m benchmarks.context_window --turns 500 --budget 6000
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("API_KEY", "fake-key")
+
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+
+from src.memory import ContextWindow
+from src.memory.context_window import count_message_tokens
+
+SYSTEM_PROMPT = "你是 chenkx 的 AI 个人助手，请使用简洁且专业的回复风格。"
+
+
+def make_turn(rng: random.Random, i: int):
+    """生成一轮长度随机的模拟对话"""
+    user_input = f"第{i}轮：" + "我想聊聊最近的工作和学习计划。" * rng.randint(1, 6)
+    response = f"关于第{i}轮的回复：" + "这是一个很好的问题，我们可以从几个方面来看。" * rng.randint(2, 20)
+    return user_input, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上下文窗口token预算基准测试")
+    parser.add_argument("--turns", type=int, default=500, help="会话轮数")
+    parser.add_argument("--budget", type=int, default=6000, help="上下文token预算")
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    turns = [make_turn(rng, i) for i in range(args.turns)]
+    system = SystemMessage(content=SYSTEM_PROMPT)
+    
+    # 原实现：每轮发送完整历史
+    history = []
+    unbounded = []
+    unbounded_time = 0.0
+    for user_input, response in turns:
+        start = time.perf_counter()
+        human = HumanMessage(content=user_input)
+        messages = [system] + history + [human]
+        unbounded.append(sum(count_message_tokens(m) for m in messages))
+        history.extend([human, AIMessage(content=response)])
+        unbounded_time += time.perf_counter() - start
+    
+    # 按预算裁剪的上下文窗口
+    window = ContextWindow(max_tokens=args.budget)
+    bounded = []
+    bounded_time = 0.0
+    for user_input, response in turns:
+        start = time.perf_counter()
+        human = HumanMessage(content=user_input)
+        reserved = count_message_tokens(system) + count_message_tokens(human)
+        window.fit(reserved)
+        bounded.append(reserved + window.total_tokens)
+        window.add_turn(user_input, response)
+        bounded_time += time.perf_counter() - start
+    
+    print(f"{'轮次':>6} {'完整历史':>10} {'预算窗口':>10}")
+    for i in [0, 9, 49, 99, 199, 299, 399, args.turns - 1]:
+        if i < args.turns:
+            print(f"{i + 1:>6} {unbounded[i]:>10} {bounded[i]:>10}")
+    print(f"累计提示词token：完整历史 {sum(unbounded)}，预算窗口 {sum(bounded)}")
+    print(f"每轮Python开销：完整历史 {unbounded_time / args.turns * 1000:.3f}ms，"
+          f"预算窗口 {bounded_time / args.turns * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+提取门控离线评估
+
+在已标注的对话上评估门控：被跳过的对话即节省的LLM提取调用，
+实际提取出画像信息却被跳过的对话计为召回损失。
+
+数据为JSON Lines文件，每行包含user_input、assistant_response和extracted_info，
+extracted_info非空表示这轮对话含有画像信息。设置EXTRACTION_GATE_LOG后，
+MemoryAgent会把放行对话的提取结果写入该文件，可以直接作为评估数据。
+被跳过的对话没有标注，不参与评估，只有放行的对话时召回恒为100%；
+需同时设置EXTRACTION_GATE_SHADOW_RATE，让门控按比例抽取本应跳过的对话照常提取。
+抽样的对话按1/抽样比例加权，代表所有被跳过的对话。
+未指定数据文件时使用内置的示例对话。
+
+运行：
+    python -m benchmarks.extraction_gate --input extraction_gate.log --tokens-per-call 600
+    python -m benchmarks.extraction_gate --input extraction_gate.log --train extraction_gate.json
+"""
+
+import argparse
+import json
+import os
+import random
+from collections import Counter
+
+SAMPLE_TURNS = [
+    ("谢谢", False), ("好的", False), ("ok", False), ("嗯嗯", False), ("哈哈哈", False),
+    ("thanks!", False), ("明白了", False), ("晚安~", False), ("你好", False), ("在吗？", False),
+    ("今天天气怎么样？", False), ("Python的列表怎么排序？", False), ("帮我写一首关于秋天的诗", False),
+    ("什么是量子计算", False), ("翻译一下：hello world", False), ("推荐几部电影吧", False),
+    ("How do I reverse a string in Python?", False), ("这个方案有什么缺点吗", False),
+    ("继续", False), ("再详细一点", False), ("你是谁？", False), ("给我讲个笑话", False),
+    ("我觉得这个回答不太对", False), ("我再想想", False), ("帮我总结一下上面的内容", False),
+    ("我叫陈凯旋", True), ("我喜欢喝咖啡，不加糖", True), ("我在上海做后端开发", True),
+    ("我对花生过敏", True), ("我女儿今年三岁了", True), ("下个月我打算去日本旅行", True),
+    ("我的生日是5月12日", True), ("我最近在准备考研，目标是计算机专业", True),
+    ("I live in Berlin and work as a designer", True), ("My wife loves hiking", True),
+    ("记住我每周三晚上要健身", True), ("我养了一只叫豆豆的猫", True), ("我刚从字节跳动辞职了", True),
+    ("我老家是湖南长沙的", True), ("我不喜欢吃香菜", True), ("周末我要陪父母去体检", True),
+    ("我每天早上六点起床跑步", True), ("公司下周派我去深圳出差", True), ("我们组今年要上线新的推荐系统", True),
+    ("推荐一些适合初学者的吉他曲", False), ("我该怎么提高英语口语？", False)
+]
+
+
+def load_samples(path: str) -> list:
+    """
+    读取标注数据，返回(user_input, assistant_response, 是否含画像信息, 权重)列表；
+    影子模式抽中的对话（记录时门控判断为跳过）按1/抽样比例加权
+    """
+    samples = []
+    shadowed = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("extracted_info") is None:
+                continue
+            info = record["extracted_info"]
+            positive = any(info.values()) if isinstance(info, dict) else bool(info)
+            weight = 1.0
+            if record.get("extract") is False and record.get("shadow_rate"):
+                weight = 1.0 / record["shadow_rate"]
+                shadowed += 1
+            samples.append((record.get("user_input", ""), record.get("assistant_response", ""), positive, weight))
+    if samples and not shadowed:
+        print("警告: 数据中没有被门控跳过的标注对话，召回无法评估；请设置EXTRACTION_GATE_SHADOW_RATE后重新采集")
+    return samples
+
+
+def evaluate(gate, samples: list, tokens_per_call: int) -> dict:
+    """评估门控，返回按权重统计的召回、跳过率和节省的token"""
+    total = sum(weight for _, _, _, weight in samples)
+    positives = sum(weight for _, _, positive, weight in samples if positive)
+    skipped = 0.0
+    missed_weight = 0.0
+    missed = []
+    false_passes = 0.0
+    reasons = Counter()
+    for user_input, assistant_response, positive, weight in samples:
+        extract, reason, _ = gate.classify(user_input, assistant_response)
+        reasons[reason] += 1
+        if not extract:
+            skipped += weight
+            if positive:
+                missed_weight += weight
+                missed.append(user_input)
+        elif not positive:
+            false_passes += weight
+    passed = total - skipped
+    return {
+        "total": len(samples),
+        "positives": sum(1 for _, _, positive, _ in samples if positive),
+        "skip_rate": skipped / total if total else 0.0,
+        "recall": (positives - missed_weight) / positives if positives else 1.0,
+        "precision": (passed - false_passes) / passed if passed else 1.0,
+        "saved_calls": round(skipped),
+        "saved_tokens": round(skipped * tokens_per_call),
+        "reasons": dict(reasons),
+        "missed": missed
+    }
+
+
+def report(name: str, result: dict) -> None:
+    """打印评估结果"""
+    print(f"[{name}] 对话 {result['total']} 轮，含画像信息 {result['positives']} 轮")
+    print(f"  节省调用: {result['saved_calls']} 次 ({result['skip_rate']:.1%})，约 {result['saved_tokens']} tokens")
+    print(f"  召回: {result['recall']:.1%}（损失 {1 - result['recall']:.1%}），放行精确率: {result['precision']:.1%}")
+    print(f"  判断原因: {result['reasons']}")
+    for user_input in result["missed"][:10]:
+        print(f"  漏提取: {user_input}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提取门控的召回损失与节省的LLM调用")
+    parser.add_argument("--input", help="标注数据（JSON Lines），不指定时使用内置示例")
+    parser.add_argument("--model", help="评估已有的门控模型文件")
+    parser.add_argument("--train", help="训练门控模型并保存到该路径")
+    parser.add_argument("--holdout", type=float, default=0.2, help="训练时留作评估的比例")
+    parser.add_argument("--tokens-per-call", type=int, default=600, help="每次提取调用消耗的token数")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from src.memory.extraction_gate import ExtractionGate, fit_gate_model
+    
+    if args.input:
+        samples = load_samples(args.input)
+    else:
+        samples = [(user_input, "", positive, 1.0) for user_input, positive in SAMPLE_TURNS]
+    if not samples:
+        print("没有可用于评估的标注对话")
+        return
+    
+    report("规则", evaluate(ExtractionGate(), samples, args.tokens_per_call))
+    if args.model:
+        report("规则+模型", evaluate(ExtractionGate(model_path=args.model), samples, args.tokens_per_call))
+    
+    if args.train:
+        shuffled = samples[:]
+        random.Random(0).shuffle(shuffled)
+        split = int(len(shuffled) * (1 - args.holdout))
+        train, test = shuffled[:split], shuffled[split:]
+        gate = ExtractionGate()
+        gate.model = fit_gate_model([text for text, _, _, _ in train], [positive for _, _, positive, _ in train])
+        if test:
+            report("规则（留出集）", evaluate(ExtractionGate(), test, args.tokens_per_call))
+            report("规则+模型（留出集）", evaluate(gate, test, args.tokens_per_call))
+        
+        model = fit_gate_model([text for text, _, _, _ in samples], [positive for _, _, positive, _ in samples])
+        with open(args.train, "w", encoding="utf-8") as f:
+            json.dump(model, f, ensure_ascii=False)
+        print(f"模型已保存到 {args.train}（{len(model['weights'])} 个词项）")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+提取输出解析的浪费调用率
+
+LLM的提取输出经常不是严格的JSON：带markdown代码块、前后有说明文字、尾随逗号、
+单引号的Python字面量，或者因为max_tokens被截断。改动前直接json.loads，失败即整次调用作废；
+改动后先在本地修复，修复不了才算浪费。这里在一组典型输出上对比两种方式的浪费比例和解析耗时。
+
+可以用--input指定JSON Lines文件（每行一个output字段，即LLM的原始输出）评估真实数据。
+
+运行：
+    python -m benchmarks.extraction_parsing
+    python -m benchmarks.extraction_parsing --input extraction_outputs.jsonl
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+CLEAN = '{"basic_info": {"name": "陈凯旋", "city": "上海"}, "preferences": {"likes": ["咖啡"], "dislikes": ["香菜"]}}'
+
+SAMPLE_OUTPUTS = [
+    ("clean", CLEAN),
+    ("clean", '{"habits": ["每天早上六点跑步"], "goals": []}'),
+    ("clean", '{}'),
+    ("fenced", f"```json\n{CLEAN}\n```"),
+    ("fenced", '```\n{"relationships": ["女儿今年三岁"]}\n```'),
+    ("prose", f"根据对话，提取的信息如下：\n{CLEAN}"),
+    ("prose", '{"goals": ["准备考研"]}\n以上是从对话中提取的用户信息。'),
+    ("trailing_comma", '{"preferences": {"likes": ["咖啡", "跑步",], "dislikes": []},}'),
+    ("python_dict", "{'basic_info': {'name': '陈凯旋'}, 'important_dates': {'生日': '5月12日'}}"),
+    ("python_dict", "{'habits': ['健身'], 'goals': None}"),
+    ("truncated", '{"basic_info": {"name": "陈凯旋", "job": "后端开发"}, "preferences": {"likes": ["咖'),
+    ("truncated", '{"habits": ["每周三健身"], "goals": ["减肥'),
+    ("truncated", '{"basic_info": {"city": "上海"}, "relat'),
+    ("garbage", "抱歉，这段对话中没有可以提取的用户信息。"),
+    ("garbage", "")
+]
+
+
+def load_outputs(path: str) -> list:
+    """读取LLM原始输出，返回(类别, 文本)列表"""
+    outputs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                outputs.append((record.get("kind", "input"), record["output"]))
+    return outputs
+
+
+def strict_parse(text: str):
+    """改动前的解析方式"""
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, dict) else None
+    except ValueError:
+        return None
+
+
+def measure(func, outputs: list, repeat: int) -> float:
+    """重复解析全部输出，返回每条输出耗时的中位数（微秒）"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _, text in outputs:
+            func(text)
+        latencies.append((time.perf_counter() - start) / len(outputs))
+    return statistics.median(latencies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="json.loads与本地修复的浪费调用率对比")
+    parser.add_argument("--input", help="LLM原始输出（JSON Lines，output字段），不指定时使用内置示例")
+    parser.add_argument("--repeat", type=int, default=200, help="测量解析耗时的重复次数")
+    args = parser.parse_args()
+    
+    from src.memory.structured_extraction import parse_json_object
+    
+    outputs = load_outputs(args.input) if args.input else SAMPLE_OUTPUTS
+    if not outputs:
+        print("没有可评估的输出")
+        return
+    
+    strict_wasted = Counter()
+    statuses = Counter()
+    for kind, text in outputs:
+        if strict_parse(text) is None:
+            strict_wasted[kind] += 1
+        _, status = parse_json_object(text)
+        statuses[status] += 1
+        if status == "failed":
+            print(f"  修复失败 [{kind}]: {text[:60]!r}")
+    
+    total = len(outputs)
+    print(f"输出 {total} 条")
+    print(f"[改动前 json.loads] 浪费 {sum(strict_wasted.values())} 条 ({sum(strict_wasted.values()) / total:.1%})，按类别: {dict(strict_wasted)}")
+    print(f"[改动后 本地修复] 浪费 {statuses['failed']} 条 ({statuses['failed'] / total:.1%})，直接解析 {statuses['ok']} 条，修复 {statuses['repaired']} 条")
+    
+    strict_us = measure(strict_parse, outputs, args.repeat)
+    repair_us = measure(parse_json_object, outputs, args.repeat)
+    print(f"[解析耗时] json.loads {strict_us:.1f}us/条，本地修复 {repair_us:.1f}us/条（一次LLM调用通常在秒级）")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+本地模拟的OpenAI兼容服务，用于压测和基准测试
+
+支持 /chat/completions（含stream）和 /embeddings 两个接口，
+通过固定延迟模拟网络和推理耗时。
+"""
+
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+EMBEDDING_DIM = 64
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """
+    根据文本哈希生成确定性的伪向量
+    
+    Args:
+        text: 文本
+        dim: 向量维度
+    
+    Returns:
+        伪向量
+    """
+    digest = hashlib.sha256(str(text).encode("utf-8")).digest()
+    return [(digest[i % len(digest)] - 128) / 128.0 for i in range(dim)]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """模拟OpenAI接口的请求处理器"""
+    
+    protocol_version = "HTTP/1.1"
+    latency = 0.2
+    reply = "好的，我知道了。这是一条来自模拟服务的回复。"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        time.sleep(self.latency)
+        
+        if self.path.endswith("/embeddings"):
+            self._send_embeddings(body)
+        elif body.get("stream"):
+            self._send_stream(body)
+        else:
+            self._send_completion(body)
+    
+    def _send_json(self, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _usage(self, body: dict) -> dict:
+        prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(self.reply),
+            "total_tokens": prompt_tokens + len(self.reply)
+        }
+    
+    def _send_completion(self, body: dict) -> None:
+        self._send_json({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop"
+            }],
+            "usage": self._usage(body)
+        })
+    
+    def _send_stream(self, body: dict) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, char in enumerate(self.reply):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": char} if i == 0 else {"content": char},
+                    "finish_reason": None
+                }]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+    
+    def _send_embeddings(self, body: dict) -> None:
+        inputs = body.get("input", [])
+        if not isinstance(inputs, list):
+            inputs = [inputs]
+        self._send_json({
+            "object": "list",
+            "model": body.get("model", "fake"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        })
+
+
+def start_server(latency: float = 0.2, port: int = 0) -> ThreadingHTTPServer:
+    """
+    在后台线程启动模拟服务
+    
+    Args:
+        latency: 每个请求的模拟延迟（秒）
+        port: 端口，0表示自动分配
+    
+    Returns:
+        服务实例，base_url为 http://127.0.0.1:<server.server_port>/v1
+    """
+    handler = type("Handler", (FakeOpenAIHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
\ No newline at end of file
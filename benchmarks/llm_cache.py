@@ -0,0 +1,80 @@
+"""
+LLM响应缓存基准测试
+
+用带固定延迟的FakeListChatModel模拟API，按MemoryAgent的提取提示词回放一段对话三次：
+第一次全部未命中；第二次（同一进程回放会话）命中进程内缓存；
+第三次新建缓存对象、进程内缓存为空，模拟重启后从SQLite缓存命中。
+报告每一遍的命中率、实际发出的调用次数和每次提取的耗时。
+
+运行：
+    python -m benchmarks.llm_cache --turns 50 --latency 0.2
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from benchmarks.batched_extraction import make_turns
+
+
+def replay(extractor, prompts: list) -> float:
+    """依次提取，返回每次提取耗时的平均值（毫秒）"""
+    start = time.perf_counter()
+    for prompt in prompts:
+        extractor.extract(prompt)
+    return (time.perf_counter() - start) / len(prompts) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM响应缓存的命中率与耗时")
+    parser.add_argument("--turns", type=int, default=50, help="回放的对话轮数")
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟的每次调用延迟（秒）")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from langchain_community.chat_models.fake import FakeListChatModel
+    from src.agents.memory_agent import MemoryAgent
+    from src.memory.structured_extraction import StructuredExtractor
+    from src.prompts import PromptManager
+    from src.utils.llm_cache import ResponseCache
+    
+    agent = SimpleNamespace(prompt_manager=PromptManager(), user_name="chenkx")
+    prompts = [
+        MemoryAgent._extraction_prompt(agent, turn["user_input"], turn["assistant_response"])
+        for turn in make_turns(args.turns)
+    ]
+    responses = ['{"interests": ["跑步"]}']
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "llm_cache.sqlite")
+        print(f"提取 {len(prompts)} 轮（其中不同的提示词 {len(set(prompts))} 个），模拟调用延迟 {args.latency * 1000:.0f}ms")
+        
+        baseline = FakeListChatModel(responses=responses, sleep=args.latency)
+        uncached_ms = replay(StructuredExtractor(baseline, mode="text", stream=False), prompts)
+        print(f"[无缓存] 每次提取 {uncached_ms:.1f}ms，调用 {len(prompts)} 次")
+        
+        cache = ResponseCache(cache_size=1024, cache_path=path)
+        llm = FakeListChatModel(responses=responses, sleep=args.latency, cache=cache)
+        extractor = StructuredExtractor(llm, mode="text", stream=False)
+        for name in ("首次运行", "回放会话"):
+            before = cache.get_stats()
+            elapsed = replay(extractor, prompts)
+            stats = cache.get_stats()
+            calls = stats["misses"] - before["misses"]
+            hits = len(prompts) - calls
+            print(f"[{name}] 每次提取 {elapsed:.1f}ms，命中 {hits / len(prompts):.1%}，调用 {calls} 次")
+        cache.close()
+        
+        # 进程内缓存为空，只能从SQLite命中
+        restarted = ResponseCache(cache_size=1024, cache_path=path)
+        llm = FakeListChatModel(responses=responses, sleep=args.latency, cache=restarted)
+        elapsed = replay(StructuredExtractor(llm, mode="text", stream=False), prompts)
+        stats = restarted.get_stats()
+        print(f"[重启后] 每次提取 {elapsed:.1f}ms，命中 {stats['hit_rate']:.1%}"
+              f"（磁盘 {stats['disk_hits']} 次），调用 {stats['misses']} 次，磁盘占用 {stats['disk_bytes']} 字节")
+        restarted.close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+长期记忆写入基准测试：逐条save与save_many批量写入的吞吐量对比
+
+嵌入请求发往本地模拟服务，按固定延迟模拟网络往返。
+
+运行：
+    python -m benchmarks.long_term_insert --docs 200 --latency 0.02
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fake_openai_server import start_server
+
+
+def make_values(count: int, prefix: str):
+    """生成模拟的对话记录"""
+    return [
+        {
+            "user_input": f"{prefix}第{i}条：我最近在学习机器学习，也在准备马拉松比赛。",
+            "assistant_response": "听起来很充实，注意劳逸结合。",
+            "extracted_info": {"interests": ["机器学习", "跑步"]}
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长期记忆逐条写入与批量写入对比")
+    parser.add_argument("--docs", type=int, default=200, help="写入文档数")
+    parser.add_argument("--batch-size", type=int, default=100, help="批量写入时每批文档数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟嵌入请求延迟（秒）")
+    args = parser.parse_args()
+    
+    server = start_server(latency=args.latency)
+    os.environ["API_KEY"] = "fake-key"
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    
+    from src.memory import LongTermMemory
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def make_memory(name):
+            return LongTermMemory(
+                api_key="fake-key",
+                base_url=base_url,
+                user_name=name,
+                persist_directory_prefix=os.path.join(tmpdir, "chroma_db_"),
+                batch_size=args.batch_size
+            )
+        
+        single = make_memory("single")
+        start = time.perf_counter()
+        for value in make_values(args.docs, "single"):
+            single.save("memory", value)
+        single_elapsed = time.perf_counter() - start
+        
+        batched = make_memory("batched")
+        start = time.perf_counter()
+        batched.save_many(make_values(args.docs, "batched"))
+        batched_elapsed = time.perf_counter() - start
+    
+    print(f"文档数: {args.docs}, 每批: {args.batch_size}, 模拟延迟: {args.latency}s")
+    print(f"逐条save: {single_elapsed:.2f}s, {args.docs / single_elapsed:.1f} 条/秒")
+    print(f"批量save_many: {batched_elapsed:.2f}s, {args.docs / batched_elapsed:.1f} 条/秒")
+    print(f"吞吐量提升: {single_elapsed / batched_elapsed:.1f}x")
+    
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
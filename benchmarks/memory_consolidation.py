@@ -0,0 +1,95 @@
+"""
+长期记忆整理基准测试
+
+向NumPy后端写入一批记忆，其中一部分是同一句话反复提起产生的近似重复（主题向量加少量噪声），
+其余为互不相关的记忆，然后运行整理任务，对比整理前后的记忆条数、检索p95延迟和归档大小。
+向量直接写入后端，不调用嵌入接口。
+
+运行：
+    python -m benchmarks.memory_consolidation --size 20000 --duplicate-ratio 0.6 --archive-after-days 180
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记忆整理前后的条数与检索延迟对比")
+    parser.add_argument("--size", type=int, default=20000, help="记忆条数")
+    parser.add_argument("--dim", type=int, default=256, help="向量维度")
+    parser.add_argument("--topics", type=int, default=200, help="被反复提起的主题数")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.6, help="近似重复记忆的占比")
+    parser.add_argument("--noise", type=float, default=0.01, help="重复记忆向量上叠加的噪声幅度")
+    parser.add_argument("--days", type=int, default=365, help="记忆分布的天数")
+    parser.add_argument("--threshold", type=float, default=0.92, help="近似重复的相似度阈值")
+    parser.add_argument("--archive-after-days", type=float, default=0, help="归档超过该天数的低重要性记忆")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入条数")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from datetime import datetime
+    from src.memory.consolidation import MemoryConsolidator
+    from src.memory.long_term import LongTermMemory
+    
+    rng = np.random.default_rng(0)
+    now = time.time()
+    topics = rng.standard_normal((args.topics, args.dim), dtype=np.float32)
+    duplicates = int(args.size * args.duplicate_ratio)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        memory = LongTermMemory(
+            api_key="fake-key",
+            base_url="http://localhost",
+            user_name="bench",
+            persist_directory_prefix=os.path.join(directory, "db_"),
+            backend="numpy",
+            retrieval_cache_size=0
+        )
+        for offset in range(0, args.size, args.batch_size):
+            count = min(args.batch_size, args.size - offset)
+            vectors = rng.standard_normal((count, args.dim), dtype=np.float32)
+            values = []
+            for i in range(count):
+                index = offset + i
+                if index < duplicates:
+                    topic = index % args.topics
+                    vectors[i] = topics[topic] + rng.standard_normal(args.dim, dtype=np.float32) * args.noise * np.sqrt(args.dim) / 10
+                    user_input = f"我喜欢主题{topic}"
+                else:
+                    user_input = f"随口一提{index}"
+                values.append({
+                    "user_input": user_input,
+                    "assistant_response": "好的",
+                    "timestamp": datetime.fromtimestamp(now - rng.uniform(0, args.days * 86400)).isoformat()
+                })
+            docs = [memory._build_document("memory", value) for value in values]
+            memory.replace_documents([], [uuid.uuid4().hex for _ in docs], vectors.tolist(), docs)
+        
+        consolidator = MemoryConsolidator(
+            memory,
+            similarity_threshold=args.threshold,
+            archive_after_days=args.archive_after_days,
+            archive_directory=os.path.join(directory, "archive")
+        )
+        # 压缩后向量文件换成下一代，前后分别读取
+        bytes_before = os.path.getsize(memory.backend.vector_path)
+        report = consolidator.run()
+        bytes_after = os.path.getsize(memory.backend.vector_path)
+        
+        print(f"记忆条数: {args.size}, 维度: {args.dim}, 近似重复占比: {args.duplicate_ratio:.0%}")
+        print(f"记忆条数: {report['size_before']} -> {report['size_after']}")
+        print(f"合并: {report['merged']} 条合并为 {report['clusters']} 条, 归档: {report['archived']} 条 "
+              f"({report['archive_bytes'] / 1024:.1f} KB)")
+        print(f"向量文件: {bytes_before / 1024 / 1024:.1f} MB -> {bytes_after / 1024 / 1024:.1f} MB")
+        print(f"检索p95: {report['p95_ms_before']:.2f}ms -> {report['p95_ms_after']:.2f}ms")
+        print(f"整理耗时: {report['elapsed']:.2f}s")
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+带过滤条件的检索延迟基准测试
+
+向NumPy后端写入分布在一年内的记忆，对比全量检索与按时间范围、类型预过滤后检索的延迟，
+以及混合排序（新鲜度、重要性）本身的开销。
+
+运行：
+    python -m benchmarks.memory_ranking --size 100000 --dim 1536
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def percentile(values, ratio: float) -> float:
+    """返回升序列表中的分位数"""
+    return values[max(int(len(values) * ratio) - 1, 0)]
+
+
+def measure(func, queries: int) -> tuple:
+    """重复执行，返回(p50毫秒, p95毫秒, 最后一次的结果)"""
+    latencies = []
+    result = None
+    for _ in range(queries):
+        start = time.perf_counter()
+        result = func()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, percentile(latencies, 0.95) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预过滤检索与全量检索的延迟对比")
+    parser.add_argument("--size", type=int, default=100000, help="记忆条数")
+    parser.add_argument("--dim", type=int, default=1536, help="向量维度")
+    parser.add_argument("--days", type=int, default=365, help="记忆分布的天数")
+    parser.add_argument("--queries", type=int, default=50, help="每种检索的次数")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入条数")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from langchain.schema import Document
+    from src.memory.numpy_backend import NumpyVectorBackend
+    from src.memory.ranking import MemoryRanker
+    
+    rng = np.random.default_rng(0)
+    now = time.time()
+    with tempfile.TemporaryDirectory() as directory:
+        backend = NumpyVectorBackend(directory)
+        for offset in range(0, args.size, args.batch_size):
+            count = min(args.batch_size, args.size - offset)
+            vectors = rng.standard_normal((count, args.dim), dtype=np.float32)
+            ages = rng.uniform(0, args.days * 86400, count)
+            docs = [
+                Document(
+                    page_content=f"记忆{offset + i}",
+                    metadata={
+                        "user_name": "bench",
+                        "ts": now - float(ages[i]),
+                        "type": "conversation_with_extraction" if i % 5 == 0 else "conversation",
+                        "importance": float(rng.uniform())
+                    }
+                )
+                for i in range(count)
+            ]
+            backend.add([f"doc{offset + i}" for i in range(count)], vectors.tolist(), docs)
+        
+        query = rng.standard_normal(args.dim, dtype=np.float32).tolist()
+        last_week = {"ts": {"$gte": now - 7 * 86400}}
+        cases = [
+            ("全量", None),
+            ("最近7天", last_week),
+            ("类型=提取", {"type": {"$in": ["conversation_with_extraction"]}}),
+            ("最近7天+类型", dict(last_week, type={"$in": ["conversation_with_extraction"]}))
+        ]
+        
+        print(f"记忆条数: {args.size}, 维度: {args.dim}, 时间跨度: {args.days}天")
+        for name, where in cases:
+            matched = backend.count(where)
+            p50, p95, _ = measure(lambda: backend.search(query, k=12, where=where), args.queries)
+            print(f"[{name}] 候选 {matched} 条 ({matched / args.size:.1%}), p50 {p50:.2f}ms, p95 {p95:.2f}ms")
+        
+        ranker = MemoryRanker()
+        candidates = backend.search(query, k=12)
+        p50, p95, _ = measure(lambda: ranker.rank(candidates, 3), args.queries)
+        print(f"[混合排序 12条候选] p50 {p50:.3f}ms, p95 {p95:.3f}ms")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
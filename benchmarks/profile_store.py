@@ -0,0 +1,75 @@
+"""
+用户画像存储基准测试：整文件重写与追加日志的单次更新耗时对比
+
+在画像已有N条条目时，分别测量原实现（列表成员判断 + 整个JSON带缩进重写）
+和追加式存储（集合索引去重 + 追加一行日志，定期压缩）的平均更新耗时。
+
+运行：
+    python -m benchmarks.profile_store --sizes 1000 10000 20000 --updates 50
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("API_KEY", "fake-key")
+
+from src.memory import UserProfile
+
+
+def legacy_update(profile: dict, path: str, extracted_info: dict) -> None:
+    """原实现：逐项列表成员判断后重写整个文件"""
+    for category, value in extracted_info.items():
+        if category in profile and isinstance(profile[category], list):
+            for item in value:
+                if item not in profile[category]:
+                    profile[category].append(item)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+
+def bench_legacy(size: int, updates: int, tmpdir: str) -> float:
+    """返回原实现的平均单次更新耗时（毫秒）"""
+    path = os.path.join(tmpdir, f"legacy_{size}.json")
+    profile = {"interests": [f"兴趣{i}" for i in range(size)], "experiences": []}
+    start = time.perf_counter()
+    for i in range(updates):
+        legacy_update(profile, path, {"interests": [f"新兴趣{i}"], "experiences": [f"经历{i}"]})
+    return (time.perf_counter() - start) / updates * 1000
+
+
+def bench_store(size: int, updates: int, tmpdir: str, compact_every: int) -> float:
+    """返回追加式存储的平均单次更新耗时（毫秒），含按阈值触发的压缩"""
+    path = os.path.join(tmpdir, f"store_{size}.json")
+    profile = UserProfile("bench", profile_file=path, compact_every=compact_every)
+    profile.update({"interests": [f"兴趣{i}" for i in range(size)]})
+    profile.close()
+    
+    profile = UserProfile("bench", profile_file=path, compact_every=compact_every)
+    start = time.perf_counter()
+    for i in range(updates):
+        profile.update({"interests": [f"新兴趣{i}"], "experiences": [f"经历{i}"]})
+    elapsed = time.perf_counter() - start
+    profile.close()
+    return elapsed / updates * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用户画像更新耗时对比")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 20000], help="画像已有条目数")
+    parser.add_argument("--updates", type=int, default=50, help="每个规模下的更新次数")
+    parser.add_argument("--compact-every", type=int, default=200, help="日志压缩阈值")
+    args = parser.parse_args()
+    
+    print(f"{'条目数':>8} {'整文件重写(ms)':>16} {'追加日志(ms)':>14} {'加速比':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            legacy = bench_legacy(size, args.updates, tmpdir)
+            store = bench_store(size, args.updates, tmpdir, args.compact_every)
+            print(f"{size:>8} {legacy:>16.3f} {store:>14.3f} {legacy / store:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
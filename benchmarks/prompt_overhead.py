@@ -0,0 +1,91 @@
+"""
+每轮对话的Python侧开销微基准（不含网络时间）
+
+LLM使用LangChain的FakeListChatModel，立即返回固定回复，测得的耗时全部是提示词渲染、
+消息构建和链调用本身的开销。对比改动前后的写法：
+- 系统消息：每轮format模板并新建SystemMessage，与按Agent缓存复用
+- 记忆感知提示：每轮填充全部变量，与预先填充user_name的部分模板
+- 信息提取链：每轮新建LLMChain，与每个Agent只建一次
+- 模板更新：重新编译全部模板，与只编译变更的模板
+
+运行：
+    python -m benchmarks.prompt_overhead --turns 2000
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+
+def measure(func, turns: int) -> float:
+    """重复执行，返回每次耗时的中位数（微秒）"""
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词渲染与链构建的每轮开销")
+    parser.add_argument("--turns", type=int, default=2000, help="每项测量的次数")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from langchain.chains import LLMChain
+    from langchain.schema import SystemMessage
+    from langchain_community.chat_models.fake import FakeListChatModel
+    from src.agents.simple import SimpleAgent
+    from src.prompts import PromptManager
+    
+    llm = FakeListChatModel(responses=['{"preferences": ["咖啡"]}'])
+    manager = PromptManager()
+    user_name = "chenkx"
+    context = {
+        "user_profile": "喜欢咖啡",
+        "profile_matches": "暂无",
+        "relevant_memories": "- 时间: 2024-01-01\n用户: 我喜欢咖啡",
+        "chat_history": [],
+        "input": "推荐一款咖啡豆"
+    }
+    
+    cases = [
+        (
+            "系统消息",
+            lambda i: SystemMessage(content=manager.templates["system"]["default"].format(user_name=user_name)),
+            lambda i: SimpleAgent._get_system_message(agent)
+        ),
+        (
+            "记忆感知提示",
+            lambda i: manager.get_system_prompt("memory_aware").format_messages(user_name=user_name, **context),
+            lambda i: manager.get_partial("system", "memory_aware", user_name=user_name).format_messages(**context)
+        ),
+        (
+            "信息提取链",
+            lambda i: LLMChain(llm=llm, prompt=manager.get_extraction_prompt()).run(conversation="用户: 我喜欢咖啡", user_name=user_name),
+            lambda i: chain.run(conversation="用户: 我喜欢咖啡", user_name=user_name)
+        ),
+        (
+            "模板更新",
+            lambda i: manager._compile_templates(),
+            lambda i: manager.update_template("system", "default", manager.templates["system"]["default"])
+        )
+    ]
+    
+    agent = SimpleAgent(user_name=user_name, llm=llm)
+    chain = LLMChain(llm=llm, prompt=manager.get_extraction_prompt())
+    
+    print(f"每项 {args.turns} 次，取中位数")
+    for name, before, after in cases:
+        before_us = measure(before, args.turns)
+        after_us = measure(after, args.turns)
+        print(f"[{name}] 改动前 {before_us:.1f}us, 改动后 {after_us:.1f}us ({before_us / after_us:.1f}x)")
+    
+    chat_us = measure(lambda i: agent.chat(f"第{i}轮消息"), min(args.turns, 500))
+    print(f"[SimpleAgent.chat] 每轮 {chat_us:.1f}us（假LLM，不含网络）")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+提示词前缀稳定性基准测试
+
+DeepSeek等OpenAI兼容接口会自动缓存请求的公共前缀（DeepSeek以64个token为单位），
+命中缓存的输入token计价约为未命中的十分之一。本测试模拟一段多轮对话：
+画像不变、对话历史逐轮增长、相关记忆每轮变化，统计相邻两轮请求的公共前缀中
+可被缓存的token数，对比旧布局（相关记忆嵌在系统消息中间）与新布局（稳定部分在前）。
+不发起网络请求，token数使用项目中的count_tokens估算。
+
+运行：
+    python -m benchmarks.prompt_prefix --turns 20
+"""
+
+import argparse
+import os
+
+OLD_MEMORY_AWARE = """
+你是{user_name}的个人 AI 助手，具有长期记忆能力。
+
+关于{user_name}的已知信息：
+{user_profile}
+
+相关历史记忆：
+{relevant_memories}
+
+请基于这些信息，提供个性化、贴心的回复。如果发现用户提到的新信息，自然地融入对话。
+                """
+
+PROFILE = "\n".join([
+    "基本信息: name=陈凯旋; city=上海; job=后端工程师",
+    "兴趣: 跑步; 摄影; 科幻小说; 咖啡",
+    "目标: 今年完成半程马拉松; 学习Rust",
+    "习惯: 每天早上六点起床; 周末去咖啡馆看书",
+    "人际关系: 女儿三岁; 妻子是设计师",
+    "关注: 睡眠质量; 职业发展"
+])
+
+
+def serialize(messages) -> str:
+    """将消息列表序列化为请求中的文本顺序"""
+    return "".join(f"<{message.type}>{message.content}" for message in messages)
+
+
+def common_prefix(a: str, b: str) -> str:
+    """两段文本的公共前缀"""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return a[:length]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="相邻两轮请求的可缓存前缀对比")
+    parser.add_argument("--turns", type=int, default=20, help="模拟的对话轮数")
+    parser.add_argument("--block", type=int, default=64, help="服务端缓存的最小单位（token）")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.schema import AIMessage, HumanMessage
+    from src.memory.context_window import count_tokens
+    from src.prompts import PromptManager
+    
+    old_prompt = ChatPromptTemplate.from_messages([
+        ("system", OLD_MEMORY_AWARE),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}")
+    ])
+    new_prompt = PromptManager().get_system_prompt("memory_aware")
+    
+    results = {"旧布局": [0, 0], "新布局": [0, 0]}
+    previous = {}
+    history = []
+    for turn in range(args.turns):
+        variables = {
+            "user_name": "chenkx",
+            "user_profile": PROFILE,
+            "profile_matches": "暂无",
+            "relevant_memories": "\n".join(
+                f"- 时间: 2024-0{(turn + i) % 9 + 1}-01\n用户: 第{turn + i}条相关记忆，关于跑步和咖啡的一些细节"
+                for i in range(3)
+            ),
+            "chat_history": list(history),
+            "input": f"第{turn}轮的问题：这周的训练计划怎么安排比较好？"
+        }
+        for name, prompt in (("旧布局", old_prompt), ("新布局", new_prompt)):
+            text = serialize(prompt.format_messages(**variables))
+            total = count_tokens(text)
+            cached = 0
+            if name in previous:
+                prefix_tokens = count_tokens(common_prefix(previous[name], text))
+                cached = prefix_tokens // args.block * args.block
+            previous[name] = text
+            results[name][0] += total
+            results[name][1] += cached
+        history.extend([
+            HumanMessage(content=variables["input"]),
+            AIMessage(content=f"第{turn}轮的回答：建议周二、周四轻松跑，周六长距离，注意补充睡眠。")
+        ])
+    
+    print(f"模拟 {args.turns} 轮对话，缓存单位 {args.block} tokens")
+    for name, (total, cached) in results.items():
+        print(f"[{name}] 输入 {total} tokens，可命中缓存 {cached} tokens ({cached / total:.1%})")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
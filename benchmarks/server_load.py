@@ -0,0 +1,103 @@
+"""
+多用户服务压测：并发用户下的吞吐量、延迟，以及每个空闲用户占用的内存
+
+运行：
+    python -m benchmarks.server_load --users 200 --requests 1000 --concurrency 64
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_openai_server import start_server
+
+
+def post(base_url: str, path: str, payload: dict) -> dict:
+    """发送JSON请求"""
+    request = urllib.request.Request(
+        base_url + path,
+        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def run_load(base_url: str, users: int, requests: int, concurrency: int):
+    """并发发送对话请求，返回(耗时, 每个请求的延迟列表)"""
+    def one(i):
+        user_name = f"user_{random.randrange(users)}"
+        start = time.perf_counter()
+        post(base_url, "/chat", {"user": user_name, "message": f"第{i}条消息"})
+        return time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(one, range(requests)))
+    return time.perf_counter() - start, latencies
+
+
+def measure_idle_memory(factory, users: int) -> float:
+    """创建一批空闲Agent，返回平均每个用户新增的内存（KB）"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    agents = [factory(f"idle_{i}") for i in range(users)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    for agent in agents:
+        agent.close()
+    return allocated / users / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多用户服务吞吐量和内存压测")
+    parser.add_argument("--agent", choices=["simple", "memory"], default="simple", help="Agent类型")
+    parser.add_argument("--users", type=int, default=200, help="用户数")
+    parser.add_argument("--requests", type=int, default=1000, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=64, help="并发客户端数")
+    parser.add_argument("--max-agents", type=int, default=128, help="池容量，小于用户数时会触发淘汰")
+    parser.add_argument("--idle-users", type=int, default=200, help="测量空闲内存时创建的用户数")
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟服务延迟（秒）")
+    args = parser.parse_args()
+    
+    fake = start_server(latency=args.latency)
+    os.environ["API_KEY"] = "fake-key"
+    os.environ["BASE_URL"] = f"http://127.0.0.1:{fake.server_port}/v1"
+    os.environ.setdefault("SERVER_CHROMA_PATH", "./chroma_db_bench_server")
+    
+    from src.agents import SimpleAgent
+    from src.server import create_server
+    
+    server = create_server(agent_type=args.agent, port=0, max_agents=args.max_agents)
+    server.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    
+    elapsed, latencies = run_load(base_url, args.users, args.requests, args.concurrency)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    
+    print(f"Agent: {args.agent}, 用户数: {args.users}, 池容量: {args.max_agents}, 并发: {args.concurrency}")
+    print(f"请求数: {args.requests}, 耗时: {elapsed:.2f}s, 吞吐量: {args.requests / elapsed:.1f} RPS")
+    print(f"延迟 p50: {statistics.median(latencies) * 1000:.1f}ms, p95: {p95 * 1000:.1f}ms")
+    print(f"池统计: {server.agent_pool.get_stats()}")
+    
+    resources = server.resources
+    shared = measure_idle_memory(lambda user_name: SimpleAgent(user_name, llm=resources.llm), args.idle_users)
+    private = measure_idle_memory(SimpleAgent, args.idle_users)
+    print(f"每个空闲用户内存 (共享LLM客户端): {shared:.1f}KB")
+    print(f"每个空闲用户内存 (独立LLM客户端): {private:.1f}KB")
+    
+    server.shutdown()
+    server.server_close()
+    fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
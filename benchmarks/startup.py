@@ -0,0 +1,76 @@
+"""
+启动耗时基准测试：导入耗时和首个提示前的耗时（导入 + 创建Agent）
+
+每次测量都在新的子进程中进行，避免模块缓存的影响；
+可设置阈值，超过时以非零状态退出，用于发现CLI启动性能退化。
+
+运行：
+    python -m benchmarks.startup --repeat 5 --max-import-ms 200 --max-first-prompt-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行的测量脚本
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import src
+import_ms = (time.perf_counter() - start) * 1000
+heavy = sorted({name.split(".")[0] for name in sys.modules
+                if name.split(".")[0] in ("langchain", "langchain_openai", "langchain_community", "chromadb", "openai")})
+start = time.perf_counter()
+agent = getattr(src, sys.argv[1])()
+first_prompt_ms = import_ms + (time.perf_counter() - start) * 1000
+print(json.dumps({"import_ms": import_ms, "first_prompt_ms": first_prompt_ms, "heavy_on_import": heavy}))
+"""
+
+
+def measure(agent: str, cwd: str) -> dict:
+    """在新进程中测量一次"""
+    env = dict(os.environ)
+    env.setdefault("API_KEY", "fake-key")
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, agent],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时和首个提示前耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的次数，取中位数")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="import src的耗时上限（毫秒）")
+    parser.add_argument("--max-first-prompt-ms", type=float, default=None, help="首个提示前耗时上限（毫秒）")
+    args = parser.parse_args()
+    
+    failed = False
+    with tempfile.TemporaryDirectory() as cwd:
+        for agent in ("SimpleAgent", "MemoryAgent"):
+            results = [measure(agent, cwd) for _ in range(args.repeat)]
+            import_ms = statistics.median(r["import_ms"] for r in results)
+            first_prompt_ms = statistics.median(r["first_prompt_ms"] for r in results)
+            heavy = results[0]["heavy_on_import"]
+            print(f"[{agent}] import src: {import_ms:.1f}ms, 首个提示前: {first_prompt_ms:.1f}ms, "
+                  f"导入时加载的重量级依赖: {', '.join(heavy) or '无'}")
+            
+            if args.max_import_ms is not None and import_ms > args.max_import_ms:
+                print(f"  超过导入耗时上限 {args.max_import_ms:.0f}ms")
+                failed = True
+            if args.max_first_prompt_ms is not None and first_prompt_ms > args.max_first_prompt_ms:
+                print(f"  超过首个提示前耗时上限 {args.max_first_prompt_ms:.0f}ms")
+                failed = True
+    
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+向量存储后端基准测试：不同规模下的写入吞吐量、打开耗时和检索延迟
+
+直接向后端写入随机向量，不经过嵌入模型，只比较后端本身的开销。
+
+运行：
+    python -m benchmarks.vector_backend --sizes 1000,10000,100000 --dim 1536 --backends numpy,chroma
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def open_backend(name: str, directory: str):
+    """打开指定类型的后端"""
+    if name == "numpy":
+        from src.memory.numpy_backend import NumpyVectorBackend
+        return NumpyVectorBackend(directory)
+    from src.memory.vector_backend import ChromaVectorBackend
+    return ChromaVectorBackend("bench", None, persist_directory=directory)
+
+
+def run(name: str, size: int, dim: int, queries: int, batch_size: int) -> dict:
+    """对一个后端和规模执行写入、重新打开和检索"""
+    from langchain.schema import Document
+    
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        backend = open_backend(name, directory)
+        start = time.perf_counter()
+        for offset in range(0, size, batch_size):
+            count = min(batch_size, size - offset)
+            vectors = rng.standard_normal((count, dim), dtype=np.float32)
+            docs = [
+                Document(page_content=f"记忆{offset + i}", metadata={"user_name": "bench", "type": "conversation"})
+                for i in range(count)
+            ]
+            backend.add([f"doc{offset + i}" for i in range(count)], vectors.tolist(), docs)
+        insert_elapsed = time.perf_counter() - start
+        backend.close()
+        del backend
+        
+        start = time.perf_counter()
+        backend = open_backend(name, directory)
+        open_elapsed = time.perf_counter() - start
+        
+        latencies = []
+        for _ in range(queries):
+            query = rng.standard_normal(dim, dtype=np.float32).tolist()
+            start = time.perf_counter()
+            backend.search(query, k=3)
+            latencies.append(time.perf_counter() - start)
+        backend.close()
+    
+    latencies.sort()
+    return {
+        "insert_per_s": size / insert_elapsed,
+        "open_ms": open_elapsed * 1000,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量存储后端对比")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="逗号分隔的记忆条数")
+    parser.add_argument("--dim", type=int, default=1536, help="向量维度")
+    parser.add_argument("--backends", default="numpy,chroma", help="逗号分隔的后端")
+    parser.add_argument("--queries", type=int, default=100, help="检索次数")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批写入条数")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("API_KEY", "fake-key")
+    
+    print(f"维度: {args.dim}, 检索次数: {args.queries}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        for name in args.backends.split(","):
+            result = run(name, size, args.dim, args.queries, args.batch_size)
+            print(f"[{name}] {size}条: 写入 {result['insert_per_s']:.0f} 条/秒, "
+                  f"打开 {result['open_ms']:.1f}ms, 检索 p50 {result['p50_ms']:.2f}ms / p95 {result['p95_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -2,10 +2,27 @@
 AI Agent 框架
 """
 
-from src.agents import BaseAgent, SimpleAgent, MemoryAgent
+from typing import TYPE_CHECKING
 from src.config import config
-from src.memory import ShortTermMemory, LongTermMemory, UserProfile
-from src.prompts import PromptManager
+from src.utils import lazy_exports
+
+# Agent、记忆和提示词模块依赖LangChain，第一次访问时才导入
+_EXPORTS = {
+    "BaseAgent": "src.agents",
+    "SimpleAgent": "src.agents",
+    "MemoryAgent": "src.agents",
+    "ShortTermMemory": "src.memory",
+    "LongTermMemory": "src.memory",
+    "UserProfile": "src.memory",
+    "PromptManager": "src.prompts"
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from src.agents import BaseAgent, SimpleAgent, MemoryAgent
+    from src.memory import ShortTermMemory, LongTermMemory, UserProfile
+    from src.prompts import PromptManager
 
 __all__ = [
     "BaseAgent",
@@ -2,9 +2,21 @@
 Agent实现包
 """
 
-from .base import BaseAgent
-from .simple import SimpleAgent
-from .memory_agent import MemoryAgent
+from typing import TYPE_CHECKING
+from src.utils import lazy_exports
+
+_EXPORTS = {
+    "BaseAgent": ".base",
+    "SimpleAgent": ".simple",
+    "MemoryAgent": ".memory_agent"
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from .base import BaseAgent
+    from .simple import SimpleAgent
+    from .memory_agent import MemoryAgent
 
 __all__ = [
     "BaseAgent",
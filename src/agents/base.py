@@ -2,33 +2,60 @@
 Agent基类
 """
 
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import TYPE_CHECKING, Dict, Any, AsyncIterator, Iterator, List
+from langchain.schema import BaseMessage, HumanMessage
 from src.config import config
 from src.prompts import PromptManager
+from src.utils import TokenUsageTracker
+from src.utils.llm_cache import get_response_cache, with_response_cache
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 class BaseAgent(ABC):
     """
     Agent基类，定义所有Agent的核心接口
     """
     
-    def __init__(self, user_name: str = None):
+    def __init__(self, user_name: str = None, llm: "ChatOpenAI" = None):
         """
         初始化Agent
         
         Args:
             user_name: 用户名，默认使用配置中的默认用户名
+            llm: 共享的LLM客户端，默认为每个Agent单独创建
         """
         self.user_name = user_name or config.user_config["default_user_name"]
         self.prompt_manager = PromptManager()
         
-        # 初始化LLM
-        self.llm = ChatOpenAI(
-            api_key=config.api_key,
-            base_url=config.base_url,
-            **config.llm_config
-        )
+        # 每轮对话的token用量和服务端上下文缓存命中统计
+        self.token_usage = TokenUsageTracker()
+        
+        # LLM客户端在首次调用时才创建，缩短启动时间；启用响应缓存且策略允许时挂载缓存
+        self._llm = with_response_cache(llm, "chat")
+        self._llm_lock = threading.Lock()
+    
+    @property
+    def llm(self) -> "ChatOpenAI":
+        """
+        LLM客户端，首次访问时创建
+        """
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    from langchain_openai import ChatOpenAI
+                    self._llm = with_response_cache(
+                        ChatOpenAI(
+                            api_key=config.api_key,
+                            base_url=config.base_url,
+                            **config.llm_config
+                        ),
+                        "chat"
+                    )
+        return self._llm
     
     @abstractmethod
     def chat(self, user_input: str) -> str:
@@ -43,6 +70,45 @@ class BaseAgent(ABC):
         """
         pass
     
+    def chat_stream(self, user_input: str) -> Iterator[str]:
+        """
+        流式对话，逐段产出回复内容
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            回复内容片段
+        """
+        # 默认实现：一次性产出完整回复，子类可以重写
+        yield self.chat(user_input)
+    
+    async def achat(self, user_input: str) -> str:
+        """
+        异步与用户对话
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            助手回复
+        """
+        # 默认实现：在线程池中执行同步对话，子类应重写为原生异步实现
+        return await asyncio.to_thread(self.chat, user_input)
+    
+    async def astream(self, user_input: str) -> AsyncIterator[str]:
+        """
+        异步流式对话，逐段产出回复内容
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            回复内容片段
+        """
+        # 默认实现：一次性产出完整回复，子类可以重写
+        yield await self.achat(user_input)
+    
     @abstractmethod
     def clear_memory(self) -> None:
         """
@@ -67,6 +133,54 @@ class BaseAgent(ABC):
         """
         pass
     
+    def get_token_usage(self) -> Dict[str, Any]:
+        """
+        获取对话的token用量统计
+        
+        Returns:
+            包含累计token数、上下文缓存命中的token数（prompt_cache_hit_tokens）和命中率的字典
+        """
+        return self.token_usage.get_stats()
+    
+    def get_llm_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取LLM响应缓存的命中统计，缓存在进程内所有Agent间共享
+        
+        Returns:
+            统计字典，未启用缓存时返回空字典
+        """
+        cache = get_response_cache()
+        return cache.get_stats() if cache is not None else {}
+    
+    def _summarize_conversation(self, summary: str, messages: List[BaseMessage]) -> str:
+        """
+        将对话消息合并进已有摘要
+        
+        Args:
+            summary: 已有摘要
+            messages: 待合并的对话消息
+            
+        Returns:
+            新的摘要
+        """
+        conversation = "\n".join(
+            f"{'用户' if isinstance(msg, HumanMessage) else '助手'}: {msg.content}"
+            for msg in messages
+        )
+        prompt = self.prompt_manager.get_summary_prompt().format(
+            user_name=self.user_name,
+            summary=summary or "无",
+            conversation=conversation
+        )
+        return self.llm.invoke(prompt).content.strip()
+    
+    def close(self) -> None:
+        """
+        释放Agent持有的资源，退出前调用
+        """
+        # 默认实现，子类可以重写
+        pass
+    
     def set_system_prompt(self, prompt: str) -> None:
         """
         设置系统提示词
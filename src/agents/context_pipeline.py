@@ -0,0 +1,276 @@
+"""
+调用LLM前的上下文收集流水线
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+class ContextProvider:
+    """上下文提供者"""
+    
+    def __init__(self, name: str, func: Callable[[str], Any],
+                 afunc: Optional[Callable[[str], Awaitable[Any]]] = None,
+                 timeout: float = 2.0, default: Any = None):
+        """
+        初始化上下文提供者
+        
+        Args:
+            name: 名称，同时作为结果字典的键
+            func: 同步获取函数，接收用户输入
+            afunc: 异步获取函数，为None时在线程中执行func
+            timeout: 截止时间（秒），从流水线开始时计
+            default: 超时或出错时使用的默认值
+        """
+        self.name = name
+        self.func = func
+        self.afunc = afunc
+        self.timeout = timeout
+        self.default = default
+
+class ContextPipeline:
+    """
+    并行执行多个上下文提供者
+    
+    每个提供者有各自的截止时间，超时或出错的提供者使用默认值，
+    本轮对话不会因为某个慢的提供者而被阻塞。超时的调用仍在线程池中执行，
+    执行完之前该提供者不再提交新的调用（直接使用默认值），避免卡住的调用占满共享的线程池。
+    """
+    
+    def __init__(self, max_workers: int = 4, executor: Executor = None):
+        """
+        初始化流水线
+        
+        Args:
+            max_workers: 同步模式下的线程数
+            executor: 共享的线程池，由调用方负责关闭；None表示首次使用时自行创建
+        """
+        self.providers: Dict[str, ContextProvider] = {}
+        self.max_workers = max_workers
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._lock = threading.Lock()
+        # 各提供者超时后仍在执行的调用
+        self._outstanding: Dict[str, Future] = {}
+        
+        # 最近一轮各阶段的耗时（毫秒）和状态
+        self.last_timings: Dict[str, Dict[str, Any]] = {}
+        # 各阶段的累计统计
+        self._stats: Dict[str, Dict[str, float]] = {}
+    
+    def register(self, name: str, func: Callable[[str], Any],
+                 afunc: Optional[Callable[[str], Awaitable[Any]]] = None,
+                 timeout: float = 2.0, default: Any = None) -> None:
+        """
+        注册上下文提供者
+        
+        Args:
+            name: 名称，同时作为结果字典的键
+            func: 同步获取函数，接收用户输入
+            afunc: 异步获取函数，为None时在线程中执行func
+            timeout: 截止时间（秒）
+            default: 超时或出错时使用的默认值
+        """
+        self.providers[name] = ContextProvider(name, func, afunc, timeout, default)
+    
+    def gather(self, user_input: str) -> Dict[str, Any]:
+        """
+        在线程池中并行收集上下文
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            提供者名称到结果的字典
+        """
+        start = time.perf_counter()
+        futures = {
+            name: (provider, self._submit(provider, user_input))
+            for name, provider in self.providers.items()
+        }
+        
+        results = {}
+        timings = {}
+        for name, (provider, future) in futures.items():
+            if future is None:
+                results[name] = provider.default
+                timings[name] = {"ms": 0.0, "status": "skipped"}
+                continue
+            remaining = max(provider.timeout - (time.perf_counter() - start), 0)
+            try:
+                results[name], elapsed = future.result(timeout=remaining)
+                timings[name] = {"ms": elapsed * 1000, "status": "ok"}
+            except FutureTimeoutError:
+                self._mark_outstanding(name, future)
+                results[name] = provider.default
+                timings[name] = {"ms": provider.timeout * 1000, "status": "timeout"}
+            except Exception as e:
+                print(f"上下文收集出错 [{name}]: {e}")
+                results[name] = provider.default
+                timings[name] = {"ms": (time.perf_counter() - start) * 1000, "status": "error"}
+        
+        self._record(timings, time.perf_counter() - start)
+        return results
+    
+    async def agather(self, user_input: str) -> Dict[str, Any]:
+        """
+        在事件循环中并行收集上下文
+        
+        Args:
+            user_input: 用户输入
+        
+        Returns:
+            提供者名称到结果的字典
+        """
+        start = time.perf_counter()
+        
+        async def run(provider: ContextProvider):
+            future = None
+            if provider.afunc is not None:
+                # 超时的协程会被取消，不会继续占用资源
+                coro = self._atimed(provider.afunc, user_input)
+            else:
+                future = self._submit(provider, user_input)
+                if future is None:
+                    return provider.default, {"ms": 0.0, "status": "skipped"}
+                coro = asyncio.wrap_future(future)
+            try:
+                value, elapsed = await asyncio.wait_for(coro, timeout=provider.timeout)
+                return value, {"ms": elapsed * 1000, "status": "ok"}
+            except asyncio.TimeoutError:
+                if future is not None:
+                    self._mark_outstanding(provider.name, future)
+                return provider.default, {"ms": provider.timeout * 1000, "status": "timeout"}
+            except Exception as e:
+                print(f"上下文收集出错 [{provider.name}]: {e}")
+                return provider.default, {"ms": (time.perf_counter() - start) * 1000, "status": "error"}
+        
+        names = list(self.providers)
+        outcomes = await asyncio.gather(*(run(self.providers[name]) for name in names))
+        
+        results = {}
+        timings = {}
+        for name, (value, timing) in zip(names, outcomes):
+            results[name] = value
+            timings[name] = timing
+        
+        self._record(timings, time.perf_counter() - start)
+        return results
+    
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        获取各阶段的累计统计
+        
+        Returns:
+            阶段名称到统计信息（调用次数、超时次数、出错次数、因上次调用未结束而跳过的次数、平均耗时毫秒）的字典
+        """
+        with self._lock:
+            return {
+                name: {
+                    "calls": stats["calls"],
+                    "timeouts": stats["timeouts"],
+                    "errors": stats["errors"],
+                    "skipped": stats["skipped"],
+                    "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+                }
+                for name, stats in self._stats.items()
+            }
+    
+    def close(self) -> None:
+        """关闭自行创建的线程池"""
+        if self._executor is not None and self._owns_executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        获取线程池，首次使用时创建
+        
+        Returns:
+            线程池
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="context-provider"
+                )
+            return self._executor
+    
+    def _submit(self, provider: ContextProvider, user_input: str) -> Optional[Future]:
+        """
+        把同步获取函数提交到线程池，该提供者上一次超时的调用仍在执行时不提交
+        
+        Args:
+            provider: 上下文提供者
+            user_input: 用户输入
+        
+        Returns:
+            提交的Future，跳过时返回None
+        """
+        with self._lock:
+            previous = self._outstanding.get(provider.name)
+            if previous is not None:
+                if not previous.done():
+                    return None
+                del self._outstanding[provider.name]
+        return self._get_executor().submit(self._timed, provider.func, user_input)
+    
+    def _mark_outstanding(self, name: str, future: Future) -> None:
+        """
+        记录超时后仍在执行的调用
+        
+        Args:
+            name: 提供者名称
+            future: 超时的调用
+        """
+        with self._lock:
+            self._outstanding[name] = future
+    
+    def _record(self, timings: Dict[str, Dict[str, Any]], total: float) -> None:
+        """
+        记录本轮各阶段耗时
+        
+        Args:
+            timings: 各阶段的耗时和状态
+            total: 总耗时（秒）
+        """
+        timings["total"] = {"ms": total * 1000, "status": "ok"}
+        with self._lock:
+            self.last_timings = timings
+            for name, timing in timings.items():
+                stats = self._stats.setdefault(
+                    name, {"calls": 0, "timeouts": 0, "errors": 0, "skipped": 0, "total_ms": 0.0}
+                )
+                stats["calls"] += 1
+                stats["total_ms"] += timing["ms"]
+                if timing["status"] == "timeout":
+                    stats["timeouts"] += 1
+                elif timing["status"] == "error":
+                    stats["errors"] += 1
+                elif timing["status"] == "skipped":
+                    stats["skipped"] += 1
+    
+    @staticmethod
+    def _timed(func: Callable[[str], Any], user_input: str):
+        """
+        执行同步函数并计时
+        
+        Returns:
+            (结果, 耗时秒数)
+        """
+        start = time.perf_counter()
+        return func(user_input), time.perf_counter() - start
+    
+    @staticmethod
+    async def _atimed(afunc: Callable[[str], Awaitable[Any]], user_input: str):
+        """
+        执行异步函数并计时
+        
+        Returns:
+            (结果, 耗时秒数)
+        """
+        start = time.perf_counter()
+        return await afunc(user_input), time.perf_counter() - start
\ No newline at end of file
@@ -2,39 +2,102 @@
 具有记忆功能的Agent
 """
 
-import json
-from typing import Dict, Any
-from langchain.chains import LLMChain
+import asyncio
+import threading
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Dict, Any, List, AsyncIterator, Iterator
+from langchain.schema import BaseMessage
 from src.config import config
-from src.memory import ShortTermMemory, LongTermMemory, UserProfile
+from src.memory import (
+    ShortTermMemory, LongTermMemory, UserProfile, ExtractionWorker, ExtractionGate, ExtractionBatcher,
+    ProfileRenderer, StructuredExtractor
+)
+from src.memory.structured_extraction import build_batch_tool, split_batch_result
+from src.utils.llm_cache import uses_response_cache, with_response_cache
 from .base import BaseAgent
+from .context_pipeline import ContextPipeline
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_openai import ChatOpenAI
 
 class MemoryAgent(BaseAgent):
     """
     具有长期记忆和用户画像管理功能的Agent
     """
     
-    def __init__(self, user_name: str = None):
+    def __init__(self, user_name: str = None, llm: "ChatOpenAI" = None,
+                 embeddings: "Embeddings" = None, chroma_client: Any = None,
+                 executor: Executor = None):
         """
         初始化MemoryAgent
         
         Args:
             user_name: 用户名
+            llm: 共享的LLM客户端
+            embeddings: 共享的嵌入模型
+            chroma_client: 共享的Chroma客户端
+            executor: 共享的上下文收集线程池
         """
-        super().__init__(user_name)
+        super().__init__(user_name, llm)
         
         # 初始化记忆系统
-        self.short_term_memory = ShortTermMemory(**config.memory_config["short_term"])
+        self.short_term_memory = ShortTermMemory(
+            summarizer=self._summarize_conversation,
+            **config.memory_config["short_term"]
+        )
         
         self.long_term_memory = LongTermMemory(
             api_key=config.api_key,
             base_url=config.base_url,
             user_name=self.user_name,
+            embeddings=embeddings,
+            client=chroma_client,
             **config.memory_config["long_term"]
         )
         
         # 初始化用户画像
-        self.user_profile = UserProfile(self.user_name)
+        self.user_profile = UserProfile(self.user_name, **config.memory_config["profile"])
+        self.profile_renderer = ProfileRenderer(**config.memory_config["profile_render"])
+        
+        # 结构化提取器在首次提取时创建，之后每轮复用
+        self._extractor = None
+        self._extractor_lock = threading.Lock()
+        
+        # 初始化上下文收集流水线
+        self.context_pipeline = self._setup_context_pipeline(executor)
+        
+        # 初始化提取门控，跳过不值得调用LLM提取的对话
+        gate_config = config.memory_config["extraction_gate"]
+        self.extraction_gate = None
+        if gate_config["enabled"]:
+            self.extraction_gate = ExtractionGate(
+                min_chars=gate_config["min_chars"],
+                long_chars=gate_config["long_chars"],
+                model_path=gate_config["model_path"],
+                log_path=gate_config["log_path"],
+                shadow_rate=gate_config["shadow_rate"]
+            )
+        
+        # 初始化批量提取，每批对话只调用一次LLM
+        extraction_config = config.memory_config["extraction"]
+        self.extraction_batcher = None
+        if extraction_config["batch_turns"] > 1:
+            self.extraction_batcher = ExtractionBatcher(
+                self._dispatch_batch,
+                batch_turns=extraction_config["batch_turns"],
+                batch_interval=extraction_config["batch_interval"]
+            )
+        
+        # 初始化后台记忆提取线程，提取任务积压到上限后按顺序排队只保存原始对话、不做提取
+        self.extraction_worker = None
+        if extraction_config["background"]:
+            batched = self.extraction_batcher is not None
+            self.extraction_worker = ExtractionWorker(
+                self._extract_and_store_batch if batched else self._extract_and_store_memory,
+                max_queue_size=extraction_config["max_queue_size"],
+                overflow_handler=self._store_raw_batch if batched else self._store_raw_memory
+            )
     
     def chat(self, user_input: str) -> str:
         """
@@ -46,40 +109,340 @@ class MemoryAgent(BaseAgent):
         Returns:
             助手回复
         """
-        # 1. 检索相关记忆
-        relevant_memories = self.long_term_memory.load(
-            key="relevant_memories",
-            query=user_input,
-            k=3
-        )
+        # 1. 并行收集上下文（相关记忆、用户画像、最近对话）
+        context = self.context_pipeline.gather(user_input)
         
-        # 2. 格式化用户画像
-        profile_summary = self.user_profile.to_string()
+        # 2. 构建消息
+        messages = self._build_messages(user_input, context)
         
         # 3. 生成回复
-        conversation_prompt = self.prompt_manager.get_system_prompt("memory_aware")
-        messages = conversation_prompt.format_messages(
-            user_name=self.user_name,
-            user_profile=profile_summary,
-            relevant_memories=relevant_memories,
+        response = self.llm.invoke(messages)
+        self.token_usage.record(response)
+        
+        # 4. 更新短期记忆
+        self._save_turn(user_input, response.content)
+        
+        # 5. 提取并存储长期记忆（后台执行，不阻塞回复）
+        self._schedule_extraction(user_input, response.content)
+        
+        return response.content
+    
+    def chat_stream(self, user_input: str) -> Iterator[str]:
+        """
+        流式对话，回复完整生成后才写入短期记忆并提取长期记忆
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            回复内容片段
+        """
+        context = self.context_pipeline.gather(user_input)
+        messages = self._build_messages(user_input, context)
+        
+        chunks = []
+        usage_chunk = None
+        for chunk in self.llm.stream(messages):
+            if chunk.usage_metadata or chunk.response_metadata:
+                usage_chunk = chunk
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        if usage_chunk is not None:
+            self.token_usage.record(usage_chunk)
+        
+        response = "".join(chunks)
+        self._save_turn(user_input, response)
+        self._schedule_extraction(user_input, response)
+    
+    async def achat(self, user_input: str) -> str:
+        """
+        异步与用户对话
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            助手回复
+        """
+        context = await self.context_pipeline.agather(user_input)
+        messages = self._build_messages(user_input, context)
+        
+        response = await self.llm.ainvoke(messages)
+        self.token_usage.record(response)
+        
+        self._save_turn(user_input, response.content)
+        await self._aschedule_extraction(user_input, response.content)
+        
+        return response.content
+    
+    async def astream(self, user_input: str) -> AsyncIterator[str]:
+        """
+        异步流式对话，回复完整生成后才写入短期记忆并提取长期记忆
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            回复内容片段
+        """
+        context = await self.context_pipeline.agather(user_input)
+        messages = self._build_messages(user_input, context)
+        
+        chunks = []
+        usage_chunk = None
+        async for chunk in self.llm.astream(messages):
+            if chunk.usage_metadata or chunk.response_metadata:
+                usage_chunk = chunk
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        if usage_chunk is not None:
+            self.token_usage.record(usage_chunk)
+        
+        response = "".join(chunks)
+        self._save_turn(user_input, response)
+        await self._aschedule_extraction(user_input, response)
+    
+    def _build_messages(self, user_input: str, context: Dict[str, Any]) -> List[BaseMessage]:
+        """
+        构建发送给LLM的消息列表
+        
+        Args:
+            user_input: 用户输入
+            context: 上下文流水线的收集结果
+            
+        Returns:
+            消息列表
+        """
+        # 预先填充user_name的模板按Agent缓存，每轮只填充上下文；
+        # 消息顺序为指令、画像快照、对话历史、相关画像条目和记忆、用户输入，稳定的部分在前
+        conversation_prompt = self.prompt_manager.get_partial("system", "memory_aware", user_name=self.user_name)
+        return conversation_prompt.format_messages(
+            user_profile=context["user_profile"],
+            profile_matches=context["profile_matches"],
+            relevant_memories=context["relevant_memories"],
+            chat_history=context["chat_history"],
             input=user_input
         )
+    
+    def _setup_context_pipeline(self, executor: Executor = None) -> ContextPipeline:
+        """
+        注册调用LLM前需要收集的上下文
         
-        response = self.llm.invoke(messages)
+        Args:
+            executor: 共享的线程池，None表示使用流水线自己的线程池
+            
+        Returns:
+            上下文流水线
+        """
+        context_config = config.memory_config["context"]
+        pipeline = ContextPipeline(max_workers=context_config["max_workers"], executor=executor)
         
-        # 4. 更新短期记忆
+        # 相关记忆，包含一次网络嵌入请求，最容易超时
+        pipeline.register(
+            "relevant_memories",
+            lambda query: self.long_term_memory.load(key="relevant_memories", query=query, k=3),
+            afunc=lambda query: self.long_term_memory.aload(key="relevant_memories", query=query, k=3),
+            timeout=context_config["retrieval_timeout"],
+            default="暂无相关历史记忆"
+        )
+        
+        # 用户画像快照（紧凑格式，受token预算限制）。不随输入筛选，画像不变时各轮内容相同，
+        # 与系统指令一起构成可被服务端缓存的稳定前缀
+        pipeline.register(
+            "user_profile",
+            lambda query: self.profile_renderer.render(self.user_profile),
+            timeout=context_config["profile_timeout"],
+            default="暂无"
+        )
+        
+        # 快照之外与当前输入相关的画像条目，随输入变化，放在相关记忆旁边
+        pipeline.register(
+            "profile_matches",
+            lambda query: self.profile_renderer.render_relevant(self.user_profile, query),
+            timeout=context_config["profile_timeout"],
+            default="暂无"
+        )
+        
+        # 按轮数和token数限制的最近对话窗口
+        pipeline.register(
+            "chat_history",
+            lambda query: self.short_term_memory.load(key="recent"),
+            timeout=context_config["history_timeout"],
+            default=[]
+        )
+        return pipeline
+    
+    def get_profile_render_stats(self) -> Dict[str, Any]:
+        """
+        获取画像渲染节省的token统计
+        
+        Returns:
+            统计字典
+        """
+        return self.profile_renderer.get_stats()
+    
+    def get_context_timings(self) -> Dict[str, Any]:
+        """
+        获取上下文收集各阶段的耗时
+        
+        Returns:
+            包含最近一轮耗时（last）和累计统计（stats）的字典，耗时单位为毫秒
+        """
+        return {
+            "last": self.context_pipeline.last_timings,
+            "stats": self.context_pipeline.get_stats()
+        }
+    
+    def _save_turn(self, user_input: str, response: str) -> None:
+        """
+        保存一轮对话到短期记忆
+        
+        Args:
+            user_input: 用户输入
+            response: 助手回复
+        """
         self.short_term_memory.save(
             key="context",
             value={
                 "input": {"input": user_input},
-                "output": {"output": response.content}
+                "output": {"output": response}
             }
         )
+    
+    def _schedule_extraction(self, user_input: str, assistant_response: str) -> None:
+        """
+        安排记忆提取任务，启用后台提取时交给工作线程，否则同步执行
         
-        # 5. 提取并存储长期记忆
-        self._extract_and_store_memory(user_input, response.content)
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        """
+        if self.extraction_batcher is not None:
+            batch = self.extraction_batcher.add(user_input, assistant_response)
+            if batch:
+                self._dispatch_batch(batch)
+        elif self.extraction_worker is not None:
+            self.extraction_worker.submit(user_input, assistant_response)
+        else:
+            self._extract_and_store_memory(user_input, assistant_response)
+    
+    async def _aschedule_extraction(self, user_input: str, assistant_response: str) -> None:
+        """
+        异步安排记忆提取任务
         
-        return response.content
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        """
+        if self.extraction_batcher is not None:
+            batch = self.extraction_batcher.add(user_input, assistant_response)
+            if not batch:
+                return
+            if self.extraction_worker is not None:
+                self.extraction_worker.submit(batch)
+            else:
+                await self._aextract_and_store_batch(batch)
+        elif self.extraction_worker is not None:
+            # submit只入队，队列已满时保存原始对话也由工作线程执行
+            self.extraction_worker.submit(user_input, assistant_response)
+        else:
+            await self._aextract_and_store_memory(user_input, assistant_response)
+    
+    def _dispatch_batch(self, turns: List[Dict[str, Any]]) -> None:
+        """
+        处理凑满或到期的提取批次，启用后台提取时交给工作线程，否则同步执行
+        
+        Args:
+            turns: 轮次列表
+        """
+        if self.extraction_worker is not None:
+            self.extraction_worker.submit(turns)
+        else:
+            self._extract_and_store_batch(turns)
+    
+    @property
+    def extractor(self) -> StructuredExtractor:
+        """
+        结构化提取器，首次访问时创建；批量提取时工具调用模式使用按轮次记录的工具。
+        启用响应缓存时提取使用挂载了缓存的模型副本，内容相同的对话不再重复调用；
+        流式调用不经过缓存，此时改为非流式读取
+        """
+        if self._extractor is None:
+            with self._extractor_lock:
+                if self._extractor is None:
+                    extraction_config = config.memory_config["extraction"]
+                    llm = with_response_cache(self.llm, "extraction")
+                    self._extractor = StructuredExtractor(
+                        llm,
+                        mode=extraction_config["mode"],
+                        max_retries=extraction_config["max_retries"],
+                        stream=extraction_config["stream"] and not uses_response_cache(llm),
+                        tool=build_batch_tool() if self.extraction_batcher is not None else None
+                    )
+        return self._extractor
+    
+    def _extraction_prompt(self, user_input: str, assistant_response: str) -> str:
+        """
+        填充信息提取提示词
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+            
+        Returns:
+            提示词文本
+        """
+        conversation = f"用户: {user_input}\n助手: {assistant_response}"
+        return self.prompt_manager.get_partial("extraction", "default", user_name=self.user_name).format(
+            conversation=conversation
+        )
+    
+    def _batch_extraction_prompt(self, turns: List[Dict[str, Any]]) -> str:
+        """
+        填充多轮批量提取提示词，各轮按从1开始的编号列出
+        
+        Args:
+            turns: 轮次列表
+        
+        Returns:
+            提示词文本
+        """
+        conversation = "\n\n".join(
+            f"[{i}]\n用户: {turn['user_input']}\n助手: {turn['assistant_response']}"
+            for i, turn in enumerate(turns, 1)
+        )
+        return self.prompt_manager.get_partial("extraction", "batch", user_name=self.user_name).format(
+            conversation=conversation
+        )
+    
+    def _should_extract(self, user_input: str, assistant_response: str) -> bool:
+        """
+        通过门控判断是否需要调用LLM提取，未启用门控时总是提取
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+            
+        Returns:
+            是否提取
+        """
+        if self.extraction_gate is None:
+            return True
+        return self.extraction_gate.check(user_input, assistant_response)
+    
+    def _record_extraction(self, user_input: str, assistant_response: str, extracted_info: Any) -> None:
+        """
+        记录提取结果，供门控离线评估
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+            extracted_info: 提取出的信息
+        """
+        if self.extraction_gate is not None:
+            self.extraction_gate.record_outcome(user_input, assistant_response, extracted_info)
     
     def _extract_and_store_memory(self, user_input: str, assistant_response: str) -> None:
         """
@@ -89,21 +452,22 @@ class MemoryAgent(BaseAgent):
             user_input: 用户输入
             assistant_response: 助手回复
         """
-        try:
-            # 使用LLM提取信息
-            extraction_chain = LLMChain(
-                llm=self.llm,
-                prompt=self.prompt_manager.get_extraction_prompt()
-            )
-            
-            conversation = f"用户: {user_input}\n助手: {assistant_response}"
-            result = extraction_chain.run(
-                conversation=conversation,
-                user_name=self.user_name
+        if not self._should_extract(user_input, assistant_response):
+            # 门控判断不含画像信息，只存储原始对话
+            self.long_term_memory.save(
+                key="memory",
+                value={
+                    "user_input": user_input,
+                    "assistant_response": assistant_response,
+                    "extracted_info": {}
+                }
             )
-            
-            # 解析JSON结果
-            extracted_info = json.loads(result)
+            return
+        
+        try:
+            # 使用LLM提取信息，输出经过增量解析和本地修复
+            extracted_info = self.extractor.extract(self._extraction_prompt(user_input, assistant_response))
+            self._record_extraction(user_input, assistant_response, extracted_info)
             
             # 更新用户画像
             self.user_profile.update(extracted_info)
@@ -130,22 +494,263 @@ class MemoryAgent(BaseAgent):
                 }
             )
     
+    def _store_raw_memory(self, user_input: str, assistant_response: str) -> None:
+        """
+        不做提取，只存储原始对话
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        """
+        self.long_term_memory.save(
+            key="memory",
+            value={
+                "user_input": user_input,
+                "assistant_response": assistant_response,
+                "extracted_info": {}
+            }
+        )
+    
+    def _store_raw_batch(self, turns: List[Dict[str, Any]]) -> None:
+        """
+        不做提取，只存储批次中各轮的原始对话
+        
+        Args:
+            turns: 轮次列表
+        """
+        self.long_term_memory.save_many(self._batch_values(turns))
+    
+    async def _aextract_and_store_memory(self, user_input: str, assistant_response: str) -> None:
+        """
+        异步从对话中提取并存储长期记忆
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        """
+        if not self._should_extract(user_input, assistant_response):
+            await self.long_term_memory.asave(
+                key="memory",
+                value={
+                    "user_input": user_input,
+                    "assistant_response": assistant_response,
+                    "extracted_info": {}
+                }
+            )
+            return
+        
+        try:
+            extracted_info = await self.extractor.aextract(self._extraction_prompt(user_input, assistant_response))
+            self._record_extraction(user_input, assistant_response, extracted_info)
+            
+            # 画像写入是本地文件操作，放到线程中执行
+            await asyncio.to_thread(self.user_profile.update, extracted_info)
+            
+            await self.long_term_memory.asave(
+                key="memory",
+                value={
+                    "user_input": user_input,
+                    "assistant_response": assistant_response,
+                    "extracted_info": extracted_info
+                }
+            )
+            
+        except Exception as e:
+            print(f"信息提取出错: {e}")
+            await self.long_term_memory.asave(
+                key="memory",
+                value={
+                    "user_input": user_input,
+                    "assistant_response": assistant_response,
+                    "extracted_info": {}
+                }
+            )
+    
+    def _batch_values(self, turns: List[Dict[str, Any]], infos: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        将批次中的各轮转换为长期记忆的记忆值，保留每轮的对话时间
+        
+        Args:
+            turns: 轮次列表
+            infos: 每轮的提取信息，None表示没有提取
+            
+        Returns:
+            记忆值列表
+        """
+        return [
+            {
+                "user_input": turn["user_input"],
+                "assistant_response": turn["assistant_response"],
+                "extracted_info": infos[i] if infos else {},
+                "timestamp": turn["timestamp"]
+            }
+            for i, turn in enumerate(turns)
+        ]
+    
+    def _extract_batch(self, turns: List[Dict[str, Any]]) -> bool:
+        """
+        通过门控逐轮判断，批次中任意一轮值得提取时整批调用一次LLM
+        
+        Args:
+            turns: 轮次列表
+            
+        Returns:
+            是否提取
+        """
+        # 不短路，每轮都计入门控统计
+        selected = [self._should_extract(turn["user_input"], turn["assistant_response"]) for turn in turns]
+        return any(selected)
+    
+    def _fan_out(self, turns: List[Dict[str, Any]], extracted_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        将批量提取的结果拆分到各轮并记录
+        
+        Args:
+            turns: 轮次列表
+            extracted_info: LLM提取的结果
+            
+        Returns:
+            每轮的提取信息列表
+        """
+        infos = split_batch_result(extracted_info, len(turns))
+        for turn, info in zip(turns, infos):
+            self._record_extraction(turn["user_input"], turn["assistant_response"], info)
+        return infos
+    
+    def _extract_and_store_batch(self, turns: List[Dict[str, Any]]) -> None:
+        """
+        从一批对话中提取信息，按轮更新用户画像，并把各轮写入长期记忆
+        
+        Args:
+            turns: 轮次列表
+        """
+        if not self._extract_batch(turns):
+            # 门控判断整批都不含画像信息，只存储原始对话
+            self.long_term_memory.save_many(self._batch_values(turns))
+            return
+        
+        try:
+            extracted_info = self.extractor.extract(self._batch_extraction_prompt(turns))
+            infos = self._fan_out(turns, extracted_info)
+            
+            # 按对话顺序更新画像，后面轮次的更正覆盖前面的信息
+            for info in infos:
+                if info:
+                    self.user_profile.update(info)
+            
+            # 整批只发起一次嵌入请求
+            self.long_term_memory.save_many(self._batch_values(turns, infos))
+            
+        except Exception as e:
+            print(f"批量信息提取出错: {e}")
+            self.long_term_memory.save_many(self._batch_values(turns))
+    
+    async def _aextract_and_store_batch(self, turns: List[Dict[str, Any]]) -> None:
+        """
+        异步从一批对话中提取并存储长期记忆
+        
+        Args:
+            turns: 轮次列表
+        """
+        if not self._extract_batch(turns):
+            await asyncio.to_thread(self.long_term_memory.save_many, self._batch_values(turns))
+            return
+        
+        try:
+            extracted_info = await self.extractor.aextract(self._batch_extraction_prompt(turns))
+            infos = self._fan_out(turns, extracted_info)
+            
+            for info in infos:
+                if info:
+                    await asyncio.to_thread(self.user_profile.update, info)
+            
+            await asyncio.to_thread(self.long_term_memory.save_many, self._batch_values(turns, infos))
+            
+        except Exception as e:
+            print(f"批量信息提取出错: {e}")
+            await asyncio.to_thread(self.long_term_memory.save_many, self._batch_values(turns))
+    
+    def flush_memory(self, timeout: float = None, flush_batch: bool = False) -> bool:
+        """
+        等待所有待处理的记忆提取任务完成
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+            flush_batch: 启用批量提取时是否先提取未满的批次（会立即调用一次LLM）；
+                默认不提取，未满的批次留到凑满、到期或会话结束时处理
+            
+        Returns:
+            是否在超时前处理完所有任务
+        """
+        if flush_batch and self.extraction_batcher is not None:
+            self.extraction_batcher.flush()
+        if self.extraction_worker is None:
+            return True
+        return self.extraction_worker.flush(timeout)
+    
+    def get_extraction_metrics(self) -> Dict[str, Any]:
+        """
+        获取记忆提取的队列、门控和解析指标
+        
+        Returns:
+            队列深度、延迟等指标字典，启用门控时gate键为门控统计，
+            发生过提取时parsing键为调用次数、修复次数和浪费调用比例，
+            启用批量提取时batch键为批次统计，calls_per_100_turns为每百轮对话的LLM提取调用数
+        """
+        metrics = {}
+        if self.extraction_worker is not None:
+            metrics.update(self.extraction_worker.get_metrics())
+        if self.extraction_gate is not None:
+            metrics["gate"] = self.extraction_gate.get_stats()
+        if self._extractor is not None:
+            metrics["parsing"] = self._extractor.get_stats()
+        if self.extraction_batcher is not None:
+            metrics["batch"] = self.extraction_batcher.get_stats()
+            turns = metrics["batch"]["turns"]
+            calls = metrics["parsing"]["calls"] if "parsing" in metrics else 0
+            metrics["calls_per_100_turns"] = calls * 100 / turns if turns else 0.0
+        return metrics
+    
+    def close(self) -> None:
+        """
+        处理完剩余的记忆提取任务并停止后台线程，写入缓冲中的长期记忆
+        """
+        if self.extraction_batcher is not None:
+            # 会话结束，提取未满的批次
+            self.extraction_batcher.flush(trigger="close")
+        if self.extraction_worker is not None:
+            self.extraction_worker.stop()
+        self.long_term_memory.close()
+        self.user_profile.close()
+        self.context_pipeline.close()
+    
     def clear_memory(self) -> None:
         """
         清除所有记忆
         """
+        # 丢弃未提取的批次并处理完排队中的提取任务，避免清除后又写入旧记忆
+        if self.extraction_batcher is not None:
+            self.extraction_batcher.discard()
+        self.flush_memory()
         self.short_term_memory.clear()
         self.long_term_memory.clear()
         self.user_profile.clear()
         print("记忆已清除")
     
-    def get_profile(self) -> Dict[str, Any]:
+    def get_profile(self, flush: bool = False, timeout: float = None) -> Dict[str, Any]:
         """
         获取用户画像
         
+        Args:
+            flush: 是否先提取未满的批次，使画像包含最近几轮的信息（会立即调用一次LLM）
+            timeout: 等待排队中的提取任务的最长时间（秒），None表示一直等待，0表示不等待；
+                超时后返回当时的画像，不包含仍在处理的几轮
+        
         Returns:
-            用户画像字典
+            用户画像字典的副本
         """
+        if timeout is None or timeout > 0:
+            self.flush_memory(timeout=timeout, flush_batch=flush)
         return self.user_profile.get_profile()
     
     def show_history(self) -> None:
@@ -158,5 +763,8 @@ class MemoryAgent(BaseAgent):
             return
         
         for i, msg in enumerate(chat_history):
-            role = "用户" if hasattr(msg, "type") and msg.type == "human" else "AI"
+            if hasattr(msg, "type") and msg.type == "system":
+                role = "摘要"
+            else:
+                role = "用户" if hasattr(msg, "type") and msg.type == "human" else "AI"
             print(f"\n[{role}]: {msg.content}")
\ No newline at end of file
@@ -2,24 +2,45 @@
 简单对话Agent
 """
 
-from typing import Dict, Any
-from langchain.schema import HumanMessage, SystemMessage, AIMessage
+from typing import TYPE_CHECKING, Dict, Any, List, AsyncIterator, Iterator
+from langchain.schema import HumanMessage, SystemMessage, BaseMessage
+from src.config import config
+from src.memory.context_window import ContextWindow, count_message_tokens
 from .base import BaseAgent
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
 class SimpleAgent(BaseAgent):
     """
     简单对话Agent，具有基本的对话功能
     """
     
-    def __init__(self, user_name: str = None):
+    def __init__(self, user_name: str = None, llm: "ChatOpenAI" = None):
         """
         初始化SimpleAgent
         
         Args:
             user_name: 用户名
+            llm: 共享的LLM客户端
         """
-        super().__init__(user_name)
-        self.conversation_history = []
+        super().__init__(user_name, llm)
+        
+        # 按token预算管理的对话历史
+        self.context_window = ContextWindow(
+            summarizer=self._summarize_conversation,
+            **config.context_config
+        )
+        
+        # 系统消息只依赖user_name，渲染一次后复用
+        self._system_message = None
+    
+    @property
+    def conversation_history(self) -> List[BaseMessage]:
+        """
+        当前上下文窗口内的对话历史
+        """
+        return self.context_window.get_messages()
     
     def chat(self, user_input: str) -> str:
         """
@@ -32,24 +53,131 @@ class SimpleAgent(BaseAgent):
             助手回复
         """
         # 构建消息列表
-        messages = [SystemMessage(content=self.prompt_manager.templates["system"]["default"].format(user_name=self.user_name))]
-        messages.extend(self.conversation_history)
-        messages.append(HumanMessage(content=user_input))
+        messages = self._build_messages(user_input)
         
         # 获取回复
         response = self.llm.invoke(messages)
+        self.token_usage.record(response)
         
         # 保存对话历史
-        self.conversation_history.append(HumanMessage(content=user_input))
-        self.conversation_history.append(AIMessage(content=response.content))
+        self._save_turn(user_input, response.content)
+        
+        return response.content
+    
+    def chat_stream(self, user_input: str) -> Iterator[str]:
+        """
+        流式对话，回复完整生成后才写入对话历史
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            回复内容片段
+        """
+        messages = self._build_messages(user_input)
+        chunks = []
+        usage_chunk = None
+        for chunk in self.llm.stream(messages):
+            if chunk.usage_metadata or chunk.response_metadata:
+                usage_chunk = chunk
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        if usage_chunk is not None:
+            self.token_usage.record(usage_chunk)
+        self._save_turn(user_input, "".join(chunks))
+    
+    async def achat(self, user_input: str) -> str:
+        """
+        异步与用户对话
         
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            助手回复
+        """
+        messages = self._build_messages(user_input)
+        response = await self.llm.ainvoke(messages)
+        self.token_usage.record(response)
+        self._save_turn(user_input, response.content)
         return response.content
     
+    async def astream(self, user_input: str) -> AsyncIterator[str]:
+        """
+        异步流式对话，回复完整生成后才写入对话历史
+        
+        Args:
+            user_input: 用户输入
+            
+        Yields:
+            回复内容片段
+        """
+        messages = self._build_messages(user_input)
+        chunks = []
+        usage_chunk = None
+        async for chunk in self.llm.astream(messages):
+            if chunk.usage_metadata or chunk.response_metadata:
+                usage_chunk = chunk
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        if usage_chunk is not None:
+            self.token_usage.record(usage_chunk)
+        self._save_turn(user_input, "".join(chunks))
+    
+    def _build_messages(self, user_input: str) -> List[BaseMessage]:
+        """
+        构建发送给LLM的消息列表
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            消息列表
+        """
+        system_message = self._get_system_message()
+        human_message = HumanMessage(content=user_input)
+        
+        # 为系统提示和当前输入预留token后，将历史裁剪到预算以内
+        model = self.context_window.model
+        self.context_window.fit(
+            count_message_tokens(system_message, model) + count_message_tokens(human_message, model)
+        )
+        
+        messages = [system_message]
+        messages.extend(self.context_window.get_messages())
+        messages.append(human_message)
+        return messages
+    
+    def _get_system_message(self) -> SystemMessage:
+        """
+        获取系统消息，模板未变更时复用同一个消息对象
+        
+        Returns:
+            系统消息
+        """
+        content = self.prompt_manager.render("system", "default", user_name=self.user_name)
+        # render对同样的参数返回同一个字符串对象，模板更新后才会变化
+        if self._system_message is None or self._system_message.content is not content:
+            self._system_message = SystemMessage(content=content)
+        return self._system_message
+    
+    def _save_turn(self, user_input: str, response: str) -> None:
+        """
+        保存一轮对话到历史
+        
+        Args:
+            user_input: 用户输入
+            response: 助手回复
+        """
+        self.context_window.add_turn(user_input, response)
+    
     def clear_memory(self) -> None:
         """
         清除所有记忆
         """
-        self.conversation_history = []
+        self.context_window.clear()
         print("对话历史已清空")
     
     def get_profile(self) -> Dict[str, Any]:
@@ -70,5 +198,8 @@ class SimpleAgent(BaseAgent):
             return
         
         for i, msg in enumerate(self.conversation_history):
-            role = "用户" if isinstance(msg, HumanMessage) else "AI"
+            if isinstance(msg, SystemMessage):
+                role = "摘要"
+            else:
+                role = "用户" if isinstance(msg, HumanMessage) else "AI"
             print(f"\n[{role}]: {msg.content}")
\ No newline at end of file
@@ -2,6 +2,6 @@
 配置管理包
 """
 
-from .config import Config, config
+from .config import Config, LazyConfig, config
 
-__all__ = ["Config", "config"]
\ No newline at end of file
+__all__ = ["Config", "LazyConfig", "config"]
\ No newline at end of file
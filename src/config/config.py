@@ -4,6 +4,7 @@
 """
 
 import os
+import threading
 from typing import Dict, Any
 from dotenv import load_dotenv
 
@@ -24,6 +25,27 @@ class Config:
             "model": self._get_env("LLM_MODEL", default="deepseek-chat"),
             "temperature": float(self._get_env("LLM_TEMPERATURE", default="0.7")),
             "max_tokens": int(self._get_env("LLM_MAX_TOKENS", default="4096")),
+            # 流式调用的最后一个片段也返回token用量，用于统计上下文缓存命中
+            "stream_usage": True,
+        }
+        
+        # LLM响应缓存配置，默认关闭
+        self.llm_cache_config = {
+            "enabled": self._get_env("LLM_CACHE", default="false").lower() == "true",
+            # extraction只缓存记忆提取调用；deterministic另外缓存temperature为0的对话调用；
+            # all缓存所有非流式调用，用于测试和回放会话
+            "policy": self._get_env("LLM_CACHE_POLICY", default="extraction"),
+            "memory_size": int(self._get_env("LLM_CACHE_MEMORY_SIZE", default="256")),
+            # SQLite缓存文件，留空表示只使用进程内缓存
+            "path": self._get_env("LLM_CACHE_PATH", default="./llm_cache.sqlite") or None,
+            "max_disk_mb": float(self._get_env("LLM_CACHE_MAX_DISK_MB", default="64"))
+        }
+        
+        # 上下文窗口配置（llm_config会原样传给ChatOpenAI，因此单独存放）
+        self.context_config = {
+            "max_tokens": int(self._get_env("LLM_CONTEXT_MAX_TOKENS", default="6000")),
+            "strategy": self._get_env("LLM_CONTEXT_STRATEGY", default="evict"),
+            "model": self.llm_config["model"]
         }
         
         # 嵌入模型配置
@@ -35,14 +57,100 @@ class Config:
         self.memory_config = {
             "short_term": {
                 "memory_key": "chat_history",
-                "return_messages": True
+                "return_messages": True,
+                "max_recent_turns": int(self._get_env("SHORT_TERM_MAX_RECENT_TURNS", default="10")),
+                "max_pending_turns": 50,
+                "max_summary_chars": int(self._get_env("SHORT_TERM_MAX_SUMMARY_CHARS", default="2000")),
+                "window_turns": int(self._get_env("SHORT_TERM_WINDOW_TURNS", default="6")),
+                "window_max_tokens": int(self._get_env("SHORT_TERM_WINDOW_MAX_TOKENS", default="2000")),
+                "model": self.context_config["model"]
             },
             "long_term": {
                 "collection_name_prefix": "memory_",
-                "persist_directory_prefix": "./chroma_db_"
+                "persist_directory_prefix": "./chroma_db_",
+                # 存储布局：per_user每个用户独立的Chroma目录，shared所有用户共用一个集合并按user_name过滤
+                "layout": self._get_env("LONG_TERM_LAYOUT", default="per_user"),
+                "shared_collection_name": "memories",
+                "shared_persist_directory": self._get_env("LONG_TERM_SHARED_DIRECTORY", default="./chroma_db_shared"),
+                # 向量存储后端：chroma，或numpy（内存映射矩阵 + SQLite元数据，适合单机少量记忆）
+                "backend": self._get_env("LONG_TERM_BACKEND", default="chroma"),
+                # 写缓冲区大小：默认1即逐条写入；大于1时攒批写入，进程异常退出会丢失尚未写入的记忆
+                "buffer_size": int(self._get_env("LONG_TERM_BUFFER_SIZE", default="1")),
+                "flush_interval": float(self._get_env("LONG_TERM_FLUSH_INTERVAL", default="30.0")),
+                "batch_size": 500,
+                "embedding_cache_size": int(self._get_env("EMBEDDING_CACHE_SIZE", default="2048")),
+                "embedding_cache_path": self._get_env("EMBEDDING_CACHE_PATH", default="./embedding_cache.sqlite"),
+                "embedding_cache_max_disk_mb": float(self._get_env("EMBEDDING_CACHE_MAX_DISK_MB", default="256")),
+                "retrieval_cache_size": int(self._get_env("RETRIEVAL_CACHE_SIZE", default="128")),
+                "retrieval_cache_ttl": float(self._get_env("RETRIEVAL_CACHE_TTL", default="300")),
+                "keyword_index": self._get_env("LONG_TERM_KEYWORD_INDEX", default="true").lower() == "true",
+                "keyword_fast_path_threshold": float(self._get_env("KEYWORD_FAST_PATH_THRESHOLD", default="0.85")),
+                "rrf_k": 60,
+                "recency_weight": float(self._get_env("MEMORY_RECENCY_WEIGHT", default="0.2")),
+                "importance_weight": float(self._get_env("MEMORY_IMPORTANCE_WEIGHT", default="0.1")),
+                "half_life_days": float(self._get_env("MEMORY_HALF_LIFE_DAYS", default="30")),
+                # 识别查询中的时间范围：回忆过去对话时作为过滤条件，否则只给范围内的记忆加分
+                "auto_time_filter": self._get_env("MEMORY_AUTO_TIME_FILTER", default="false").lower() == "true"
+            },
+            "profile": {
+                "compact_every": int(self._get_env("PROFILE_COMPACT_EVERY", default="200"))
+            },
+            "profile_render": {
+                "max_tokens": int(self._get_env("PROFILE_RENDER_MAX_TOKENS", default="300")),
+                "relevant_max_tokens": int(self._get_env("PROFILE_RENDER_RELEVANT_MAX_TOKENS", default="150")),
+                "model": self.context_config["model"]
+            },
+            "context": {
+                "max_workers": 4,
+                "retrieval_timeout": float(self._get_env("CONTEXT_RETRIEVAL_TIMEOUT", default="3.0")),
+                "profile_timeout": float(self._get_env("CONTEXT_PROFILE_TIMEOUT", default="1.0")),
+                "history_timeout": float(self._get_env("CONTEXT_HISTORY_TIMEOUT", default="1.0"))
+            },
+            "extraction_gate": {
+                "enabled": self._get_env("EXTRACTION_GATE", default="true").lower() == "true",
+                "min_chars": 4,
+                "long_chars": 15,
+                "model_path": self._get_env("EXTRACTION_GATE_MODEL", default="./extraction_gate.json"),
+                "log_path": self._get_env("EXTRACTION_GATE_LOG"),
+                # 影子模式：本应跳过的对话按该比例照常提取，结果写入日志作为评估召回的标注
+                "shadow_rate": float(self._get_env("EXTRACTION_GATE_SHADOW_RATE", default="0"))
+            },
+            "consolidation": {
+                "similarity_threshold": float(self._get_env("CONSOLIDATION_SIMILARITY_THRESHOLD", default="0.92")),
+                # 超过该天数的低重要性记忆移入压缩归档，0表示不归档
+                "archive_after_days": float(self._get_env("CONSOLIDATION_ARCHIVE_AFTER_DAYS", default="0")),
+                "archive_max_importance": 0.3,
+                "archive_directory": self._get_env("CONSOLIDATION_ARCHIVE_DIRECTORY", default="./memory_archive")
+            },
+            "extraction": {
+                "background": self._get_env("EXTRACTION_BACKGROUND", default="true").lower() == "true",
+                # 排队的提取任务达到上限时不等待，之后的对话按顺序排队只保存、不提取（由后台线程写入）
+                "max_queue_size": int(self._get_env("EXTRACTION_MAX_QUEUE_SIZE", default="100")),
+                # 输出约束方式：json为接口的JSON输出模式，tool为工具调用，text为不做约束
+                "mode": self._get_env("EXTRACTION_MODE", default="json"),
+                # 本地修复失败后的重试次数
+                "max_retries": int(self._get_env("EXTRACTION_MAX_RETRIES", default="1")),
+                # 流式读取，JSON对象闭合后立即停止
+                "stream": self._get_env("EXTRACTION_STREAM", default="true").lower() == "true",
+                # 批量提取：每N轮对话调用一次LLM，1表示逐轮提取
+                "batch_turns": int(self._get_env("EXTRACTION_BATCH_TURNS", default="1")),
+                # 批次中第一轮等待提取的最长时间（秒），0表示只按轮数和会话结束触发
+                "batch_interval": float(self._get_env("EXTRACTION_BATCH_INTERVAL", default="0"))
             }
         }
         
+        # 多用户服务配置
+        self.server_config = {
+            "host": self._get_env("SERVER_HOST", default="127.0.0.1"),
+            "port": int(self._get_env("SERVER_PORT", default="8000")),
+            "max_agents": int(self._get_env("SERVER_MAX_AGENTS", default="256")),
+            "idle_timeout": float(self._get_env("SERVER_IDLE_TIMEOUT", default="600")),
+            "chroma_path": self._get_env("SERVER_CHROMA_PATH", default="./chroma_db_server"),
+            "context_workers": int(self._get_env("SERVER_CONTEXT_WORKERS", default="16")),
+            # /profile等待排队中的提取任务的最长时间（秒），0表示直接返回当前画像
+            "profile_flush_timeout": float(self._get_env("SERVER_PROFILE_FLUSH_TIMEOUT", default="0.5"))
+        }
+        
         # 用户配置
         self.user_config = {
             "default_user_name": self._get_env("DEFAULT_USER_NAME", default="chenkx")
@@ -72,6 +180,10 @@ class Config:
         """获取LLM配置"""
         return self.llm_config
     
+    def get_context_config(self) -> Dict[str, Any]:
+        """获取上下文窗口配置"""
+        return self.context_config
+    
     def get_embedding_config(self) -> Dict[str, Any]:
         """获取嵌入模型配置"""
         return self.embedding_config
@@ -80,9 +192,41 @@ class Config:
         """获取记忆配置"""
         return self.memory_config
     
+    def get_server_config(self) -> Dict[str, Any]:
+        """获取多用户服务配置"""
+        return self.server_config
+    
     def get_user_config(self) -> Dict[str, Any]:
         """获取用户配置"""
         return self.user_config
 
-# 创建全局配置实例
-config = Config()
\ No newline at end of file
+class LazyConfig:
+    """
+    全局配置的延迟代理
+    
+    第一次访问配置项时才创建Config，导入模块时不读取.env和环境变量，
+    调用方（如基准测试）可以在导入之后、首次使用之前设置环境变量。
+    """
+    
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> Config:
+        """
+        获取配置实例，首次调用时创建
+        
+        Returns:
+            配置实例
+        """
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = Config()
+        return self._instance
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+# 全局配置实例，首次访问时创建
+config = LazyConfig()
\ No newline at end of file
@@ -3,7 +3,6 @@ AI Agent 主入口
 """
 
 import json
-from src.agents import SimpleAgent, MemoryAgent
 
 def main():
     """
@@ -22,11 +21,13 @@ def main():
     while agent_type not in ["1", "2"]:
         agent_type = input("无效选择，请重新输入 (1/2): ").strip()
     
-    # 创建Agent
+    # 创建Agent，只导入所选Agent的模块
     if agent_type == "1":
+        from src.agents.simple import SimpleAgent
         agent = SimpleAgent()
         print("\n已选择 SimpleAgent")
     else:
+        from src.agents.memory_agent import MemoryAgent
         agent = MemoryAgent()
         print("\n已选择 MemoryAgent")
     
@@ -58,7 +59,7 @@ def main():
                 continue
             
             if user_input.lower() == 'profile':
-                if isinstance(agent, MemoryAgent):
+                if agent_type == "2":
                     profile = agent.get_profile()
                     print("\n📋 当前用户画像：")
                     print(json.dumps(profile, ensure_ascii=False, indent=2))
@@ -66,15 +67,20 @@ def main():
                     print("\n⚠️  SimpleAgent 不支持用户画像功能")
                 continue
             
-            # 获取AI回复
-            response = agent.chat(user_input)
-            print(f"\nAI: {response}")
+            # 流式输出AI回复
+            print("\nAI: ", end="", flush=True)
+            for chunk in agent.chat_stream(user_input):
+                print(chunk, end="", flush=True)
+            print()
             
         except KeyboardInterrupt:
             print("\n\n程序已中断")
             break
         except Exception as e:
             print(f"\n错误: {str(e)}")
+    
+    # 退出前处理完后台的记忆提取任务
+    agent.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,14 +2,69 @@
 记忆系统包
 """
 
-from .base import MemoryBase
-from .short_term import ShortTermMemory
-from .long_term import LongTermMemory
-from .user_profile import UserProfile
+from typing import TYPE_CHECKING
+from src.utils import lazy_exports
+
+_EXPORTS = {
+    "MemoryBase": ".base",
+    "ShortTermMemory": ".short_term",
+    "LongTermMemory": ".long_term",
+    "UserProfile": ".user_profile",
+    "ProfileStore": ".profile_store",
+    "ProfileRenderer": ".profile_renderer",
+    "ExtractionWorker": ".extraction_worker",
+    "ExtractionGate": ".extraction_gate",
+    "ExtractionBatcher": ".extraction_batcher",
+    "StructuredExtractor": ".structured_extraction",
+    "ContextWindow": ".context_window",
+    "count_tokens": ".context_window",
+    "CachedEmbeddings": ".embedding_cache",
+    "VectorBackend": ".vector_backend",
+    "ChromaVectorBackend": ".vector_backend",
+    "NumpyVectorBackend": ".numpy_backend",
+    "KeywordIndex": ".keyword_index",
+    "MemoryConsolidator": ".consolidation",
+    "MemoryArchive": ".consolidation"
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
+
+if TYPE_CHECKING:
+    from .base import MemoryBase
+    from .short_term import ShortTermMemory
+    from .long_term import LongTermMemory
+    from .user_profile import UserProfile
+    from .profile_store import ProfileStore
+    from .profile_renderer import ProfileRenderer
+    from .extraction_worker import ExtractionWorker
+    from .extraction_gate import ExtractionGate
+    from .extraction_batcher import ExtractionBatcher
+    from .structured_extraction import StructuredExtractor
+    from .context_window import ContextWindow, count_tokens
+    from .embedding_cache import CachedEmbeddings
+    from .vector_backend import VectorBackend, ChromaVectorBackend
+    from .numpy_backend import NumpyVectorBackend
+    from .keyword_index import KeywordIndex
+    from .consolidation import MemoryConsolidator, MemoryArchive
 
 __all__ = [
     "MemoryBase",
     "ShortTermMemory",
     "LongTermMemory",
-    "UserProfile"
+    "UserProfile",
+    "ProfileStore",
+    "ProfileRenderer",
+    "ExtractionWorker",
+    "ExtractionGate",
+    "ExtractionBatcher",
+    "StructuredExtractor",
+    "ContextWindow",
+    "count_tokens",
+    "CachedEmbeddings",
+    "VectorBackend",
+    "ChromaVectorBackend",
+    "NumpyVectorBackend",
+    "KeywordIndex",
+    "MemoryConsolidator",
+    "MemoryArchive"
 ]
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+历史对话批量导入工具
+
+将历史对话批量写入长期记忆，每批文档只发起一次嵌入请求。
+输入文件为JSON Lines，每行一条对话记录：
+    {"user_input": "...", "assistant_response": "...", "extracted_info": {...}, "timestamp": "..."}
+其中extracted_info和timestamp可选。
+
+用法：
+    python -m src.memory.bulk_import history.jsonl --user chenkx --batch-size 500
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict, Iterator, List
+from src.config import config
+from .long_term import LongTermMemory
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐行读取对话记录
+    
+    Args:
+        path: JSON Lines文件路径
+    
+    Yields:
+        对话记录字典
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"第{line_no}行解析失败，已跳过: {e}")
+                continue
+            if isinstance(record, dict) and "user_input" in record:
+                yield record
+
+def bulk_import(memory: LongTermMemory, records: Iterator[Dict[str, Any]],
+                batch_size: int = 500) -> int:
+    """
+    分批将对话记录写入长期记忆
+    
+    Args:
+        memory: 长期记忆实例
+        records: 对话记录迭代器
+        batch_size: 每批记录数
+    
+    Returns:
+        写入的文档总数
+    """
+    total = 0
+    batch: List[Dict[str, Any]] = []
+    start = time.perf_counter()
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            total += memory.save_many(batch)
+            batch = []
+            elapsed = time.perf_counter() - start
+            print(f"已导入 {total} 条记忆，{total / elapsed:.1f} 条/秒")
+    if batch:
+        total += memory.save_many(batch)
+    return total
+
+def main():
+    """
+    命令行入口
+    """
+    parser = argparse.ArgumentParser(description="批量导入历史对话到长期记忆")
+    parser.add_argument("path", help="JSON Lines格式的历史对话文件")
+    parser.add_argument("--user", default=None, help="用户名，默认使用配置中的默认用户名")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批写入的记录数")
+    args = parser.parse_args()
+    
+    memory = LongTermMemory(
+        api_key=config.api_key,
+        base_url=config.base_url,
+        user_name=args.user or config.user_config["default_user_name"],
+        **config.memory_config["long_term"]
+    )
+    
+    start = time.perf_counter()
+    total = bulk_import(memory, read_records(args.path), batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"导入完成：共 {total} 条记忆，耗时 {elapsed:.1f} 秒")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
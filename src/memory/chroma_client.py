@@ -0,0 +1,29 @@
+"""
+进程内共享的Chroma客户端
+"""
+
+import os
+import threading
+from typing import Any, Dict
+
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+def get_shared_client(persist_directory: str) -> Any:
+    """
+    获取指定目录的Chroma客户端，同一目录在进程内只打开一次
+    
+    Args:
+        persist_directory: 持久化目录
+    
+    Returns:
+        chromadb.PersistentClient实例
+    """
+    path = os.path.abspath(persist_directory)
+    with _lock:
+        client = _clients.get(path)
+        if client is None:
+            import chromadb
+            client = chromadb.PersistentClient(path=path)
+            _clients[path] = client
+        return client
\ No newline at end of file
@@ -0,0 +1,422 @@
+"""
+长期记忆整理任务
+
+每轮对话都会写入一条新记忆，同一件事反复提起会留下大量近似重复的文档，
+集合和检索延迟随之无限增长。整理任务离线或在后台运行：
+1. 按记忆类型分组，将向量余弦相似度不低于阈值的记忆聚成一簇；
+2. 每簇合并为一条整理后的记忆（保留最新一条的内容，记录提及次数和最早时间），删除原记忆；
+3. 可选地将长时间未更新且重要性低的记忆移入gzip压缩的归档文件，需要时可以恢复。
+整理前后各测一次集合大小和检索的p95延迟。
+
+用法：
+    python -m src.memory.consolidation --user chenkx --archive-after-days 180
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from langchain.schema import Document
+from src.config import config
+from .long_term import LongTermMemory
+from .ranking import score_importance, to_timestamp
+
+class MemoryArchive:
+    """
+    冷记忆归档，每个用户一个gzip压缩的JSON Lines文件
+    
+    向量以float16存储，恢复时不需要重新调用嵌入接口。
+    """
+    
+    def __init__(self, directory: str, user_name: str):
+        """
+        初始化归档
+        
+        Args:
+            directory: 归档目录
+            user_name: 用户名
+        """
+        self.path = os.path.join(directory, f"{user_name}.jsonl.gz")
+    
+    def append(self, ids: List[str], vectors: np.ndarray, docs: List[Document]) -> None:
+        """
+        追加归档记忆，每次追加写入一个新的gzip成员
+        
+        Args:
+            ids: 文档ID
+            vectors: 文档向量
+            docs: 文档
+        """
+        if ids:
+            self._write(self.path, "at", ids, vectors, docs)
+    
+    @staticmethod
+    def _write(path: str, mode: str, ids: List[str], vectors: np.ndarray, docs: List[Document]) -> None:
+        """
+        将记忆写入gzip文件
+        
+        Args:
+            path: 文件路径
+            mode: 打开模式，at为追加，wt为覆盖
+            ids: 文档ID
+            vectors: 文档向量
+            docs: 文档
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with gzip.open(path, mode, encoding="utf-8") as f:
+            for doc_id, vector, doc in zip(ids, vectors, docs):
+                record = {
+                    "id": doc_id,
+                    "content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "vector": base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode("ascii")
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def load(self) -> Iterator[Dict[str, Any]]:
+        """
+        逐条读取归档记忆
+        
+        Yields:
+            包含id、document和vector的字典
+        """
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield {
+                    "id": record["id"],
+                    "document": Document(page_content=record["content"], metadata=record["metadata"]),
+                    "vector": np.frombuffer(base64.b64decode(record["vector"]), dtype=np.float16).astype(np.float32)
+                }
+    
+    def restore(self, memory: LongTermMemory, ids: Optional[List[str]] = None) -> int:
+        """
+        将归档记忆写回长期记忆，并从归档中移除
+        
+        Args:
+            memory: 长期记忆
+            ids: 要恢复的文档ID，None表示全部恢复
+        
+        Returns:
+            恢复的文档数
+        """
+        wanted = None if ids is None else set(ids)
+        restored, kept = [], []
+        for record in self.load():
+            if wanted is None or record["id"] in wanted:
+                restored.append(record)
+            else:
+                kept.append(record)
+        if not restored:
+            return 0
+        
+        memory.replace_documents(
+            [],
+            [record["id"] for record in restored],
+            [record["vector"].tolist() for record in restored],
+            [record["document"] for record in restored]
+        )
+        # 剩余的记忆写入临时文件后整体替换
+        temp_path = self.path + ".tmp"
+        self._write(
+            temp_path,
+            "wt",
+            [record["id"] for record in kept],
+            [record["vector"] for record in kept],
+            [record["document"] for record in kept]
+        )
+        os.replace(temp_path, self.path)
+        return len(restored)
+    
+    def size(self) -> int:
+        """
+        归档文件的字节数
+        """
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+class MemoryConsolidator:
+    """长期记忆的去重合并与冷记忆归档"""
+    
+    def __init__(self, memory: LongTermMemory, similarity_threshold: float = 0.92,
+                 archive_after_days: float = 0, archive_max_importance: float = 0.3,
+                 archive_directory: str = "./memory_archive", block_size: int = 256):
+        """
+        初始化整理任务
+        
+        Args:
+            memory: 要整理的长期记忆
+            similarity_threshold: 余弦相似度不低于该值的同类型记忆视为近似重复
+            archive_after_days: 超过该天数且未被合并的低重要性记忆移入归档，0表示不归档
+            archive_max_importance: 归档记忆的重要性上限
+            archive_directory: 归档目录
+            block_size: 聚类时每次与全部记忆计算相似度的行数
+        """
+        self.memory = memory
+        self.similarity_threshold = similarity_threshold
+        self.archive_after_days = archive_after_days
+        self.archive_max_importance = archive_max_importance
+        self.archive = MemoryArchive(archive_directory, memory.user_name)
+        self.block_size = block_size
+    
+    def run(self, dry_run: bool = False, latency_queries: int = 50, k: int = 3) -> Dict[str, Any]:
+        """
+        执行一次整理
+        
+        Args:
+            dry_run: 只统计会合并和归档的记忆，不修改数据
+            latency_queries: 测量检索延迟时的查询次数，查询向量从已有记忆中抽取
+            k: 测量检索延迟时的返回条数
+        
+        Returns:
+            整理报告
+        """
+        start = time.perf_counter()
+        ids, vectors, docs = self.memory.export_documents()
+        if ids:
+            matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        
+        rng = np.random.default_rng(0)
+        queries = matrix[rng.choice(len(ids), size=min(latency_queries, len(ids)), replace=False)]
+        report = {
+            "size_before": len(ids),
+            "p95_ms_before": self.measure_latency(queries, k)
+        }
+        
+        clusters = self.cluster(matrix, docs)
+        merged = [members for members in clusters if len(members) > 1]
+        singles = [members[0] for members in clusters if len(members) == 1]
+        cold = self._select_cold(singles, docs)
+        
+        report["clusters"] = len(merged)
+        report["merged"] = sum(len(members) for members in merged)
+        report["archived"] = len(cold)
+        
+        if not dry_run:
+            new_ids, new_vectors, new_docs = [], [], []
+            for members in merged:
+                new_ids.append(uuid.uuid4().hex)
+                new_vectors.append(self._normalize(matrix[members].mean(axis=0, keepdims=True))[0].tolist())
+                new_docs.append(self._merge_documents([docs[i] for i in members]))
+            
+            # 先写归档再删除，归档失败时不会丢失记忆
+            self.archive.append([ids[i] for i in cold], matrix[cold], [docs[i] for i in cold])
+            remove_ids = [ids[i] for members in merged for i in members] + [ids[i] for i in cold]
+            self.memory.replace_documents(remove_ids, new_ids, new_vectors, new_docs)
+            self.memory.backend.compact()
+        
+        report["size_after"] = self.memory.get_size()
+        report["p95_ms_after"] = self.measure_latency(queries, k)
+        report["archive_bytes"] = self.archive.size()
+        report["elapsed"] = time.perf_counter() - start
+        return report
+    
+    def cluster(self, matrix: np.ndarray, docs: List[Document]) -> List[List[int]]:
+        """
+        贪心聚类：按时间从新到旧取尚未归簇的记忆作为中心，
+        将与其相似度不低于阈值的同类型未归簇记忆并入
+        
+        Args:
+            matrix: 归一化后的向量矩阵
+            docs: 对应的文档
+        
+        Returns:
+            每簇的下标列表，中心在首位
+        """
+        n = len(docs)
+        if n == 0:
+            return []
+        _, types = np.unique([str(doc.metadata.get("type", "")) for doc in docs], return_inverse=True)
+        # 没有时间的旧记忆排在最后
+        ts = np.array([self._timestamp(doc) or 0.0 for doc in docs], dtype=np.float64)
+        order = np.argsort(-ts, kind="stable")
+        assigned = np.zeros(n, dtype=bool)
+        clusters = []
+        
+        for block_start in range(0, n, self.block_size):
+            block = order[block_start:block_start + self.block_size]
+            # 一次矩阵乘法算出这批中心与全部记忆的相似度
+            similarities = matrix[block] @ matrix.T
+            for offset, center in enumerate(block):
+                if assigned[center]:
+                    continue
+                candidates = np.flatnonzero(similarities[offset] >= self.similarity_threshold)
+                candidates = candidates[~assigned[candidates] & (types[candidates] == types[center])]
+                members = [int(center)] + [int(i) for i in candidates if i != center]
+                assigned[members] = True
+                clusters.append(members)
+        return clusters
+    
+    def measure_latency(self, queries: np.ndarray, k: int = 3) -> float:
+        """
+        测量向量检索的p95延迟
+        
+        Args:
+            queries: 查询向量
+            k: 返回条数
+        
+        Returns:
+            p95延迟（毫秒），没有查询时为0
+        """
+        if len(queries) == 0:
+            return 0.0
+        latencies = []
+        for query in queries:
+            begin = time.perf_counter()
+            self.memory.backend.search(query.tolist(), k=k, where=self.memory._filter)
+            latencies.append((time.perf_counter() - begin) * 1000)
+        return float(np.percentile(latencies, 95))
+    
+    def _select_cold(self, candidates: List[int], docs: List[Document]) -> List[int]:
+        """
+        选出需要归档的冷记忆
+        
+        Args:
+            candidates: 未被合并的记忆下标
+            docs: 全部文档
+        
+        Returns:
+            冷记忆下标
+        """
+        if self.archive_after_days <= 0:
+            return []
+        cutoff = time.time() - self.archive_after_days * 86400
+        cold = []
+        for i in candidates:
+            ts = self._timestamp(docs[i])
+            # 无法确定时间的记忆不归档
+            if ts is None or ts >= cutoff:
+                continue
+            if self._importance(docs[i]) <= self.archive_max_importance:
+                cold.append(i)
+        return cold
+    
+    @staticmethod
+    def _timestamp(doc: Document) -> Optional[float]:
+        """
+        记忆的时间戳，早期写入的记忆没有ts字段时按timestamp解析
+        
+        Args:
+            doc: 文档
+        
+        Returns:
+            时间戳，无法确定时返回None
+        """
+        ts = doc.metadata.get("ts")
+        if ts is None:
+            ts = to_timestamp(doc.metadata.get("timestamp"))
+        return ts
+    
+    @staticmethod
+    def _importance(doc: Document) -> float:
+        """
+        记忆的重要性，早期写入的记忆没有importance字段时按内容估算，与MemoryRanker一致
+        
+        Args:
+            doc: 文档
+        
+        Returns:
+            0到1之间的重要性
+        """
+        importance = doc.metadata.get("importance")
+        if importance is None:
+            importance = score_importance(
+                doc.metadata.get("user_input") or doc.page_content,
+                1 if doc.metadata.get("type") == "conversation_with_extraction" else 0
+            )
+        return importance
+    
+    @staticmethod
+    def _merge_documents(docs: List[Document]) -> Document:
+        """
+        将一簇近似重复的记忆合并为一条
+        
+        Args:
+            docs: 簇内文档，首位为最新的一条
+        
+        Returns:
+            合并后的文档，元数据沿用最新一条，重要性取最大值
+        """
+        latest = docs[0]
+        mentions = sum(doc.metadata.get("mentions", 1) for doc in docs)
+        first_timestamp = min(
+            (doc.metadata.get("first_timestamp") or doc.metadata.get("timestamp", "") for doc in docs),
+            key=lambda value: str(value)
+        )
+        metadata = dict(
+            latest.metadata,
+            importance=max(MemoryConsolidator._importance(doc) for doc in docs),
+            mentions=mentions,
+            first_timestamp=first_timestamp
+        )
+        content = latest.page_content.split("\n相似记忆:")[0]
+        return Document(
+            page_content=f"{content}\n相似记忆: 共提及{mentions}次，最早于{first_timestamp}",
+            metadata=metadata
+        )
+    
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """
+        按行归一化
+        """
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+def main():
+    """
+    命令行入口
+    """
+    settings = config.memory_config["consolidation"]
+    parser = argparse.ArgumentParser(description="合并近似重复的长期记忆并归档冷记忆")
+    parser.add_argument("--user", default=config.user_config["default_user_name"], help="用户名")
+    parser.add_argument("--threshold", type=float, default=settings["similarity_threshold"], help="近似重复的相似度阈值")
+    parser.add_argument("--archive-after-days", type=float, default=settings["archive_after_days"],
+                        help="归档超过该天数的低重要性记忆，0表示不归档")
+    parser.add_argument("--archive-max-importance", type=float, default=settings["archive_max_importance"],
+                        help="归档记忆的重要性上限")
+    parser.add_argument("--archive-directory", default=settings["archive_directory"], help="归档目录")
+    parser.add_argument("--restore", action="store_true", help="将归档的记忆全部恢复到长期记忆")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改数据")
+    args = parser.parse_args()
+    
+    memory = LongTermMemory(
+        api_key=config.api_key,
+        base_url=config.base_url,
+        user_name=args.user,
+        **config.memory_config["long_term"]
+    )
+    try:
+        consolidator = MemoryConsolidator(
+            memory,
+            similarity_threshold=args.threshold,
+            archive_after_days=args.archive_after_days,
+            archive_max_importance=args.archive_max_importance,
+            archive_directory=args.archive_directory
+        )
+        if args.restore:
+            count = consolidator.archive.restore(memory)
+            print(f"已从归档恢复 {count} 条记忆")
+            return
+        
+        report = consolidator.run(dry_run=args.dry_run)
+        print(f"用户 {args.user}{'（试运行）' if args.dry_run else ''}:")
+        print(f"  记忆条数: {report['size_before']} -> {report['size_after']}")
+        print(f"  合并: {report['merged']} 条记忆合并为 {report['clusters']} 条")
+        print(f"  归档: {report['archived']} 条，归档文件 {report['archive_bytes'] / 1024:.1f} KB")
+        print(f"  检索p95: {report['p95_ms_before']:.2f}ms -> {report['p95_ms_after']:.2f}ms")
+        print(f"  耗时: {report['elapsed']:.1f} 秒")
+    finally:
+        memory.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,210 @@
+"""
+按token预算管理的对话上下文窗口
+"""
+
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Optional
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# 每条消息的格式开销（角色、分隔符等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """
+    获取并缓存分词器
+    
+    Args:
+        model: 模型名称
+    
+    Returns:
+        tiktoken分词器，tiktoken不可用或编码文件无法加载时返回None（结果同样被缓存）
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception as e:
+        # 首次使用时需要下载编码文件，离线或无法访问时退回按字符估算
+        print(f"加载tiktoken编码失败，改用字符估算: {e}")
+        return None
+    try:
+        # 非OpenAI模型（如deepseek-chat）使用通用编码近似
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"加载tiktoken编码失败，改用字符估算: {e}")
+        return None
+
+
+@lru_cache(maxsize=1024)
+def count_tokens(text: str, model: str = "deepseek-chat") -> int:
+    """
+    统计文本的token数，重复出现的文本（如系统提示）直接命中缓存
+    
+    Args:
+        text: 文本
+        model: 模型名称
+    
+    Returns:
+        token数
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # 没有分词器时粗略估算：中日韩字符按1个token计，其余按4个字符1个token计
+    cjk = sum(1 for char in text if "\u2e80" <= char <= "\u9fff")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_message_tokens(message: BaseMessage, model: str = "deepseek-chat") -> int:
+    """
+    统计单条消息的token数（含格式开销）
+    
+    Args:
+        message: 消息
+        model: 模型名称
+    
+    Returns:
+        token数
+    """
+    return count_tokens(message.content, model) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """
+    按token预算管理对话历史
+    
+    每轮对话只在加入时统计一次token并维护累计值，超出预算时从最早的轮次开始
+    淘汰；strategy为summarize时，被淘汰的轮次会合并进一段滚动摘要。
+    """
+    
+    def __init__(self, max_tokens: int = 6000, strategy: str = "evict",
+                 model: str = "deepseek-chat",
+                 summarizer: Optional[Callable[[str, List[BaseMessage]], str]] = None):
+        """
+        初始化上下文窗口
+        
+        Args:
+            max_tokens: 整个提示词（系统提示、历史、当前输入）的token预算
+            strategy: 超出预算时的处理方式，evict直接淘汰，summarize摘要后淘汰
+            model: 用于选择分词器的模型名称
+            summarizer: 摘要函数，接收已有摘要和被淘汰的消息，返回新摘要
+        """
+        self.max_tokens = max_tokens
+        self.strategy = strategy
+        self.model = model
+        self.summarizer = summarizer
+        
+        # 每个元素为 (用户消息, AI消息, 该轮token数)
+        self._turns = deque()
+        self._history_tokens = 0
+        self.summary = ""
+        self._summary_tokens = 0
+    
+    @property
+    def total_tokens(self) -> int:
+        """当前历史（含摘要）的token数"""
+        return self._history_tokens + self._summary_tokens
+    
+    def add_turn(self, user_input: str, response: str) -> None:
+        """
+        加入一轮对话
+        
+        Args:
+            user_input: 用户输入
+            response: 助手回复
+        """
+        human = HumanMessage(content=user_input)
+        ai = AIMessage(content=response)
+        tokens = count_message_tokens(human, self.model) + count_message_tokens(ai, self.model)
+        self._turns.append((human, ai, tokens))
+        self._history_tokens += tokens
+    
+    def fit(self, reserved_tokens: int = 0) -> None:
+        """
+        淘汰最早的轮次，使历史加上预留部分不超过预算
+        
+        Args:
+            reserved_tokens: 预留给系统提示和当前输入的token数
+        """
+        budget = max(self.max_tokens - reserved_tokens, 0)
+        evicted = self._evict(budget)
+        
+        if evicted and self.strategy == "summarize" and self.summarizer is not None:
+            self._summarize(evicted)
+            # 新摘要变长后可能再次超出预算
+            self._evict(budget)
+        
+        # 摘要本身超出预算时只能丢弃
+        if self.total_tokens > budget:
+            self._set_summary("")
+    
+    def get_messages(self) -> List[BaseMessage]:
+        """
+        获取窗口内的消息列表
+        
+        Returns:
+            消息列表，存在摘要时以系统消息形式放在最前
+        """
+        messages = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"此前对话摘要：{self.summary}"))
+        for human, ai, _ in self._turns:
+            messages.extend([human, ai])
+        return messages
+    
+    def clear(self) -> None:
+        """清空窗口"""
+        self._turns.clear()
+        self._history_tokens = 0
+        self._set_summary("")
+    
+    def __len__(self) -> int:
+        return len(self._turns)
+    
+    def _evict(self, budget: int) -> List[BaseMessage]:
+        """
+        从最早的轮次开始淘汰，直到不超过预算
+        
+        Args:
+            budget: 历史可用的token数
+            
+        Returns:
+            被淘汰的消息
+        """
+        evicted = []
+        while self._turns and self.total_tokens > budget:
+            human, ai, tokens = self._turns.popleft()
+            self._history_tokens -= tokens
+            evicted.extend([human, ai])
+        return evicted
+    
+    def _summarize(self, evicted: List[BaseMessage]) -> None:
+        """
+        将被淘汰的消息合并进摘要
+        
+        Args:
+            evicted: 被淘汰的消息
+        """
+        try:
+            self._set_summary(self.summarizer(self.summary, evicted))
+        except Exception as e:
+            print(f"对话摘要出错: {e}")
+    
+    def _set_summary(self, summary: str) -> None:
+        """
+        更新摘要及其token数
+        
+        Args:
+            summary: 摘要文本
+        """
+        self.summary = summary
+        self._summary_tokens = count_tokens(summary, self.model) + MESSAGE_OVERHEAD_TOKENS if summary else 0
\ No newline at end of file
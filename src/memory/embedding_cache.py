@@ -0,0 +1,294 @@
+"""
+嵌入向量缓存
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from src.utils import LRUCache
+
+class CachedEmbeddings(Embeddings):
+    """
+    带缓存的嵌入模型包装
+    
+    以“模型名 + 文本哈希”为键，先查进程内LRU缓存，再查磁盘上的SQLite缓存，
+    都未命中的文本才合并成一次请求发给底层嵌入模型。磁盘缓存超出容量时淘汰最久未访问的向量。
+    """
+    
+    def __init__(self, embeddings: Embeddings, model: str,
+                 cache_size: int = 2048, cache_path: Optional[str] = None,
+                 max_disk_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化嵌入缓存
+        
+        Args:
+            embeddings: 底层嵌入模型
+            model: 模型名称，作为缓存键的一部分
+            cache_size: 进程内缓存的最大条目数
+            cache_path: SQLite缓存文件路径，None表示只使用进程内缓存
+            max_disk_bytes: 磁盘缓存中向量的最大总字节数
+        """
+        self.embeddings = embeddings
+        self.model = model
+        self.memory_cache = LRUCache(maxsize=cache_size)
+        self.max_disk_bytes = max_disk_bytes
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_bytes = 0
+        if cache_path:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed REAL NOT NULL DEFAULT 0)"
+            )
+            # 旧版本的缓存文件没有访问时间，按最早访问处理
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")}
+            if "accessed" not in columns:
+                self._db.execute("ALTER TABLE embeddings ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()[0]
+            if self._disk_bytes > self.max_disk_bytes:
+                self.evictions += self._evict()
+                self._db.commit()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        计算文档向量，未命中缓存的文本合并为一次请求
+        
+        Args:
+            texts: 文本列表
+        
+        Returns:
+            向量列表
+        """
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self._store(keys, vectors, missing, computed)
+        return vectors
+    
+    def embed_query(self, text: str) -> List[float]:
+        """
+        计算查询向量
+        
+        Args:
+            text: 查询文本
+        
+        Returns:
+            向量
+        """
+        keys, vectors, missing = self._lookup([text])
+        if missing:
+            self._store(keys, vectors, missing, [self.embeddings.embed_query(text)])
+        return vectors[0]
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        异步计算文档向量
+        
+        Args:
+            texts: 文本列表
+        
+        Returns:
+            向量列表
+        """
+        keys, vectors, missing = self._lookup(texts)
+        if missing:
+            computed = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            self._store(keys, vectors, missing, computed)
+        return vectors
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        异步计算查询向量
+        
+        Args:
+            text: 查询文本
+        
+        Returns:
+            向量
+        """
+        keys, vectors, missing = self._lookup([text])
+        if missing:
+            self._store(keys, vectors, missing, [await self.embeddings.aembed_query(text)])
+        return vectors[0]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存命中统计
+        
+        Returns:
+            包含内存命中、磁盘命中、未命中次数、命中率和磁盘占用的字典
+        """
+        with self._stats_lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "disk_bytes": self._disk_bytes,
+                "disk_evictions": self.evictions
+            }
+    
+    def _key(self, text: str) -> str:
+        """
+        计算缓存键
+        
+        Args:
+            text: 文本
+        
+        Returns:
+            模型名与文本哈希组成的键
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{digest}"
+    
+    def _lookup(self, texts: List[str]):
+        """
+        依次查询内存缓存和磁盘缓存
+        
+        Args:
+            texts: 文本列表
+        
+        Returns:
+            (缓存键列表, 向量列表（未命中处为None）, 未命中文本的下标列表)
+        """
+        keys = [self._key(text) for text in texts]
+        vectors = [self.memory_cache.get(key) for key in keys]
+        memory_hits = sum(1 for vector in vectors if vector is not None)
+        
+        disk_hits = 0
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing and self._db is not None:
+            found = self._read_disk([keys[i] for i in missing])
+            for i in missing:
+                vector = found.get(keys[i])
+                if vector is not None:
+                    vectors[i] = vector
+                    self.memory_cache.set(keys[i], vector)
+                    disk_hits += 1
+            missing = [i for i in missing if vectors[i] is None]
+        
+        with self._stats_lock:
+            self.memory_hits += memory_hits
+            self.disk_hits += disk_hits
+            self.misses += len(missing)
+        return keys, vectors, missing
+    
+    def _store(self, keys: List[str], vectors: List[Optional[List[float]]],
+               missing: List[int], computed: List[List[float]]) -> None:
+        """
+        将新计算的向量填回结果并写入两级缓存
+        
+        Args:
+            keys: 缓存键列表
+            vectors: 向量列表，会被原地填充
+            missing: 未命中文本的下标列表
+            computed: 新计算的向量，与missing一一对应
+        """
+        rows = {}
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            self.memory_cache.set(keys[i], vector)
+            rows[keys[i]] = array("f", vector).tobytes()
+        
+        if self._db is None or not rows:
+            return
+        now = time.time()
+        with self._db_lock:
+            # 并发请求可能已经写入了同一个键，按差值更新总大小
+            replaced = sum(size for _, size in self._select(list(rows), "LENGTH(vector)"))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, accessed) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in rows.items()]
+            )
+            self._disk_bytes += sum(len(blob) for blob in rows.values()) - replaced
+            evicted = self._evict()
+            self._db.commit()
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+    
+    def _read_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        从SQLite缓存批量读取向量
+        
+        Args:
+            keys: 缓存键列表
+        
+        Returns:
+            键到向量的字典
+        """
+        with self._db_lock:
+            found = {key: array("f", blob).tolist() for key, blob in self._select(keys, "vector")}
+            if found:
+                # 记录访问时间，淘汰时保留最近用到的向量
+                self._db.executemany(
+                    "UPDATE embeddings SET accessed = ? WHERE key = ?",
+                    [(time.time(), key) for key in found]
+                )
+                self._db.commit()
+        return found
+    
+    def _select(self, keys: List[str], column: str) -> List[tuple]:
+        """
+        按键批量查询一列，调用方需持有数据库锁
+        
+        Args:
+            keys: 缓存键列表
+            column: 查询的列或表达式
+        
+        Returns:
+            (键, 值)列表
+        """
+        rows = []
+        # SQLite单条语句的参数个数有限，分批查询
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(self._db.execute(
+                f"SELECT key, {column} FROM embeddings WHERE key IN ({placeholders})", chunk
+            ).fetchall())
+        return rows
+    
+    def _evict(self) -> int:
+        """
+        淘汰最久未访问的向量，直到总大小降到上限的90%，调用方需持有数据库锁
+        
+        Returns:
+            淘汰的条目数
+        """
+        if self._disk_bytes <= self.max_disk_bytes:
+            return 0
+        target = self._disk_bytes - int(self.max_disk_bytes * 0.9)
+        keys = []
+        freed = 0
+        for key, size in self._db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY accessed"):
+            keys.append(key)
+            freed += size
+            if freed >= target:
+                break
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            self._db.execute(f"DELETE FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+        self._disk_bytes -= freed
+        return len(keys)
\ No newline at end of file
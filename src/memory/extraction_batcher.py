@@ -0,0 +1,142 @@
+"""
+多轮批量记忆提取
+
+逐轮提取时每轮对话都要调用一次LLM，而且每次只能看到一问一答。批量提取先累积对话，
+满N轮、距第一轮超过T秒或会话结束时，把这一批对话放进一次调用中提取，
+再把各轮的结果分发给用户画像和长期记忆。
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+class ExtractionBatcher:
+    """
+    累积待提取的对话轮次，凑满一批后交给处理函数
+    """
+    
+    def __init__(self, handler: Callable[[List[Dict[str, Any]]], None],
+                 batch_turns: int = 5, batch_interval: float = 0.0):
+        """
+        初始化批量提取
+        
+        Args:
+            handler: 批次处理函数，接收轮次列表，每项包含user_input、assistant_response和timestamp
+            batch_turns: 每批的轮数
+            batch_interval: 批次中第一轮等待提取的最长时间（秒），0表示只按轮数和会话结束触发
+        """
+        if batch_turns < 1:
+            raise ValueError("batch_turns必须大于0")
+        self.handler = handler
+        self.batch_turns = batch_turns
+        self.batch_interval = batch_interval
+        self._turns = []
+        self._lock = threading.Lock()
+        self._timer = None
+        
+        # 统计指标
+        self._added = 0
+        self._batched = 0
+        self._batches = 0
+        self._triggers = Counter()
+    
+    def add(self, user_input: str, assistant_response: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        加入一轮对话
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        
+        Returns:
+            凑满一批时返回该批次，由调用方处理（以便异步调用方自行调度）；否则返回None
+        """
+        turn = {
+            "user_input": user_input,
+            "assistant_response": assistant_response,
+            "timestamp": datetime.now().isoformat()
+        }
+        with self._lock:
+            self._turns.append(turn)
+            self._added += 1
+            if len(self._turns) >= self.batch_turns:
+                return self._take("turns")
+            if self.batch_interval > 0 and self._timer is None:
+                # 批次的第一轮，启动定时提取
+                self._timer = threading.Timer(self.batch_interval, self.flush, kwargs={"trigger": "interval"})
+                self._timer.daemon = True
+                self._timer.start()
+        return None
+    
+    def flush(self, trigger: str = "flush") -> int:
+        """
+        立即处理未满的批次
+        
+        Args:
+            trigger: 触发原因，计入统计
+        
+        Returns:
+            处理的轮数
+        """
+        with self._lock:
+            turns = self._take(trigger)
+        if turns:
+            self.handler(turns)
+        return len(turns)
+    
+    def discard(self) -> int:
+        """
+        丢弃未处理的对话
+        
+        Returns:
+            丢弃的轮数
+        """
+        with self._lock:
+            turns = self._turns
+            self._turns = []
+            self._cancel_timer()
+        return len(turns)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取批量提取统计
+        
+        Returns:
+            包含累计轮数、批次数、平均批次大小、待提取轮数和各触发原因计数的字典
+        """
+        with self._lock:
+            return {
+                "turns": self._added,
+                "batches": self._batches,
+                "avg_batch_size": self._batched / self._batches if self._batches else 0.0,
+                "pending": len(self._turns),
+                "triggers": dict(self._triggers)
+            }
+    
+    def _take(self, trigger: str) -> List[Dict[str, Any]]:
+        """
+        取出当前批次，调用方需持有锁
+        
+        Args:
+            trigger: 触发原因
+        
+        Returns:
+            轮次列表
+        """
+        turns = self._turns
+        self._turns = []
+        self._cancel_timer()
+        if turns:
+            self._batches += 1
+            self._batched += len(turns)
+            self._triggers[trigger] += 1
+        return turns
+    
+    def _cancel_timer(self) -> None:
+        """
+        取消定时提取，调用方需持有锁
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
\ No newline at end of file
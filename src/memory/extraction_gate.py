@@ -0,0 +1,295 @@
+"""
+记忆提取前的门控
+
+每轮对话都调用一次LLM提取画像信息代价很高，而“谢谢”“好的”和单纯的提问几乎不会产生画像条目。
+门控在提取之前用本地规则（长度、关键词、个人陈述句式）和可选的轻量线性模型判断是否值得提取，
+并统计被跳过的调用数。
+
+被跳过的对话没有提取结果，无法据此评估召回。影子模式按比例抽取一部分本应跳过的对话照常提取，
+提取结果作为标注写入日志，离线评估时即可统计门控漏掉的画像信息。
+"""
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional, Tuple
+from src.utils import tokenize
+from .ranking import PERSONAL_PATTERN
+
+# 去掉标点、空白和表情后再判断是否为客套话
+_STRIP_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+_ACKNOWLEDGEMENTS = {
+    "谢谢", "多谢", "感谢", "谢啦", "好的", "好", "好吧", "行", "可以", "嗯", "嗯嗯", "哦", "噢", "哈哈", "哈哈哈",
+    "明白", "明白了", "知道了", "收到", "了解", "没事", "没问题", "再见", "拜拜", "晚安", "早安", "你好", "在吗",
+    "ok", "okay", "thanks", "thankyou", "thx", "yes", "no", "yeah", "sure", "cool", "bye", "hi", "hello", "lol"
+}
+
+# 画像相关的话题词，与第一人称同时出现时很可能包含个人信息
+_FACT_PATTERN = re.compile(
+    r"生日|年龄|岁|名字|工作|公司|职业|上班|同事|老板|学校|专业|毕业|入职|辞职|搬|住在|老家|家里|"
+    r"老婆|老公|对象|女朋友|男朋友|孩子|女儿|儿子|父母|爸|妈|朋友|宠物|猫|狗|过敏|爱好|习惯|"
+    r"目标|计划|打算|决定|结婚|减肥|健身|考试|面试|旅行|预算|"
+    r"\b(birthday|job|work|company|school|wife|husband|kids?|allergic|hobby|plan|moving)\b",
+    re.IGNORECASE
+)
+
+_FIRST_PERSON_PATTERN = re.compile(r"我|咱|\b(i|i'm|im|my|me|mine)\b", re.IGNORECASE)
+
+_QUESTION_PATTERN = re.compile(
+    r"[?？]\s*$|[吗呢么]\s*[?？]?\s*$|^(什么|怎么|为什么|如何|哪|谁|几|多少|能不能|可不可以|是不是|请问)|"
+    r"^(what|how|why|when|where|who|which|can|could|is|are|do|does)\b",
+    re.IGNORECASE
+)
+
+class ExtractionGate:
+    """
+    记忆提取门控
+    
+    判断顺序：空输入和客套话跳过；个人陈述句式、第一人称加画像话题词直接提取；
+    配置了模型时由模型打分决定；否则不含第一人称的提问跳过，足够长的第一人称表述提取，其余跳过。
+    """
+    
+    def __init__(self, min_chars: int = 4, long_chars: int = 15,
+                 model_path: Optional[str] = None, log_path: Optional[str] = None,
+                 history_size: int = 100, shadow_rate: float = 0.0):
+        """
+        初始化门控
+        
+        Args:
+            min_chars: 去掉标点后不足该字数且没有个人陈述的输入直接跳过
+            long_chars: 不含画像话题词时，第一人称表述至少该字数才提取
+            model_path: 线性模型的JSON文件，None或文件不存在时只使用规则
+            log_path: 判断记录的JSON Lines文件，None表示不落盘，可供离线评估使用
+            history_size: 内存中保留的最近判断条数
+            shadow_rate: 影子模式的抽样比例，本应跳过的对话按该比例照常提取，
+                提取结果作为标注写入日志；0表示关闭，1表示全部提取（不再节省调用）
+        """
+        if not 0.0 <= shadow_rate <= 1.0:
+            raise ValueError("shadow_rate必须在0到1之间")
+        self.min_chars = min_chars
+        self.long_chars = long_chars
+        self.model = self.load_model(model_path) if model_path and os.path.exists(model_path) else None
+        self.log_path = log_path
+        self.shadow_rate = shadow_rate
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._checked = 0
+        self._skipped = 0
+        self._shadowed = 0
+        self._reasons = Counter()
+    
+    def classify(self, user_input: str, assistant_response: str = "") -> Tuple[bool, str, Optional[float]]:
+        """
+        判断一轮对话是否值得提取，不记录统计
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        
+        Returns:
+            (是否提取, 原因, 模型分数)，未使用模型时分数为None
+        """
+        text = (user_input or "").strip()
+        stripped = _STRIP_PATTERN.sub("", text).lower()
+        if not stripped:
+            return False, "empty", None
+        if stripped in _ACKNOWLEDGEMENTS:
+            return False, "acknowledgement", None
+        
+        personal = PERSONAL_PATTERN.search(text) is not None
+        if len(stripped) < self.min_chars and not personal:
+            return False, "too_short", None
+        if personal:
+            return True, "personal_statement", None
+        
+        first_person = _FIRST_PERSON_PATTERN.search(text) is not None
+        if first_person and _FACT_PATTERN.search(text):
+            return True, "fact_keyword", None
+        
+        if self.model is not None:
+            score = self.score(text)
+            return score >= self.model.get("threshold", 0.5), "model", score
+        
+        if not first_person and _QUESTION_PATTERN.search(text):
+            return False, "question", None
+        if first_person and len(stripped) >= self.long_chars:
+            return True, "first_person", None
+        return False, "no_signal", None
+    
+    def check(self, user_input: str, assistant_response: str = "") -> bool:
+        """
+        判断一轮对话是否值得提取，并记录判断结果
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+        
+        Returns:
+            是否调用LLM提取，影子模式抽中的对话也返回True
+        """
+        extract, reason, score = self.classify(user_input, assistant_response)
+        shadow = not extract and self.shadow_rate > 0 and self._random.random() < self.shadow_rate
+        with self._lock:
+            self._checked += 1
+            self._reasons[reason] += 1
+            if shadow:
+                self._shadowed += 1
+            elif not extract:
+                self._skipped += 1
+            self._history.append({
+                "time": time.time(),
+                "user_input": (user_input or "")[:100],
+                "extract": extract,
+                "reason": reason,
+                "score": score,
+                "shadow": shadow
+            })
+        if not extract and not shadow:
+            # 没有标注，离线评估时忽略；抽中的对话在提取后由record_outcome记录
+            self._log(user_input, assistant_response, extract, reason, None)
+        return extract or shadow
+    
+    def record_outcome(self, user_input: str, assistant_response: str, extracted_info: Any) -> None:
+        """
+        记录放行（或影子模式抽中）的对话实际提取出的信息，作为离线评估的标注
+        
+        Args:
+            user_input: 用户输入
+            assistant_response: 助手回复
+            extracted_info: LLM提取的结果
+        """
+        extract, reason, _ = self.classify(user_input, assistant_response)
+        self._log(user_input, assistant_response, extract, reason, extracted_info)
+    
+    def score(self, text: str) -> float:
+        """
+        用线性模型计算提取概率
+        
+        Args:
+            text: 用户输入
+        
+        Returns:
+            0到1之间的概率
+        """
+        weights = self.model["weights"]
+        logit = self.model.get("bias", 0.0) + sum(weights.get(term, 0.0) for term in set(tokenize(text)))
+        return 1.0 / (1.0 + math.exp(-max(min(logit, 30.0), -30.0)))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取门控统计
+        
+        Returns:
+            包含判断次数、跳过（即节省的LLM调用）次数、跳过率、影子模式抽中次数和各原因计数的字典
+        """
+        with self._lock:
+            return {
+                "checked": self._checked,
+                "extracted": self._checked - self._skipped,
+                "saved_calls": self._skipped,
+                "skip_rate": self._skipped / self._checked if self._checked else 0.0,
+                "shadowed": self._shadowed,
+                "shadow_rate": self.shadow_rate,
+                "reasons": dict(self._reasons),
+                "model": self.model is not None
+            }
+    
+    def get_history(self) -> List[Dict[str, Any]]:
+        """
+        获取最近的判断记录
+        
+        Returns:
+            判断记录列表，从旧到新
+        """
+        with self._lock:
+            return list(self._history)
+    
+    def _log(self, user_input: str, assistant_response: str, extract: bool,
+             reason: str, extracted_info: Any) -> None:
+        """
+        追加一条判断记录到日志文件
+        """
+        if not self.log_path:
+            return
+        record = {
+            "time": time.time(),
+            "user_input": user_input,
+            "assistant_response": assistant_response,
+            "extract": extract,
+            "reason": reason,
+            "shadow_rate": self.shadow_rate,
+            "extracted_info": extracted_info
+        }
+        try:
+            with self._lock:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"写入提取门控日志出错: {e}")
+    
+    @staticmethod
+    def load_model(path: str) -> Dict[str, Any]:
+        """
+        读取线性模型
+        
+        Args:
+            path: 模型文件路径
+        
+        Returns:
+            包含bias、weights和threshold的字典
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+def fit_gate_model(texts: List[str], labels: List[bool], epochs: int = 200,
+                   learning_rate: float = 0.5, l2: float = 1e-3,
+                   min_count: int = 2, threshold: float = 0.3) -> Dict[str, Any]:
+    """
+    在已标注的对话上训练门控用的逻辑回归模型，特征为词项是否出现
+    
+    Args:
+        texts: 用户输入
+        labels: 是否提取出了画像信息
+        epochs: 梯度下降轮数
+        learning_rate: 学习率
+        l2: L2正则系数
+        min_count: 词项至少出现的次数
+        threshold: 写入模型的判定阈值，偏低以优先保证召回
+    
+    Returns:
+        可被ExtractionGate加载的模型字典
+    """
+    import numpy as np
+    
+    documents = [set(tokenize(text)) for text in texts]
+    counts = Counter(term for terms in documents for term in terms)
+    vocabulary = sorted(term for term, count in counts.items() if count >= min_count)
+    index = {term: i for i, term in enumerate(vocabulary)}
+    
+    features = np.zeros((len(texts), len(vocabulary)), dtype=np.float32)
+    for row, terms in enumerate(documents):
+        for term in terms:
+            if term in index:
+                features[row, index[term]] = 1.0
+    targets = np.asarray(labels, dtype=np.float32)
+    
+    weights = np.zeros(len(vocabulary), dtype=np.float32)
+    bias = 0.0
+    for _ in range(epochs):
+        predictions = 1.0 / (1.0 + np.exp(-(features @ weights + bias)))
+        error = predictions - targets
+        weights -= learning_rate * (features.T @ error / len(texts) + l2 * weights)
+        bias -= learning_rate * float(error.mean())
+    
+    return {
+        "bias": bias,
+        "weights": {term: round(float(weight), 4) for term, weight in zip(vocabulary, weights) if abs(weight) > 1e-3},
+        "threshold": threshold
+    }
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+后台记忆提取工作线程
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+class ExtractionWorker:
+    """
+    后台记忆提取工作线程
+    
+    由单个工作线程按提交顺序串行执行提取任务，保证用户画像更新和长期记忆写入的先后顺序与对话顺序一致。
+    排队的提取任务达到上限时提交不会阻塞：任务改为由溢出处理函数（如只保存原始对话、不做提取）处理，
+    仍按提交顺序排在同一个队列中，由工作线程执行，提交线程不做任何I/O；没有溢出处理函数时丢弃。
+    溢出任务不计入上限，只保存原始对话的开销远小于LLM提取，积压时队列长度随之增长。
+    """
+    
+    def __init__(self, handler: Callable[..., None], max_queue_size: int = 100,
+                 overflow_handler: Optional[Callable[..., None]] = None):
+        """
+        初始化工作线程
+        
+        Args:
+            handler: 任务处理函数，接收submit时传入的参数
+            max_queue_size: 排队的提取任务的最大数量
+            overflow_handler: 提取任务达到上限时改用的处理函数，参数与handler相同，
+                在工作线程中按提交顺序执行；None表示直接丢弃该任务
+        """
+        self.handler = handler
+        self.overflow_handler = overflow_handler
+        self.max_queue_size = max_queue_size
+        # (任务编号, 入队时间, 处理函数, 位置参数, 关键字参数)，None为停止信号
+        self._queue = deque()
+        self._queued_extractions = 0
+        self._thread = None
+        self._stopped = False
+        
+        # 待处理任务的编号到入队时间，按插入顺序即FIFO顺序
+        self._pending: Dict[int, float] = {}
+        self._task_ids = itertools.count()
+        self._condition = threading.Condition()
+        
+        # 统计指标
+        self._submitted = 0
+        self._processed = 0
+        self._failed = 0
+        self._dropped = 0
+        self._overflowed = 0
+        self._total_lag = 0.0
+        self._max_lag = 0.0
+        self._last_lag = 0.0
+    
+    def start(self) -> None:
+        """
+        启动工作线程
+        """
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(
+                target=self._run,
+                name="memory-extraction-worker",
+                daemon=True
+            )
+            self._thread.start()
+    
+    def submit(self, *args: Any, **kwargs: Any) -> bool:
+        """
+        提交提取任务
+        
+        Args:
+            *args: 传给处理函数的位置参数
+            **kwargs: 传给处理函数的关键字参数
+        
+        Returns:
+            是否作为提取任务入队；工作线程已停止时同步执行并返回True，
+            提取任务已达上限（改为溢出处理或丢弃）时返回False
+        """
+        if self._stopped:
+            with self._condition:
+                self._submitted += 1
+            self._execute(None, time.monotonic(), self.handler, args, kwargs)
+            return True
+        
+        self.start()
+        
+        enqueued_at = time.monotonic()
+        with self._condition:
+            if self._queued_extractions < self.max_queue_size:
+                handler = self.handler
+                self._queued_extractions += 1
+                self._submitted += 1
+            elif self.overflow_handler is not None:
+                handler = self.overflow_handler
+                self._overflowed += 1
+            else:
+                self._dropped += 1
+                print("记忆提取队列已满，本轮对话的记忆提取被丢弃")
+                return False
+            task_id = next(self._task_ids)
+            self._pending[task_id] = enqueued_at
+            self._queue.append((task_id, enqueued_at, handler, args, kwargs))
+            self._condition.notify_all()
+        
+        if handler is not self.handler:
+            print("记忆提取队列已满，本轮对话只保存、不提取")
+            return False
+        return True
+    
+    def flush(self, timeout: float = None) -> bool:
+        """
+        等待队列中所有任务处理完成
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        
+        Returns:
+            是否在超时前处理完所有任务
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending:
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+        return True
+    
+    def stop(self, timeout: float = None) -> bool:
+        """
+        处理完剩余任务后停止工作线程
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        
+        Returns:
+            是否在超时前处理完所有任务
+        """
+        drained = self.flush(timeout)
+        self._stopped = True
+        if self._thread is not None and self._thread.is_alive():
+            with self._condition:
+                self._queue.append(None)
+                self._condition.notify_all()
+            self._thread.join(timeout)
+        self._thread = None
+        return drained
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        获取队列指标
+        
+        Returns:
+            包含队列深度、延迟和任务计数的字典，延迟单位为秒；
+            queue_depth包含排队中的溢出任务；dropped为提取任务已达上限时丢弃的任务数，
+            overflowed为提取任务已达上限时改由溢出处理函数处理的任务数
+        """
+        with self._condition:
+            now = time.monotonic()
+            return {
+                "queue_depth": len(self._pending),
+                "current_lag": now - next(iter(self._pending.values())) if self._pending else 0.0,
+                "last_lag": self._last_lag,
+                "max_lag": self._max_lag,
+                "avg_lag": self._total_lag / self._processed if self._processed else 0.0,
+                "submitted": self._submitted,
+                "processed": self._processed,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "overflowed": self._overflowed
+            }
+    
+    def _run(self) -> None:
+        """
+        工作线程主循环
+        """
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                item = self._queue.popleft()
+                if item is None:
+                    break
+                task_id, enqueued_at, handler, args, kwargs = item
+                if handler is self.handler:
+                    # 提取任务开始执行即让出名额，之后提交的对话可以继续排队提取
+                    self._queued_extractions -= 1
+            self._execute(task_id, enqueued_at, handler, args, kwargs)
+    
+    def _execute(self, task_id: Optional[int], enqueued_at: float, handler: Callable[..., None],
+                 args: tuple, kwargs: dict) -> None:
+        """
+        执行单个任务并更新指标
+        
+        Args:
+            task_id: 队列中任务的编号，None表示未经队列直接执行
+            enqueued_at: 任务入队时间
+            handler: 处理函数或溢出处理函数
+            args: 位置参数
+            kwargs: 关键字参数
+        """
+        failed = False
+        try:
+            handler(*args, **kwargs)
+        except Exception as e:
+            failed = True
+            if handler is self.handler:
+                print(f"后台记忆提取出错: {e}")
+            else:
+                print(f"记忆提取溢出处理出错: {e}")
+        
+        lag = time.monotonic() - enqueued_at
+        with self._condition:
+            if task_id is not None:
+                self._pending.pop(task_id, None)
+            # 溢出任务只计入overflowed，不计入提取任务的计数和延迟
+            if handler is self.handler:
+                self._processed += 1
+                if failed:
+                    self._failed += 1
+                self._last_lag = lag
+                self._total_lag += lag
+                self._max_lag = max(self._max_lag, lag)
+            self._condition.notify_all()
\ No newline at end of file
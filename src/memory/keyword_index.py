@@ -0,0 +1,338 @@
+"""
+长期记忆的BM25关键词索引
+"""
+
+import heapq
+import json
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain.schema import Document
+from src.utils import tokenize
+from .vector_backend import matches_where
+
+class KeywordIndex:
+    """
+    持久化在SQLite中的BM25倒排索引
+    
+    词项由tokenize切分（英文按单词，中文按字符bigram），可以命中向量检索容易漏掉的
+    人名、日期和专有名词。倒排表、文档长度和文档总数都存放在SQLite中，检索时只读取查询词项的
+    倒排记录，打开时不需要在内存中重建索引，同一用户的多个Agent打开同一个文件也不会各自保留一份副本。
+    """
+    
+    # 倒排表的存储版本，旧版本文件（只保存文档原文）打开时补建倒排表
+    SCHEMA_VERSION = 1
+    # IN查询每次最多的参数个数
+    CHUNK_SIZE = 500
+    
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化索引
+        
+        Args:
+            path: SQLite文件路径，None表示使用内存数据库
+            k1: BM25词频饱和参数
+            b: BM25文档长度归一化参数
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL, "
+            "length INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+            self._rebuild()
+        self._conn.commit()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+    
+    def add(self, ids: List[str], documents: List[Document]) -> None:
+        """
+        将文档加入索引
+        
+        Args:
+            ids: 文档ID
+            documents: 文档
+        """
+        latest = dict(zip(ids, documents))
+        rows = []
+        postings = []
+        for doc_id, doc in latest.items():
+            counts = Counter(tokenize(doc.page_content))
+            length = sum(counts.values())
+            rows.append((doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False), length))
+            postings.extend((term, doc_id, tf) for term, tf in counts.items())
+        
+        with self._lock:
+            self._delete(list(latest))
+            self._conn.executemany(
+                "INSERT INTO documents (id, content, metadata, length) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+            self._adjust(len(rows), sum(row[3] for row in rows))
+            self._conn.commit()
+    
+    def remove(self, ids: List[str]) -> None:
+        """
+        从索引中删除文档
+        
+        Args:
+            ids: 文档ID
+        """
+        with self._lock:
+            self._delete(ids)
+            self._conn.commit()
+    
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("INSERT OR REPLACE INTO info VALUES ('doc_count', 0), ('total_length', 0)")
+            self._conn.commit()
+    
+    def close(self) -> None:
+        """关闭SQLite连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def search(self, query: str, k: int = 3,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+        按BM25分数检索
+        
+        Args:
+            query: 查询文本
+            k: 返回条数
+            where: 元数据过滤条件，语法同VectorBackend
+        
+        Returns:
+            (文档, BM25分数)列表，按分数从高到低排列
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            count, total_length = self._stats()
+            if not count:
+                return []
+            avg_length = max(total_length / count, 1.0)
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._conn.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN documents d ON d.id = p.doc_id "
+                    "WHERE p.term = ?",
+                    (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = self._idf(len(postings), count)
+                for doc_id, tf, length in postings:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+            
+            # 没有过滤条件时只需读取前k篇文档，有过滤条件时按分数从高到低读取，直到凑满k篇
+            if where:
+                ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            else:
+                ranked = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            results = []
+            for start in range(0, len(ranked), self.CHUNK_SIZE):
+                chunk = ranked[start:start + self.CHUNK_SIZE]
+                docs = self._load([doc_id for doc_id, _ in chunk])
+                for doc_id, score in chunk:
+                    doc = docs.get(doc_id)
+                    if doc is None or (where and not matches_where(doc.metadata, where)):
+                        continue
+                    results.append((doc, score))
+                    if len(results) >= k:
+                        return results
+            return results
+    
+    def coverage(self, query: str, document: Document) -> float:
+        """
+        计算文档对查询词项的IDF加权覆盖率，用于判断关键词结果是否足够可信
+        
+        Args:
+            query: 查询文本
+            document: 候选文档
+        
+        Returns:
+            0到1之间的覆盖率，只统计索引中出现过的查询词；
+            中文bigram会产生跨词的无效词项，但出现过的词项不足一半时视为不可信，返回0
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        doc_terms = set(tokenize(document.page_content))
+        with self._lock:
+            count, _ = self._stats()
+            doc_freqs = self._doc_freqs(terms)
+        if len(doc_freqs) * 2 < len(terms):
+            return 0.0
+        total = 0.0
+        matched = 0.0
+        for term, doc_freq in doc_freqs.items():
+            idf = self._idf(doc_freq, count)
+            total += idf
+            if term in doc_terms:
+                matched += idf
+        return matched / total if total else 0.0
+    
+    @staticmethod
+    def _idf(doc_freq: int, count: int) -> float:
+        """
+        BM25的IDF
+        
+        Args:
+            doc_freq: 包含该词项的文档数
+            count: 文档总数
+        
+        Returns:
+            IDF值
+        """
+        return math.log(1 + (count - doc_freq + 0.5) / (doc_freq + 0.5))
+    
+    def _stats(self) -> Tuple[int, int]:
+        """
+        读取文档总数和总长度，调用方需持有锁
+        
+        Returns:
+            (文档数, 词项总数)
+        """
+        info = dict(self._conn.execute("SELECT key, value FROM info"))
+        return info.get("doc_count", 0), info.get("total_length", 0)
+    
+    def _adjust(self, count: int, length: int) -> None:
+        """
+        更新文档总数和总长度，与文档的增删在同一事务中提交，调用方需持有锁
+        
+        Args:
+            count: 文档数的变化量
+            length: 总长度的变化量
+        """
+        doc_count, total_length = self._stats()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO info VALUES ('doc_count', ?), ('total_length', ?)",
+            (doc_count + count, total_length + length)
+        )
+    
+    def _delete(self, ids: List[str]) -> None:
+        """
+        删除文档和它们的倒排记录，调用方需持有锁并负责提交
+        
+        Args:
+            ids: 文档ID
+        """
+        for chunk in self._chunks(ids):
+            placeholders = ",".join("?" * len(chunk))
+            count, length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents WHERE id IN ({placeholders})", chunk
+            ).fetchone()
+            if not count:
+                continue
+            self._conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", chunk)
+            self._conn.execute(f"DELETE FROM documents WHERE id IN ({placeholders})", chunk)
+            self._adjust(-count, -length)
+    
+    def _load(self, ids: List[str]) -> Dict[str, Document]:
+        """
+        读取文档，调用方需持有锁
+        
+        Args:
+            ids: 文档ID
+        
+        Returns:
+            文档ID到文档的字典
+        """
+        docs = {}
+        for chunk in self._chunks(ids):
+            rows = self._conn.execute(
+                f"SELECT id, content, metadata FROM documents WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for doc_id, content, metadata in rows:
+                docs[doc_id] = Document(page_content=content, metadata=json.loads(metadata))
+        return docs
+    
+    def _doc_freqs(self, terms: Iterable[str]) -> Dict[str, int]:
+        """
+        统计词项的文档频率，调用方需持有锁
+        
+        Args:
+            terms: 词项
+        
+        Returns:
+            索引中出现过的词项到包含它的文档数的字典
+        """
+        doc_freqs = {}
+        for chunk in self._chunks(list(terms)):
+            rows = self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({','.join('?' * len(chunk))}) GROUP BY term",
+                chunk
+            )
+            doc_freqs.update(rows)
+        return doc_freqs
+    
+    def _rebuild(self) -> None:
+        """
+        按文档原文重建倒排表，用于打开只保存了文档原文的旧版本文件，调用方负责提交
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "length" not in columns:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN length INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("DELETE FROM postings")
+        count = 0
+        total_length = 0
+        for doc_id, content in self._conn.execute("SELECT id, content FROM documents").fetchall():
+            counts = Counter(tokenize(content))
+            length = sum(counts.values())
+            self._conn.execute("UPDATE documents SET length = ? WHERE id = ?", (length, doc_id))
+            self._conn.executemany(
+                "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                [(term, doc_id, tf) for term, tf in counts.items()]
+            )
+            count += 1
+            total_length += length
+        self._conn.execute(
+            "INSERT OR REPLACE INTO info VALUES ('doc_count', ?), ('total_length', ?)", (count, total_length)
+        )
+        self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+    
+    @classmethod
+    def _chunks(cls, items: List[Any]) -> Iterable[List[Any]]:
+        """
+        按IN查询的参数个数上限切分
+        
+        Args:
+            items: 参数列表
+        
+        Returns:
+            分块的迭代器
+        """
+        for start in range(0, len(items), cls.CHUNK_SIZE):
+            yield items[start:start + cls.CHUNK_SIZE]
\ No newline at end of file
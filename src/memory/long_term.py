@@ -4,12 +4,23 @@
 
 import os
 import json
+import asyncio
+import threading
+import time
+import uuid
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 from langchain.schema import Document
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
 from .base import MemoryBase
+from .chroma_client import get_shared_client
+from .embedding_cache import CachedEmbeddings
+from .keyword_index import KeywordIndex
+from .ranking import MemoryRanker, is_recall_query, parse_time_range, score_importance, to_timestamp
+from .vector_backend import ChromaVectorBackend, VectorBackend
+from src.utils import LRUCache
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
 
 class LongTermMemory(MemoryBase):
     """长期记忆实现，基于向量数据库"""
@@ -17,7 +28,25 @@ class LongTermMemory(MemoryBase):
     def __init__(self, api_key: str, base_url: str, user_name: str,
                  model: str = "text-embedding-3-small",
                  collection_name_prefix: str = "memory_",
-                 persist_directory_prefix: str = "./chroma_db_"):
+                 persist_directory_prefix: str = "./chroma_db_",
+                 layout: str = "per_user",
+                 shared_collection_name: str = "memories",
+                 shared_persist_directory: str = "./chroma_db_shared",
+                 backend: str = "chroma",
+                 buffer_size: int = 1, flush_interval: float = 30.0,
+                 batch_size: int = 500, embedding_cache_size: int = 2048,
+                 embedding_cache_path: Optional[str] = None,
+                 embedding_cache_max_disk_mb: float = 256,
+                 retrieval_cache_size: int = 128,
+                 retrieval_cache_ttl: Optional[float] = 300.0,
+                 keyword_index: bool = True,
+                 keyword_fast_path_threshold: float = 0.85,
+                 rrf_k: int = 60,
+                 recency_weight: float = 0.2,
+                 importance_weight: float = 0.1,
+                 half_life_days: float = 30.0,
+                 auto_time_filter: bool = False,
+                 embeddings: Optional["Embeddings"] = None, client: Any = None):
         """
         初始化长期记忆
         
@@ -28,23 +57,182 @@ class LongTermMemory(MemoryBase):
             model: 嵌入模型名称
             collection_name_prefix: 集合名称前缀
             persist_directory_prefix: 持久化目录前缀
+            layout: 存储布局，per_user为每个用户独立目录和集合，
+                shared为所有用户共用一个客户端和集合，按user_name元数据过滤
+            shared_collection_name: shared布局下的集合名称
+            shared_persist_directory: shared布局下的持久化目录
+            backend: 向量存储后端，chroma或numpy（内存映射矩阵 + SQLite元数据）
+            buffer_size: 写缓冲区大小，攒够该数量的文档后批量写入，1表示不缓冲
+            flush_interval: 缓冲区中最早的文档等待写入的最长时间（秒）
+            batch_size: 批量写入时每批的文档数
+            embedding_cache_size: 进程内嵌入缓存的条目数，0且未指定缓存文件时不启用缓存
+            embedding_cache_path: 嵌入缓存的SQLite文件路径，None表示只使用进程内缓存
+            embedding_cache_max_disk_mb: 嵌入缓存文件中向量的最大总大小（MB），超出时淘汰最久未访问的向量
+            retrieval_cache_size: 检索结果缓存的条目数，0表示不缓存
+            retrieval_cache_ttl: 检索结果缓存的存活时间（秒），None表示不过期
+            keyword_index: 是否维护BM25关键词索引，与向量结果融合检索
+            keyword_fast_path_threshold: 关键词最佳结果对查询词的IDF加权覆盖率达到该值时，
+                直接返回关键词结果，不再计算查询向量；大于1表示关闭快速路径
+            rrf_k: 倒数排名融合（RRF）的平滑常数
+            recency_weight: 排序时新鲜度的权重
+            importance_weight: 排序时重要性的权重
+            half_life_days: 新鲜度衰减到一半所需的天数
+            auto_time_filter: 是否从查询中识别“昨天”“上周”等时间范围：回忆过去对话的查询（如“昨天我说过什么”）
+                中作为检索前的过滤条件，其他查询中只给范围内的记忆加分
+            embeddings: 共享的嵌入模型，传入时忽略model和嵌入缓存参数
+            client: 共享的Chroma客户端，传入时忽略persist_directory_prefix和shared_persist_directory，
+                仅对chroma后端生效
         """
+        if layout not in ("per_user", "shared"):
+            raise ValueError(f"不支持的长期记忆存储布局: {layout}")
+        if backend not in ("chroma", "numpy"):
+            raise ValueError(f"不支持的长期记忆存储后端: {backend}")
+        
         self.user_name = user_name
-        self.collection_name = f"{collection_name_prefix}{user_name}"
-        self.persist_directory = f"{persist_directory_prefix}{user_name}"
-        
-        # 初始化嵌入模型
-        self.embeddings = OpenAIEmbeddings(
-            model=model,
-            openai_api_key=api_key,
-            openai_api_base=base_url
+        self.layout = layout
+        self.backend_name = backend
+        if layout == "shared":
+            self.collection_name = shared_collection_name
+            self.persist_directory = shared_persist_directory
+            self._filter = {"user_name": user_name}
+        else:
+            self.collection_name = f"{collection_name_prefix}{user_name}"
+            self.persist_directory = f"{persist_directory_prefix}{user_name}"
+            self._filter = None
+        self.client = client
+        
+        # 嵌入模型和向量存储后端在首次读写时才创建，缩短启动时间
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.embedding_cache_size = embedding_cache_size
+        self.embedding_cache_path = embedding_cache_path
+        self.embedding_cache_max_disk_mb = embedding_cache_max_disk_mb
+        self._embeddings = embeddings
+        self._backend = None
+        self._init_lock = threading.Lock()
+        
+        # 关键词索引同样在首次使用时加载
+        self.use_keyword_index = keyword_index
+        self.keyword_fast_path_threshold = keyword_fast_path_threshold
+        self.rrf_k = rrf_k
+        self._keyword_index = None
+        self.retrieval_paths = {"keyword": 0, "hybrid": 0, "vector": 0}
+        
+        # 相似度、新鲜度和重要性混合排序
+        self.ranker = MemoryRanker(
+            recency_weight=recency_weight,
+            importance_weight=importance_weight,
+            half_life_days=half_life_days
+        )
+        self.auto_time_filter = auto_time_filter
+        self._stats_lock = threading.Lock()
+        
+        # 检索结果缓存，键中包含集合版本号，写入或清除后旧结果自然失效
+        self.retrieval_cache = LRUCache(maxsize=retrieval_cache_size, ttl=retrieval_cache_ttl)
+        self._version = 0
+        
+        # 写缓冲区
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        # 保证各批次按缓冲顺序写入
+        self._write_lock = threading.Lock()
+        self._flush_timer = None
+    
+    @property
+    def embeddings(self) -> "Embeddings":
+        """
+        嵌入模型，首次访问时创建
+        """
+        if self._embeddings is None:
+            with self._init_lock:
+                if self._embeddings is None:
+                    self._embeddings = self._create_embeddings()
+        return self._embeddings
+    
+    @property
+    def backend(self) -> VectorBackend:
+        """
+        向量存储后端，首次访问时打开
+        """
+        if self._backend is None:
+            with self._init_lock:
+                if self._backend is None:
+                    self._backend = self._open_backend()
+        return self._backend
+    
+    @property
+    def keyword_index(self) -> Optional[KeywordIndex]:
+        """
+        BM25关键词索引，首次访问时从磁盘加载；未启用时为None
+        
+        索引中的文档数与向量存储不一致时（启用索引之前写入的记忆、迁移工具复制的记忆），
+        先按向量存储重建，否则关键词快速路径会跳过不在索引中的记忆
+        """
+        if self.use_keyword_index and self._keyword_index is None:
+            # 后端的初始化也使用_init_lock，先在锁外打开
+            backend = self.backend
+            with self._init_lock:
+                if self._keyword_index is None:
+                    index = KeywordIndex(
+                        os.path.join(self.persist_directory, f"keywords_{self.user_name}.sqlite")
+                    )
+                    if len(index) != backend.count(self._filter):
+                        ids, _, docs = backend.get(self._filter)
+                        index.clear()
+                        index.add(ids, docs)
+                    self._keyword_index = index
+        return self._keyword_index
+    
+    def _create_embeddings(self) -> "Embeddings":
+        """
+        创建嵌入模型，写入和查询的嵌入计算都经过缓存
+        
+        Returns:
+            嵌入模型
+        """
+        from langchain_openai import OpenAIEmbeddings
+        
+        embeddings = OpenAIEmbeddings(
+            model=self.model,
+            openai_api_key=self.api_key,
+            openai_api_base=self.base_url
         )
+        if self.embedding_cache_size > 0 or self.embedding_cache_path:
+            embeddings = CachedEmbeddings(
+                embeddings,
+                model=self.model,
+                cache_size=self.embedding_cache_size,
+                cache_path=self.embedding_cache_path,
+                max_disk_bytes=int(self.embedding_cache_max_disk_mb * 1024 * 1024)
+            )
+        return embeddings
+    
+    def _open_backend(self) -> VectorBackend:
+        """
+        打开向量存储后端
+        
+        Returns:
+            向量存储后端
+        """
+        if self.backend_name == "numpy":
+            from .numpy_backend import NumpyVectorBackend, get_shared_backend
+            if self._filter is not None:
+                # shared布局下同一目录在进程内只能有一个实例写入
+                return get_shared_backend(self.persist_directory)
+            return NumpyVectorBackend(self.persist_directory)
         
-        # 初始化向量数据库
-        self.vector_store = Chroma(
-            collection_name=self.collection_name,
-            embedding_function=self.embeddings,
-            persist_directory=self.persist_directory
+        if self.client is None and self._filter is not None:
+            # shared布局下同一进程内所有用户复用同一个客户端
+            self.client = get_shared_client(self.persist_directory)
+        return ChromaVectorBackend(
+            self.collection_name,
+            self.embeddings,
+            persist_directory=self.persist_directory,
+            client=self.client
         )
     
     def save(self, key: str, value: Any) -> None:
@@ -55,33 +243,193 @@ class LongTermMemory(MemoryBase):
             key: 记忆键名
             value: 记忆值，应该是包含user_input、assistant_response和extracted_info的字典
         """
-        if key == "memory" and isinstance(value, dict):
-            user_input = value.get("user_input", "")
-            assistant_response = value.get("assistant_response", "")
-            extracted_info = value.get("extracted_info", {})
+        doc = self._build_document(key, value)
+        if doc is None:
+            return
+        
+        if self.buffer_size <= 1:
+            # 添加到向量数据库
+            self._add_documents([doc])
+            return
+        
+        with self._buffer_lock:
+            self._buffer.append(doc)
+            full = len(self._buffer) >= self.buffer_size
+            if not full and self._flush_timer is None:
+                # 缓冲区的第一条文档，启动定时刷新
+                self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        
+        if full:
+            self.flush()
+    
+    def save_many(self, values: List[Any], key: str = "memory") -> int:
+        """
+        批量保存记忆，每批文档只发起一次嵌入请求和一次数据库写入
+        
+        Args:
+            values: 记忆值列表，格式同save
+            key: 记忆键名
             
-            timestamp = datetime.now().isoformat()
+        Returns:
+            写入的文档数
+        """
+        docs = [doc for doc in (self._build_document(key, value) for value in values) if doc is not None]
+        self._add_documents(docs)
+        return len(docs)
+    
+    def flush(self) -> int:
+        """
+        将缓冲区中的文档批量写入向量数据库
+        
+        Returns:
+            写入的文档数
+        """
+        with self._write_lock:
+            with self._buffer_lock:
+                docs = self._buffer
+                self._buffer = []
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
             
-            # 创建文档内容
-            if extracted_info:
-                doc_content = f"时间: {timestamp}\n用户说: {user_input}\n提取的信息: {json.dumps(extracted_info, ensure_ascii=False)}"
-                doc_type = "conversation_with_extraction"
-            else:
-                doc_content = f"时间: {timestamp}\n用户: {user_input}\n助手: {assistant_response}"
-                doc_type = "conversation"
-            
-            # 创建文档对象
-            doc = Document(
-                page_content=doc_content,
-                metadata={
-                    "timestamp": timestamp,
-                    "user_input": user_input,
-                    "type": doc_type
-                }
-            )
+            try:
+                self._add_documents(docs)
+            except Exception as e:
+                print(f"批量写入长期记忆出错: {e}")
+                return 0
+        return len(docs)
+    
+    def close(self) -> None:
+        """
+        写入缓冲区中剩余的文档并关闭独占的后端，退出前调用
+        """
+        self.flush()
+        if self._keyword_index is not None:
+            self._keyword_index.close()
+            self._keyword_index = None
+        if self._backend is not None and self._filter is None:
+            self._backend.close()
+            self._backend = None
+    
+    def _add_documents(self, docs: List[Document]) -> None:
+        """
+        按batch_size分批写入文档
+        
+        Args:
+            docs: 文档列表
+        """
+        for start in range(0, len(docs), self.batch_size):
+            batch = docs[start:start + self.batch_size]
+            ids = [uuid.uuid4().hex for _ in batch]
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in batch])
+            self.backend.add(ids, vectors, batch)
+            if self.keyword_index is not None:
+                self.keyword_index.add(ids, batch)
+            self._version += 1
+    
+    async def asave(self, key: str, value: Any) -> None:
+        """
+        异步保存记忆
+        
+        Args:
+            key: 记忆键名
+            value: 记忆值，格式同save
+        """
+        if self.buffer_size > 1:
+            # 缓冲模式下写满时会同步刷新，放到线程中执行
+            await asyncio.to_thread(self.save, key, value)
+            return
+        
+        doc = self._build_document(key, value)
+        if doc is not None:
+            ids = [uuid.uuid4().hex]
+            vectors = await self.embeddings.aembed_documents([doc.page_content])
+            await asyncio.to_thread(self.backend.add, ids, vectors, [doc])
+            if self.keyword_index is not None:
+                self.keyword_index.add(ids, [doc])
+            self._version += 1
+    
+    def export_documents(self) -> Tuple[List[str], List[List[float]], List[Document]]:
+        """
+        读取本用户的全部记忆及其向量，先写入缓冲区中的文档
+        
+        Returns:
+            (文档ID列表, 向量列表, 文档列表)
+        """
+        self.flush()
+        return self.backend.get(self._filter)
+    
+    def replace_documents(self, remove_ids: List[str], ids: List[str],
+                          vectors: List[List[float]], docs: List[Document]) -> None:
+        """
+        写入新文档并删除旧文档，向量由调用方提供，不调用嵌入接口；
+        先写后删，中途失败时最多留下重复记忆而不会丢失
+        
+        Args:
+            remove_ids: 要删除的文档ID
+            ids: 新文档ID
+            vectors: 新文档向量
+            docs: 新文档
+        """
+        with self._write_lock:
+            if ids:
+                self.backend.add(ids, vectors, docs)
+                if self.keyword_index is not None:
+                    self.keyword_index.add(ids, docs)
+            if remove_ids:
+                self.backend.delete(ids=remove_ids)
+                if self.keyword_index is not None:
+                    self.keyword_index.remove(remove_ids)
+            self._version += 1
+            self.retrieval_cache.clear()
+    
+    def _build_document(self, key: str, value: Any) -> Optional[Document]:
+        """
+        将记忆值转换为向量数据库文档
+        
+        Args:
+            key: 记忆键名
+            value: 记忆值，可带timestamp字段指定记忆时间（用于导入历史对话）
             
-            # 添加到向量数据库
-            self.vector_store.add_documents([doc])
+        Returns:
+            文档对象，不支持的键名或值返回None
+        """
+        if not (key == "memory" and isinstance(value, dict)):
+            return None
+        
+        user_input = value.get("user_input", "")
+        assistant_response = value.get("assistant_response", "")
+        extracted_info = value.get("extracted_info", {})
+        
+        timestamp = value.get("timestamp") or datetime.now().isoformat()
+        
+        # 创建文档内容
+        if extracted_info:
+            doc_content = f"时间: {timestamp}\n用户说: {user_input}\n提取的信息: {json.dumps(extracted_info, ensure_ascii=False)}"
+            doc_type = "conversation_with_extraction"
+        else:
+            doc_content = f"时间: {timestamp}\n用户: {user_input}\n助手: {assistant_response}"
+            doc_type = "conversation"
+        
+        extracted_count = sum(
+            len(item) if isinstance(item, (dict, list)) else 1
+            for item in extracted_info.values()
+        ) if isinstance(extracted_info, dict) else 0
+        
+        # 创建文档对象，ts和importance供过滤和排序使用
+        return Document(
+            page_content=doc_content,
+            metadata={
+                "timestamp": timestamp,
+                "ts": to_timestamp(timestamp) or time.time(),
+                "user_input": user_input,
+                "user_name": self.user_name,
+                "type": doc_type,
+                "importance": score_importance(user_input, extracted_count)
+            }
+        )
     
     def load(self, key: str, **kwargs) -> Any:
         """
@@ -89,7 +437,8 @@ class LongTermMemory(MemoryBase):
         
         Args:
             key: 记忆键名
-            **kwargs: 额外参数，如k=3表示检索3条相关记忆
+            **kwargs: 额外参数，如k=3表示检索3条相关记忆；
+                since/until限定时间范围（时间戳、datetime或ISO字符串），types限定记忆类型
             
         Returns:
             相关记忆列表
@@ -97,24 +446,261 @@ class LongTermMemory(MemoryBase):
         if key == "relevant_memories":
             query = kwargs.get("query", "")
             k = kwargs.get("k", 3)
+            where, auto_filtered, time_range = self._build_where(query, kwargs)
+            
+            cache_key = self._retrieval_cache_key(query, k, where)
+            docs = self.retrieval_cache.get(cache_key)
+            if docs is not None:
+                return self._format_memories(docs)
             
             try:
-                docs = self.vector_store.similarity_search(query, k=k)
-                if docs:
-                    memories = "\n".join([f"- {doc.page_content}" for doc in docs])
-                    return memories
+                docs = self._retrieve(query, k, where, time_range)
+                if not docs and auto_filtered:
+                    # 识别出的时间范围内没有记忆时退回到不限时间
+                    docs = self._retrieve(query, k, self._filter)
+                self.retrieval_cache.set(cache_key, docs)
+                return self._format_memories(docs)
+            except Exception as e:
+                print(f"记忆检索出错: {e}")
                 return "暂无相关历史记忆"
+        return None
+    
+    async def aload(self, key: str, **kwargs) -> Any:
+        """
+        异步加载记忆，查询向量通过异步嵌入接口计算
+        
+        Args:
+            key: 记忆键名
+            **kwargs: 额外参数，同load
+            
+        Returns:
+            相关记忆列表
+        """
+        if key == "relevant_memories":
+            query = kwargs.get("query", "")
+            k = kwargs.get("k", 3)
+            where, auto_filtered, time_range = self._build_where(query, kwargs)
+            
+            cache_key = self._retrieval_cache_key(query, k, where)
+            docs = self.retrieval_cache.get(cache_key)
+            if docs is not None:
+                return self._format_memories(docs)
+            
+            try:
+                docs = await self._aretrieve(query, k, where, time_range)
+                if not docs and auto_filtered:
+                    docs = await self._aretrieve(query, k, self._filter)
+                self.retrieval_cache.set(cache_key, docs)
+                return self._format_memories(docs)
             except Exception as e:
                 print(f"记忆检索出错: {e}")
                 return "暂无相关历史记忆"
         return None
     
+    def _build_where(self, query: str, options: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], bool, Optional[tuple]]:
+        """
+        组合检索前的过滤条件
+        
+        Args:
+            query: 查询文本
+            options: load的额外参数，可含since、until和types
+            
+        Returns:
+            (过滤条件, 时间范围是否从查询中自动识别并用于过滤, 只用于排序加分的时间范围)
+        """
+        where = dict(self._filter or {})
+        since = to_timestamp(options.get("since"))
+        until = to_timestamp(options.get("until"))
+        auto_filtered = False
+        boost_range = None
+        if since is None and until is None and self.auto_time_filter:
+            time_range = parse_time_range(query)
+            if time_range is not None and is_recall_query(query):
+                since, until = time_range
+                auto_filtered = True
+            else:
+                # “今天吃什么”之类的查询仍需要更早的偏好，时间范围只影响排序
+                boost_range = time_range
+        
+        ts_condition = {}
+        if since is not None:
+            ts_condition["$gte"] = since
+        if until is not None:
+            ts_condition["$lt"] = until
+        if ts_condition:
+            where["ts"] = ts_condition
+        
+        types = options.get("types")
+        if types:
+            where["type"] = {"$in": list(types)}
+        return where or None, auto_filtered, boost_range
+    
+    def _retrieve(self, query: str, k: int, where: Optional[Dict[str, Any]],
+                  time_range: Optional[tuple] = None) -> List[Document]:
+        """
+        检索并排序：关键词可信时跳过向量检索，否则融合两路结果
+        
+        Args:
+            query: 查询文本
+            k: 返回条数
+            where: 过滤条件
+            time_range: 排序时加分的时间范围
+            
+        Returns:
+            文档列表
+        """
+        keyword_hits = self._keyword_search(query, k, where)
+        candidates = self._keyword_fast_path(query, keyword_hits)
+        if candidates is None:
+            embedding = self.embeddings.embed_query(query)
+            vector_hits = self.backend.search(embedding, k=self._candidate_count(k), where=where)
+            candidates = self._fuse(keyword_hits, vector_hits)
+        return self.ranker.rank(candidates, k, time_range)
+    
+    async def _aretrieve(self, query: str, k: int, where: Optional[Dict[str, Any]],
+                         time_range: Optional[tuple] = None) -> List[Document]:
+        """
+        异步检索并排序，流程同_retrieve
+        
+        Args:
+            query: 查询文本
+            k: 返回条数
+            where: 过滤条件
+            time_range: 排序时加分的时间范围
+            
+        Returns:
+            文档列表
+        """
+        keyword_hits = self._keyword_search(query, k, where)
+        candidates = self._keyword_fast_path(query, keyword_hits)
+        if candidates is None:
+            embedding = await self.embeddings.aembed_query(query)
+            vector_hits = await asyncio.to_thread(self.backend.search, embedding, self._candidate_count(k), where)
+            candidates = self._fuse(keyword_hits, vector_hits)
+        return self.ranker.rank(candidates, k, time_range)
+    
+    def _candidate_count(self, k: int) -> int:
+        """
+        每一路检索的候选数，多取一些供融合和重排序
+        """
+        return k * 4
+    
+    def _keyword_search(self, query: str, k: int, where: Optional[Dict[str, Any]] = None) -> List[tuple]:
+        """
+        关键词检索
+        
+        Args:
+            query: 查询文本
+            k: 最终返回条数
+            where: 过滤条件
+            
+        Returns:
+            (文档, BM25分数)列表，未启用关键词索引时为空
+        """
+        if self.keyword_index is None:
+            return []
+        return self.keyword_index.search(query, k=self._candidate_count(k), where=where)
+    
+    def _keyword_fast_path(self, query: str, keyword_hits: List[tuple]) -> Optional[List[tuple]]:
+        """
+        关键词结果足够可信时直接作为候选，跳过查询向量的计算
+        
+        Args:
+            query: 查询文本
+            keyword_hits: 关键词检索结果
+            
+        Returns:
+            (文档, 相关度)候选列表，不满足快速路径条件时返回None
+        """
+        if not keyword_hits:
+            return None
+        if self.keyword_index.coverage(query, keyword_hits[0][0]) < self.keyword_fast_path_threshold:
+            return None
+        self._record_path("keyword")
+        top = keyword_hits[0][1] or 1.0
+        return [(doc, score / top) for doc, score in keyword_hits]
+    
+    def _fuse(self, keyword_hits: List[tuple], vector_hits: List[tuple]) -> List[tuple]:
+        """
+        用倒数排名融合（RRF）合并关键词和向量检索结果
+        
+        Args:
+            keyword_hits: 关键词检索结果
+            vector_hits: 向量检索结果，分数为余弦相似度
+            
+        Returns:
+            (文档, 0到1之间的相关度)候选列表
+        """
+        if not keyword_hits:
+            self._record_path("vector")
+            return [(doc, max(similarity, 0.0)) for doc, similarity in vector_hits]
+        self._record_path("hybrid")
+        
+        scores: Dict[str, float] = {}
+        docs: Dict[str, Document] = {}
+        for hits in (keyword_hits, vector_hits):
+            for rank, (doc, _) in enumerate(hits):
+                # 文档内容包含时间戳，可以作为两路结果之间的同一性键
+                key = doc.page_content
+                docs.setdefault(key, doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        top = max(scores.values())
+        return [(docs[key], score / top) for key, score in scores.items()]
+    
+    def _record_path(self, path: str) -> None:
+        """
+        记录本次检索走的路径
+        """
+        with self._stats_lock:
+            self.retrieval_paths[path] += 1
+    
+    def _retrieval_cache_key(self, query: str, k: int, where: Optional[Dict[str, Any]] = None) -> tuple:
+        """
+        计算检索缓存键
+        
+        Args:
+            query: 查询文本
+            k: 检索条数
+            where: 过滤条件
+            
+        Returns:
+            (规范化查询, k, 过滤条件, 集合版本号)
+        """
+        normalized = " ".join(query.split()).lower()
+        return (normalized, k, json.dumps(where, sort_keys=True), self._version)
+    
+    def _format_memories(self, docs: List[Document]) -> str:
+        """
+        将检索到的文档格式化为记忆文本
+        
+        Args:
+            docs: 文档列表
+            
+        Returns:
+            记忆文本
+        """
+        if docs:
+            return "\n".join([f"- {doc.page_content}" for doc in docs])
+        return "暂无相关历史记忆"
+    
     def clear(self) -> None:
         """清除所有记忆"""
-        # Chroma没有直接清除集合的API，我们删除持久化目录
-        if os.path.exists(self.persist_directory):
-            import shutil
-            shutil.rmtree(self.persist_directory)
+        with self._buffer_lock:
+            self._buffer = []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        
+        self._version += 1
+        self.retrieval_cache.clear()
+        
+        if self._filter is not None:
+            # 共享集合中只删除本用户的文档
+            self.backend.delete(where=self._filter)
+        else:
+            self.backend.clear()
+        if self.keyword_index is not None:
+            self.keyword_index.clear()
     
     def get_size(self) -> int:
         """
@@ -124,8 +710,22 @@ class LongTermMemory(MemoryBase):
             记忆数量
         """
         try:
-            # 获取集合中的文档数量
-            return self.vector_store._collection.count()
+            # 获取集合中的文档数量（含尚未写入的缓冲文档）
+            return self.backend.count(self._filter) + len(self._buffer)
         except Exception as e:
             print(f"获取记忆大小出错: {e}")
-            return 0
\ No newline at end of file
+            return 0
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存命中统计
+        
+        Returns:
+            各级缓存的统计字典
+        """
+        stats = {"retrieval": self.retrieval_cache.get_stats()}
+        with self._stats_lock:
+            stats["retrieval_paths"] = dict(self.retrieval_paths)
+        if isinstance(self._embeddings, CachedEmbeddings):
+            stats["embedding"] = self._embeddings.get_stats()
+        return stats
\ No newline at end of file
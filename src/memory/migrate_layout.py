@@ -0,0 +1,127 @@
+"""
+长期记忆存储布局迁移工具
+
+将per_user布局（每个用户一个 ./chroma_db_<user_name> 目录）中的记忆迁移到
+shared布局（所有用户共用一个集合，文档带user_name元数据）。
+直接复制已有的向量，不会重新调用嵌入接口；文档ID加上用户名前缀后写入，
+重复运行不会产生重复文档。
+
+用法：
+    python -m src.memory.migrate_layout --batch-size 1000
+"""
+
+import argparse
+import glob
+import os
+import time
+from typing import Any, Dict, List
+from src.config import config
+from .chroma_client import get_shared_client
+
+def find_user_directories(persist_directory_prefix: str) -> Dict[str, str]:
+    """
+    查找per_user布局的用户目录
+    
+    Args:
+        persist_directory_prefix: 持久化目录前缀
+    
+    Returns:
+        用户名到目录的映射
+    """
+    directories = {}
+    for path in sorted(glob.glob(f"{persist_directory_prefix}*")):
+        if os.path.isdir(path):
+            directories[path[len(persist_directory_prefix):]] = path
+    return directories
+
+def migrate_user(user_name: str, source_directory: str, collection_name: str,
+                 target: Any, batch_size: int = 1000) -> int:
+    """
+    迁移单个用户的记忆
+    
+    Args:
+        user_name: 用户名
+        source_directory: 该用户的Chroma目录
+        collection_name: 该用户的集合名称
+        target: shared布局的目标集合
+        batch_size: 每批读取和写入的文档数
+    
+    Returns:
+        迁移的文档数
+    """
+    import chromadb
+    
+    client = chromadb.PersistentClient(path=source_directory)
+    try:
+        source = client.get_collection(collection_name)
+    except Exception:
+        print(f"用户 {user_name} 的目录中没有集合 {collection_name}，已跳过")
+        return 0
+    
+    total = 0
+    offset = 0
+    while True:
+        batch = source.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "documents", "metadatas"]
+        )
+        ids: List[str] = batch["ids"]
+        if not ids:
+            break
+        metadatas = [dict(metadata or {}, user_name=user_name) for metadata in batch["metadatas"]]
+        target.upsert(
+            ids=[f"{user_name}:{doc_id}" for doc_id in ids],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=metadatas
+        )
+        total += len(ids)
+        offset += len(ids)
+    return total
+
+def main():
+    """
+    命令行入口
+    """
+    long_term = config.memory_config["long_term"]
+    parser = argparse.ArgumentParser(description="将长期记忆从per_user布局迁移到shared布局")
+    parser.add_argument("--source-prefix", default=long_term["persist_directory_prefix"], help="per_user布局的目录前缀")
+    parser.add_argument("--collection-prefix", default=long_term["collection_name_prefix"], help="per_user布局的集合名称前缀")
+    parser.add_argument("--target", default=long_term["shared_persist_directory"], help="shared布局的持久化目录")
+    parser.add_argument("--collection", default=long_term["shared_collection_name"], help="shared布局的集合名称")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批迁移的文档数")
+    parser.add_argument("--dry-run", action="store_true", help="只列出待迁移的用户目录")
+    args = parser.parse_args()
+    
+    directories = find_user_directories(args.source_prefix)
+    target_path = os.path.abspath(args.target)
+    directories = {
+        user_name: path for user_name, path in directories.items()
+        if os.path.abspath(path) != target_path
+    }
+    print(f"找到 {len(directories)} 个用户目录")
+    if args.dry_run:
+        for user_name, path in directories.items():
+            print(f"  {user_name}: {path}")
+        return
+    
+    target = get_shared_client(args.target).get_or_create_collection(args.collection)
+    start = time.perf_counter()
+    total = 0
+    for user_name, path in directories.items():
+        count = migrate_user(
+            user_name,
+            path,
+            f"{args.collection_prefix}{user_name}",
+            target,
+            batch_size=args.batch_size
+        )
+        total += count
+        print(f"用户 {user_name}: 迁移 {count} 条记忆")
+    elapsed = time.perf_counter() - start
+    print(f"迁移完成：{len(directories)} 个用户，共 {total} 条记忆，耗时 {elapsed:.1f} 秒")
+    print("确认无误后可将 LONG_TERM_LAYOUT 设为 shared，并删除旧的用户目录")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,488 @@
+"""
+基于NumPy内存映射矩阵的本地向量后端
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from .vector_backend import VectorBackend
+
+class NumpyVectorBackend(VectorBackend):
+    """
+    轻量级本地向量后端
+    
+    向量归一化后按行存放在内存映射的float32矩阵文件中，检索时用一次矩阵乘法
+    计算全部余弦相似度再取top-k；文档内容和元数据存放在SQLite中。
+    打开时只映射文件、读取存活行号，不需要加载索引，适合每个用户数千到数十万条记忆的规模。
+    删除的行只做标记，空间在compact或clear时回收。compact把存活的行写到下一代向量文件，
+    与行号改写在同一个SQLite事务中切换到新文件，中途崩溃时打开仍使用与元数据一致的那一代。
+    user_name、type和ts（时间戳）存为SQLite中带索引的列，同时在内存中保存一份按行对齐的
+    列数组；按用户、类型和时间范围过滤时用数组运算得到候选行，只对这些行计算相似度。
+    """
+    
+    VECTOR_FILE = "vectors.f32"
+    # 压缩后的向量文件按代编号，第0代沿用VECTOR_FILE
+    VECTOR_FILE_PATTERN = "vectors.{generation}.f32"
+    METADATA_FILE = "metadata.sqlite"
+    # 单独成列并建索引的元数据，按这些字段过滤时只需扫描命中的行
+    INDEXED_COLUMNS = {"user_name": "TEXT", "type": "TEXT", "ts": "REAL"}
+    SQL_OPERATORS = {"$eq": "=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+    
+    def __init__(self, directory: str, initial_capacity: int = 1024):
+        """
+        初始化后端
+        
+        Args:
+            directory: 存储目录
+            initial_capacity: 向量矩阵的初始行数，写满后按倍数扩容
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        
+        self._conn = sqlite3.connect(os.path.join(directory, self.METADATA_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+            "content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._ensure_indexed_columns()
+        self._conn.commit()
+        
+        info = dict(self._conn.execute("SELECT key, value FROM info").fetchall())
+        self.dim: Optional[int] = int(info["dim"]) if "dim" in info else None
+        # 元数据对应的向量文件代数，其他代的文件是compact中途退出留下的
+        self._generation = int(info.get("generation", 0))
+        self.vector_path = self._vector_path(self._generation)
+        self._remove_stale_vectors()
+        # 已分配的行数（含已删除的行）
+        self._rows = int(info.get("rows", 0))
+        self._matrix: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        # 索引列的内存副本：ts为浮点数组，文本列为编码数组，-1表示缺失
+        self._ts = np.zeros(0, dtype=np.float64)
+        self._codes = {"user_name": np.zeros(0, dtype=np.int32), "type": np.zeros(0, dtype=np.int32)}
+        self._vocab: Dict[str, Dict[str, int]] = {"user_name": {}, "type": {}}
+        capacity = os.path.getsize(self.vector_path) // (self.dim * 4) if self.dim and os.path.exists(self.vector_path) else 0
+        if capacity > 0:
+            self._map(capacity)
+            self._load_columns()
+    
+    def add(self, ids: List[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        if not ids:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO info VALUES ('dim', ?)", (str(self.dim),))
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致：期望{self.dim}，实际{matrix.shape[1]}")
+            
+            # 相同ID视为覆盖写入
+            self._delete_rows(self._select_rows(
+                f"SELECT row FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids
+            ))
+            
+            start = self._rows
+            end = start + len(ids)
+            self._ensure_capacity(end)
+            # 先写向量再提交元数据，中途失败只会留下未被引用的行
+            self._matrix[start:end] = matrix
+            self._matrix.flush()
+            columns = list(self.INDEXED_COLUMNS)
+            self._conn.executemany(
+                f"INSERT INTO documents (row, id, content, metadata, {', '.join(columns)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' * len(columns))})",
+                [
+                    (start + i, doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False),
+                     *(doc.metadata.get(column) for column in columns))
+                    for i, (doc_id, doc) in enumerate(zip(ids, documents))
+                ]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO info VALUES ('rows', ?)", (str(end),))
+            self._conn.commit()
+            self._rows = end
+            for i, doc in enumerate(documents):
+                self._set_columns(start + i, doc.metadata)
+    
+    def search(self, vector: List[float], k: int = 3,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        with self._lock:
+            if k <= 0 or self._rows == 0 or self._matrix is None:
+                return []
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+            
+            rows = np.flatnonzero(self._candidate_mask(where))
+            if rows.size == 0:
+                return []
+            if rows.size * 4 < self._rows:
+                scores = self._matrix[rows] @ query
+            else:
+                # 候选较多时按行抽取的代价超过连续的矩阵乘法
+                scores = (self._matrix[:self._rows] @ query)[rows]
+            
+            if rows.size > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(rows.size)
+            top = top[np.argsort(-scores[top])]
+            return self._fetch([int(rows[i]) for i in top], [float(scores[i]) for i in top])
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            if ids:
+                rows = self._select_rows(f"SELECT row FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids)
+            elif where:
+                clause, params = self._where_clause(where)
+                rows = self._select_rows(f"SELECT row FROM documents WHERE {clause}", params)
+            else:
+                return
+            self._delete_rows(rows)
+            self._conn.commit()
+    
+    def count(self, where: Optional[Dict[str, Any]] = None) -> int:
+        with self._lock:
+            if where:
+                clause, params = self._where_clause(where)
+                return self._conn.execute(f"SELECT COUNT(*) FROM documents WHERE {clause}", params).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    
+    def get(self, where: Optional[Dict[str, Any]] = None) -> Tuple[List[str], List[List[float]], List[Document]]:
+        with self._lock:
+            if self._rows == 0 or self._matrix is None:
+                return [], [], []
+            mask = self._candidate_mask(where)
+            ids, rows, documents = [], [], []
+            for row, doc_id, content, metadata in self._conn.execute(
+                "SELECT row, id, content, metadata FROM documents ORDER BY row"
+            ):
+                if row < self._rows and mask[row]:
+                    ids.append(doc_id)
+                    rows.append(row)
+                    documents.append(Document(page_content=content, metadata=json.loads(metadata)))
+            return ids, self._matrix[rows].tolist(), documents
+    
+    def compact(self) -> None:
+        """
+        将存活的行前移并截断向量文件，回收已删除行占用的磁盘空间和检索时的扫描量
+        """
+        with self._lock:
+            if self._matrix is None:
+                return
+            rows = np.flatnonzero(self._alive[:self._rows])
+            if rows.size == self._rows:
+                return
+            
+            # 先把存活的向量写到下一代文件，旧文件保持不变
+            capacity = max(int(rows.size), self.initial_capacity)
+            generation = self._generation + 1
+            new_path = self._vector_path(generation)
+            with open(new_path, "wb") as f:
+                f.truncate(capacity * self.dim * 4)
+            compacted = np.memmap(new_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+            compacted[:rows.size] = self._matrix[rows]
+            compacted.flush()
+            del compacted
+            
+            # 行号改写和代数切换在同一事务中提交：提交前退出仍是旧文件和旧行号，提交后是新文件和新行号。
+            # 行号升序改写，目标行号不大于原行号，不会与尚未移动的行冲突
+            self._conn.executemany(
+                "UPDATE documents SET row = ? WHERE row = ?",
+                [(new_row, int(old_row)) for new_row, old_row in enumerate(rows) if new_row != old_row]
+            )
+            self._conn.execute("INSERT OR REPLACE INTO info VALUES ('rows', ?)", (str(rows.size),))
+            self._conn.execute("INSERT OR REPLACE INTO info VALUES ('generation', ?)", (str(generation),))
+            self._conn.commit()
+            
+            self._matrix.flush()
+            self._matrix = None
+            old_path = self.vector_path
+            self._generation = generation
+            self.vector_path = new_path
+            os.remove(old_path)
+            self._rows = int(rows.size)
+            self._alive = np.zeros(0, dtype=bool)
+            self._ts = np.zeros(0, dtype=np.float64)
+            self._codes = {column: np.zeros(0, dtype=np.int32) for column in self._codes}
+            self._vocab = {column: {} for column in self._vocab}
+            self._map(capacity)
+            self._load_columns()
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM info")
+            self._conn.commit()
+            self._matrix = None
+            self._alive = np.zeros(0, dtype=bool)
+            self._ts = np.zeros(0, dtype=np.float64)
+            self._codes = {column: np.zeros(0, dtype=np.int32) for column in self._codes}
+            self._vocab = {column: {} for column in self._vocab}
+            self._rows = 0
+            self.dim = None
+            if os.path.exists(self.vector_path):
+                os.remove(self.vector_path)
+            self._generation = 0
+            self.vector_path = self._vector_path(0)
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._conn.close()
+    
+    def _vector_path(self, generation: int) -> str:
+        """
+        获取某一代向量文件的路径
+        
+        Args:
+            generation: 代数
+        
+        Returns:
+            文件路径
+        """
+        name = self.VECTOR_FILE if generation == 0 else self.VECTOR_FILE_PATTERN.format(generation=generation)
+        return os.path.join(self.directory, name)
+    
+    def _remove_stale_vectors(self) -> None:
+        """
+        删除不属于当前代的向量文件
+        """
+        current = os.path.basename(self.vector_path)
+        for name in os.listdir(self.directory):
+            if name.startswith("vectors.") and name.endswith(".f32") and name != current:
+                os.remove(os.path.join(self.directory, name))
+    
+    def _ensure_indexed_columns(self) -> None:
+        """
+        补齐索引列并建立索引，旧文件中缺少的列从JSON元数据回填
+        """
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        for column, column_type in self.INDEXED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE documents ADD COLUMN {column} {column_type}")
+                self._conn.execute(f"UPDATE documents SET {column} = json_extract(metadata, '$.{column}')")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_user_ts ON documents (user_name, ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_type_ts ON documents (type, ts)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_ts ON documents (ts)")
+    
+    def _load_columns(self) -> None:
+        """
+        从SQLite读取各行的索引列，重建内存中的列数组
+        """
+        for row, user_name, doc_type, ts in self._conn.execute("SELECT row, user_name, type, ts FROM documents"):
+            self._set_columns(row, {"user_name": user_name, "type": doc_type, "ts": ts})
+    
+    def _map(self, capacity: int) -> None:
+        """
+        按给定行数映射向量文件
+        
+        Args:
+            capacity: 矩阵行数
+        """
+        self._matrix = np.memmap(self.vector_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._alive = self._resized(self._alive, capacity, False)
+        self._ts = self._resized(self._ts, capacity, np.nan)
+        for column, codes in self._codes.items():
+            self._codes[column] = self._resized(codes, capacity, -1)
+    
+    @staticmethod
+    def _resized(array: np.ndarray, capacity: int, fill: Any) -> np.ndarray:
+        """
+        复制数组到新长度，新增部分用fill填充
+        """
+        resized = np.full(capacity, fill, dtype=array.dtype)
+        resized[:min(len(array), capacity)] = array[:capacity]
+        return resized
+    
+    def _set_columns(self, row: int, metadata: Dict[str, Any]) -> None:
+        """
+        将一行的索引列写入内存数组并标记为存活
+        
+        Args:
+            row: 行号
+            metadata: 元数据
+        """
+        self._alive[row] = True
+        ts = metadata.get("ts")
+        self._ts[row] = np.nan if ts is None else float(ts)
+        for column, vocab in self._vocab.items():
+            value = metadata.get(column)
+            if value is None:
+                self._codes[column][row] = -1
+            else:
+                self._codes[column][row] = vocab.setdefault(value, len(vocab))
+    
+    def _candidate_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """
+        计算满足过滤条件的存活行，索引列用内存数组判断，其他字段查询SQLite
+        
+        Args:
+            where: 过滤条件
+        
+        Returns:
+            长度为已分配行数的布尔数组
+        """
+        mask = self._alive[:self._rows].copy()
+        rest = {}
+        for key, condition in (where or {}).items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            if key == "ts":
+                values = self._ts[:self._rows]
+                for operator, operand in condition.items():
+                    if operator == "$in":
+                        mask &= np.isin(values, list(operand))
+                    elif operator in self.SQL_OPERATORS:
+                        compare = {"$eq": np.equal, "$gt": np.greater, "$gte": np.greater_equal,
+                                   "$lt": np.less, "$lte": np.less_equal}[operator]
+                        mask &= compare(values, operand)
+                    else:
+                        raise ValueError(f"不支持的过滤运算符: {operator}")
+            elif key in self._codes and set(condition) <= {"$eq", "$in"}:
+                vocab = self._vocab[key]
+                for operator, operand in condition.items():
+                    wanted = operand if operator == "$in" else [operand]
+                    codes = [vocab[value] for value in wanted if value in vocab]
+                    mask &= np.isin(self._codes[key][:self._rows], codes)
+            else:
+                rest[key] = condition
+        if rest:
+            clause, params = self._where_clause(rest)
+            selected = np.zeros(self._rows, dtype=bool)
+            selected[self._select_rows(f"SELECT row FROM documents WHERE {clause}", params)] = True
+            mask &= selected
+        return mask
+    
+    def _ensure_capacity(self, rows: int) -> None:
+        """
+        向量文件不足rows行时扩容
+        
+        Args:
+            rows: 需要的行数
+        """
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, self.initial_capacity)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(self.vector_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._map(new_capacity)
+    
+    def _select_rows(self, sql: str, params: Any) -> List[int]:
+        """
+        执行查询并返回行号列表
+        """
+        return [row for (row,) in self._conn.execute(sql, list(params))]
+    
+    def _delete_rows(self, rows: List[int]) -> None:
+        """
+        删除行的元数据并标记向量失效，调用方负责提交事务
+        
+        Args:
+            rows: 行号列表
+        """
+        if not rows:
+            return
+        self._conn.executemany("DELETE FROM documents WHERE row = ?", [(row,) for row in rows])
+        self._alive[rows] = False
+    
+    def _where_clause(self, where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """
+        将元数据过滤条件转换为SQL条件，索引列直接比较，其他字段通过json_extract比较
+        
+        Args:
+            where: 元数据过滤条件
+        
+        Returns:
+            (SQL条件, 参数列表)
+        """
+        clauses = []
+        params = []
+        for key, condition in where.items():
+            if key in self.INDEXED_COLUMNS:
+                field = key
+            else:
+                field = "json_extract(metadata, ?)"
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                field_params = [] if key in self.INDEXED_COLUMNS else [f"$.{key}"]
+                if operator == "$in":
+                    if not operand:
+                        clauses.append("0")
+                        continue
+                    clauses.append(f"{field} IN ({','.join('?' * len(operand))})")
+                    params.extend(field_params + list(operand))
+                elif operator in self.SQL_OPERATORS:
+                    clauses.append(f"{field} {self.SQL_OPERATORS[operator]} ?")
+                    params.extend(field_params + [operand])
+                else:
+                    raise ValueError(f"不支持的过滤运算符: {operator}")
+        return " AND ".join(clauses) or "1", params
+    
+    def _fetch(self, rows: List[int], scores: List[float]) -> List[Tuple[Document, float]]:
+        """
+        按行号读取文档，保持传入的顺序
+        
+        Args:
+            rows: 行号列表
+            scores: 对应的相似度
+        
+        Returns:
+            (文档, 相似度)列表
+        """
+        if not rows:
+            return []
+        records = {
+            row: (content, metadata)
+            for row, content, metadata in self._conn.execute(
+                f"SELECT row, content, metadata FROM documents WHERE row IN ({','.join('?' * len(rows))})",
+                rows
+            )
+        }
+        results = []
+        for row, score in zip(rows, scores):
+            if row in records:
+                content, metadata = records[row]
+                results.append((Document(page_content=content, metadata=json.loads(metadata)), score))
+        return results
+
+_shared_backends: Dict[str, NumpyVectorBackend] = {}
+_shared_lock = threading.Lock()
+
+def get_shared_backend(directory: str) -> NumpyVectorBackend:
+    """
+    获取指定目录的共享后端，同一目录在进程内只打开一次
+    
+    Args:
+        directory: 存储目录
+    
+    Returns:
+        后端实例
+    """
+    path = os.path.abspath(directory)
+    with _shared_lock:
+        backend = _shared_backends.get(path)
+        if backend is None:
+            backend = NumpyVectorBackend(path)
+            _shared_backends[path] = backend
+        return backend
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+用户画像渲染
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional
+from src.utils import LRUCache, tokenize
+from .context_window import count_tokens
+from .user_profile import UserProfile
+
+# 画像类别在提示词中的显示名称
+CATEGORY_LABELS = {
+    "personal_info": "基本信息",
+    "interests": "兴趣",
+    "goals": "目标",
+    "experiences": "经历",
+    "relationships": "人际关系",
+    "habits": "习惯",
+    "concerns": "关注",
+    "likes": "喜欢",
+    "dislikes": "不喜欢"
+}
+
+class ProfileEntry:
+    """画像中的一条可独立选取的条目"""
+    
+    __slots__ = ("order", "category", "label", "text", "tokens", "terms", "core")
+    
+    def __init__(self, order: int, category: str, label: str, text: str, core: bool,
+                 model: str = "deepseek-chat"):
+        self.order = order
+        self.category = category
+        self.label = label
+        self.text = text
+        self.tokens = count_tokens(text, model)
+        self.terms = set(tokenize(text))
+        # 核心条目（基本信息）每轮都会带上
+        self.core = core
+
+class ProfileRenderer:
+    """
+    紧凑、按相关性筛选的画像渲染器
+    
+    画像变化后才重新拆分条目并统计token，每轮只需对条目打分；
+    输出按类别分行的紧凑文本，只包含与当前输入相关的条目，并受token预算限制。
+    """
+    
+    def __init__(self, max_tokens: int = 300, model: str = "deepseek-chat",
+                 cache_size: int = 64, relevant_max_tokens: int = 150):
+        """
+        初始化渲染器
+        
+        Args:
+            max_tokens: 渲染结果的token预算
+            model: 用于统计token的模型名称
+            cache_size: 渲染结果缓存的条目数
+            relevant_max_tokens: 快照之外相关条目的token预算
+        """
+        self.max_tokens = max_tokens
+        self.relevant_max_tokens = relevant_max_tokens
+        self.model = model
+        self._render_cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        
+        # 按画像版本缓存的拆分结果
+        self._version = None
+        self._entries: List[ProfileEntry] = []
+        self._full_tokens = 0
+        
+        # 节省的token统计
+        self.turns = 0
+        self.total_full_tokens = 0
+        self.total_rendered_tokens = 0
+        self.last_saved_tokens = 0
+    
+    def render(self, profile: UserProfile, query: str = "", max_tokens: Optional[int] = None) -> str:
+        """
+        渲染与当前输入相关的画像
+        
+        Args:
+            profile: 用户画像
+            query: 当前用户输入，为空时按预算渲染核心条目和最近的条目
+            max_tokens: token预算，默认使用初始化时的设置
+        
+        Returns:
+            紧凑格式的画像文本
+        """
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        version = self._refresh(profile)
+        
+        cache_key = (version, " ".join(query.split()), budget)
+        text = self._render_cache.get(cache_key)
+        if text is None:
+            text = self._format(self._select(query, budget))
+            self._render_cache.set(cache_key, text)
+        
+        self._record(count_tokens(text, self.model))
+        return text
+    
+    def render_full(self, profile: UserProfile) -> str:
+        """
+        渲染完整画像的紧凑格式，画像不变时直接返回缓存
+        
+        Args:
+            profile: 用户画像
+        
+        Returns:
+            紧凑格式的画像文本
+        """
+        version = self._refresh(profile)
+        cache_key = (version, None, None)
+        text = self._render_cache.get(cache_key)
+        if text is None:
+            text = self._format(list(self._entries))
+            self._render_cache.set(cache_key, text)
+        return text
+    
+    def render_relevant(self, profile: UserProfile, query: str, max_tokens: Optional[int] = None) -> str:
+        """
+        渲染与当前输入相关、但不在快照（render(profile)的结果）中的画像条目
+        
+        快照不随输入变化，可以放在提示词的稳定前缀中；这里的结果随输入变化，应放在每轮变化的部分
+        
+        Args:
+            profile: 用户画像
+            query: 当前用户输入
+            max_tokens: token预算，默认使用初始化时的设置
+        
+        Returns:
+            紧凑格式的画像文本，没有相关条目时返回“暂无”
+        """
+        budget = self.relevant_max_tokens if max_tokens is None else max_tokens
+        version = self._refresh(profile)
+        
+        cache_key = (version, "relevant", " ".join(query.split()), budget)
+        text = self._render_cache.get(cache_key)
+        if text is None:
+            snapshot = {entry.order for entry in self._select("", self.max_tokens)}
+            selected = []
+            used = 0
+            for entry in self._relevant(query):
+                if entry.order not in snapshot and used + entry.tokens <= budget:
+                    selected.append(entry)
+                    used += entry.tokens
+            text = self._format(selected)
+            self._render_cache.set(cache_key, text)
+        
+        tokens = count_tokens(text, self.model)
+        with self._lock:
+            # 计入累计注入的画像token
+            self.total_rendered_tokens += tokens
+        return text
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取token节省统计，基准为原先每轮注入的完整缩进JSON
+        
+        Returns:
+            包含轮数、累计token、累计节省和每轮平均节省的字典
+        """
+        with self._lock:
+            saved = self.total_full_tokens - self.total_rendered_tokens
+            return {
+                "turns": self.turns,
+                "full_tokens": self.total_full_tokens,
+                "rendered_tokens": self.total_rendered_tokens,
+                "saved_tokens": saved,
+                "avg_saved_per_turn": saved / self.turns if self.turns else 0.0,
+                "last_saved_tokens": self.last_saved_tokens
+            }
+    
+    def _refresh(self, profile: UserProfile) -> int:
+        """
+        画像版本变化时重新拆分条目
+        
+        Args:
+            profile: 用户画像
+        
+        Returns:
+            当前画像版本
+        """
+        with self._lock:
+            if profile.version == self._version:
+                return self._version
+        version, data = profile.snapshot()
+        entries = self._split(data)
+        full_tokens = count_tokens(json.dumps(data, ensure_ascii=False, indent=2), self.model)
+        with self._lock:
+            self._version = version
+            self._entries = entries
+            self._full_tokens = full_tokens
+        return version
+    
+    def _split(self, data: Dict[str, Any]) -> List[ProfileEntry]:
+        """
+        将画像拆分为条目
+        
+        Args:
+            data: 画像字典
+        
+        Returns:
+            条目列表，顺序与画像中的先后顺序一致
+        """
+        entries = []
+        
+        def add(category: str, label: str, value: Any, core: bool = False):
+            text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+            if text:
+                entries.append(ProfileEntry(len(entries), category, label, text, core, self.model))
+        
+        for category, value in data.items():
+            label = CATEGORY_LABELS.get(category, category)
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if isinstance(item, list):
+                        # 如preferences下的likes/dislikes
+                        sub_label = CATEGORY_LABELS.get(key, key)
+                        for sub_item in item:
+                            add(category, sub_label, sub_item)
+                    else:
+                        text = item if isinstance(item, str) else json.dumps(item, ensure_ascii=False)
+                        add(category, label, f"{key}={text}", core=category == "personal_info")
+            elif isinstance(value, list):
+                for item in value:
+                    add(category, label, item)
+            elif value:
+                add(category, label, value)
+        return entries
+    
+    def _select(self, query: str, budget: int) -> List[ProfileEntry]:
+        """
+        在预算内选取条目：先核心条目，再按与输入的词项重合度选取；
+        没有相关条目时用最近的条目补足
+        
+        Args:
+            query: 当前用户输入
+            budget: token预算
+        
+        Returns:
+            选中的条目
+        """
+        with self._lock:
+            entries = self._entries
+        
+        selected = []
+        used = 0
+        
+        def take(entry: ProfileEntry) -> None:
+            nonlocal used
+            if used + entry.tokens <= budget:
+                selected.append(entry)
+                used += entry.tokens
+        
+        for entry in entries:
+            if entry.core:
+                take(entry)
+        
+        relevant = self._relevant(query)
+        for entry in relevant:
+            take(entry)
+        
+        if not relevant:
+            for entry in reversed(entries):
+                if not entry.core:
+                    take(entry)
+        
+        return selected
+    
+    def _relevant(self, query: str) -> List[ProfileEntry]:
+        """
+        按与输入的词项重合度排序的非核心条目
+        
+        Args:
+            query: 当前用户输入
+        
+        Returns:
+            与输入有重合的条目，越相关越靠前，相关度相同时较新的在前
+        """
+        with self._lock:
+            entries = self._entries
+        
+        query_terms = set(tokenize(query))
+        scored = []
+        if query_terms:
+            for entry in entries:
+                if entry.core or not entry.terms:
+                    continue
+                overlap = len(entry.terms & query_terms)
+                if overlap:
+                    scored.append((overlap / len(entry.terms) ** 0.5, entry.order, entry))
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        return [entry for _, _, entry in scored]
+    
+    def _format(self, entries: List[ProfileEntry]) -> str:
+        """
+        按类别分行输出紧凑文本
+        
+        Args:
+            entries: 条目列表
+        
+        Returns:
+            画像文本
+        """
+        if not entries:
+            return "暂无"
+        groups: Dict[str, List[ProfileEntry]] = {}
+        for entry in sorted(entries, key=lambda e: e.order):
+            groups.setdefault(entry.label, []).append(entry)
+        return "\n".join(
+            f"{label}: {'; '.join(entry.text for entry in group)}"
+            for label, group in groups.items()
+        )
+    
+    def _record(self, rendered_tokens: int) -> None:
+        """
+        记录本轮节省的token
+        
+        Args:
+            rendered_tokens: 本轮渲染结果的token数
+        """
+        with self._lock:
+            self.turns += 1
+            self.total_full_tokens += self._full_tokens
+            self.total_rendered_tokens += rendered_tokens
+            self.last_saved_tokens = self._full_tokens - rendered_tokens
\ No newline at end of file
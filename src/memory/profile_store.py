@@ -0,0 +1,134 @@
+"""
+用户画像的追加式存储引擎
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+class ProfileStore:
+    """
+    用户画像的追加式存储
+    
+    每次画像变更以一行JSON追加写入日志文件，累计一定数量后把完整画像
+    压缩成快照并清空日志。快照通过临时文件加重命名原子替换，写入中途崩溃
+    不会损坏已有画像；日志末尾不完整的一行会在加载时被跳过。
+    """
+    
+    def __init__(self, snapshot_file: str, log_file: str = None,
+                 compact_every: int = 200, fsync: bool = False):
+        """
+        初始化存储
+        
+        Args:
+            snapshot_file: 快照文件路径
+            log_file: 变更日志路径，默认为快照文件名加.log后缀
+            compact_every: 日志累计多少条记录后压缩成快照
+            fsync: 每次追加后是否调用fsync，开启后更安全但更慢
+        """
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file or f"{snapshot_file}.log"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.pending_records = 0
+        self._log = None
+    
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        读取快照和快照之后的变更记录
+        
+        Returns:
+            (快照字典，不存在时为None, 变更记录列表)
+        """
+        snapshot = None
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        
+        records = []
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # 崩溃时写了一半的记录
+                        print(f"跳过画像日志中不完整的记录: {self.log_file}")
+        self.pending_records = len(records)
+        return snapshot, records
+    
+    def append(self, record: Dict[str, Any]) -> bool:
+        """
+        追加一条变更记录
+        
+        Args:
+            record: 变更记录
+        
+        Returns:
+            是否已达到压缩阈值
+        """
+        if self._log is None:
+            self._log = open(self.log_file, 'a', encoding='utf-8')
+        self._log.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self.pending_records += 1
+        return self.pending_records >= self.compact_every
+    
+    def compact(self, profile: Dict[str, Any]) -> None:
+        """
+        将完整画像原子写入快照并清空日志
+        
+        Args:
+            profile: 当前完整画像
+        """
+        self._atomic_write(self.snapshot_file, json.dumps(profile, ensure_ascii=False, indent=2))
+        # 快照写入成功后才清空日志；两步之间崩溃时日志会被重放，变更可重复应用
+        self._close_log()
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.pending_records = 0
+    
+    def clear(self) -> None:
+        """删除快照和日志"""
+        self._close_log()
+        for path in (self.snapshot_file, self.log_file):
+            if os.path.exists(path):
+                os.remove(path)
+        self.pending_records = 0
+    
+    def close(self) -> None:
+        """关闭日志文件"""
+        self._close_log()
+    
+    def _close_log(self) -> None:
+        """关闭日志文件句柄"""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+    
+    def _atomic_write(self, path: str, content: str) -> None:
+        """
+        先写临时文件再重命名，保证目标文件要么是旧内容要么是完整的新内容
+        
+        Args:
+            path: 目标文件路径
+            content: 文件内容
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_profile_")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
\ No newline at end of file
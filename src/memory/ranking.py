@@ -0,0 +1,219 @@
+"""
+长期记忆的排序：相似度、时间衰减与重要性加权
+"""
+
+import math
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from langchain.schema import Document
+
+# 陈述个人信息、偏好和计划的句式
+PERSONAL_PATTERN = re.compile(
+    r"我(是|叫|的|喜欢|爱|讨厌|不喜欢|住|在|想|要|打算|计划|准备|决定|害怕|担心|希望)|记住|别忘"
+    r"|\bmy\b|\bi (am|like|love|hate|live|want|plan)\b",
+    re.IGNORECASE
+)
+
+_CHINESE_DIGITS = {"一": 1, "两": 2, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+_RECENT_DAYS_PATTERN = re.compile(r"(?:最近|过去|近)\s*([0-9]+|[一两二三四五六七八九十])\s*(天|周|个月|月)")
+_RECENT_DAYS_EN_PATTERN = re.compile(r"\b(?:last|past)\s+([0-9]+)\s+(day|week|month)s?\b", re.IGNORECASE)
+
+# 明确回忆过去对话的句式，如“昨天我说过”“上周聊了”“what did I say”
+_RECALL_PATTERN = re.compile(
+    r"(说|提|讲|聊|谈|问|告诉)(过|了)|还记得|记不记得|之前说|上次说"
+    r"|\b(did|what) (i|we) (say|tell|mention|talk|discuss)|\b(i|we) (said|told|mentioned|talked|discussed)\b"
+    r"|\bremember\b",
+    re.IGNORECASE
+)
+
+def score_importance(user_input: str, extracted_count: int = 0) -> float:
+    """
+    保存时估算记忆的重要性
+    
+    Args:
+        user_input: 用户输入
+        extracted_count: 从该轮对话中提取出的画像条目数
+    
+    Returns:
+        0到1之间的重要性
+    """
+    score = 0.2
+    if extracted_count:
+        score += 0.3 + min(extracted_count, 6) * 0.05
+    if user_input and PERSONAL_PATTERN.search(user_input):
+        score += 0.2
+    return min(score, 1.0)
+
+def to_timestamp(value: Any) -> Optional[float]:
+    """
+    将时间转换为Unix时间戳
+    
+    Args:
+        value: ISO格式字符串、datetime或数字
+    
+    Returns:
+        时间戳，无法解析时返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+def is_recall_query(query: str) -> bool:
+    """
+    判断查询是否在回忆过去的对话。只有这类查询中的时间词才应作为检索前的过滤条件，
+    “今天晚饭吃什么”中的“今天”只说明当前的情境，不代表只需要今天的记忆
+    
+    Args:
+        query: 查询文本
+    
+    Returns:
+        是否为回忆类查询
+    """
+    return bool(_RECALL_PATTERN.search(query))
+
+def parse_time_range(query: str, now: Optional[datetime] = None) -> Optional[Tuple[float, Optional[float]]]:
+    """
+    从查询中识别时间范围，如“昨天”“上周”“最近3天”“last week”
+    
+    Args:
+        query: 查询文本
+        now: 当前时间，默认为系统时间
+    
+    Returns:
+        (起始时间戳, 结束时间戳)，结束为None表示到现在；未识别到时返回None
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    monday = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    year_start = month_start.replace(month=1)
+    lowered = query.lower()
+    
+    match = _RECENT_DAYS_PATTERN.search(query)
+    if match:
+        count = match.group(1)
+        count = int(count) if count.isdigit() else _CHINESE_DIGITS[count]
+        days = count * {"天": 1, "周": 7, "个月": 30, "月": 30}[match.group(2)]
+        return (now - timedelta(days=days)).timestamp(), None
+    match = _RECENT_DAYS_EN_PATTERN.search(query)
+    if match:
+        days = int(match.group(1)) * {"day": 1, "week": 7, "month": 30}[match.group(2).lower()]
+        return (now - timedelta(days=days)).timestamp(), None
+    
+    def between(start: datetime, end: Optional[datetime]) -> Tuple[float, Optional[float]]:
+        return start.timestamp(), end.timestamp() if end else None
+    
+    if "前天" in query:
+        return between(today - timedelta(days=2), today - timedelta(days=1))
+    if "昨天" in query or "yesterday" in lowered:
+        return between(today - timedelta(days=1), today)
+    if "今天" in query or "today" in lowered:
+        return between(today, None)
+    if any(word in query for word in ("上周", "上星期", "上个星期", "上礼拜")) or "last week" in lowered:
+        return between(monday - timedelta(days=7), monday)
+    if any(word in query for word in ("这周", "本周", "这星期", "这个星期")) or "this week" in lowered:
+        return between(monday, None)
+    if any(word in query for word in ("上个月", "上月")) or "last month" in lowered:
+        previous = (month_start - timedelta(days=1)).replace(day=1)
+        return between(previous, month_start)
+    if any(word in query for word in ("这个月", "本月")) or "this month" in lowered:
+        return between(month_start, None)
+    if "去年" in query or "last year" in lowered:
+        return between(year_start.replace(year=year_start.year - 1), year_start)
+    if "今年" in query or "this year" in lowered:
+        return between(year_start, None)
+    return None
+
+class MemoryRanker:
+    """
+    将检索相关度与时间衰减、重要性混合排序
+    
+    最终分数 = 相关度 × (1 - 时间权重 - 重要性权重) + 时间权重 × 新鲜度 + 重要性权重 × 重要性，
+    新鲜度按半衰期指数衰减。两个权重都为0时等价于只按相关度排序。
+    查询中提到的时间范围（不作为过滤条件时）只给范围内的记忆加分。
+    """
+    
+    def __init__(self, recency_weight: float = 0.2, importance_weight: float = 0.1,
+                 half_life_days: float = 30.0, time_range_boost: float = 0.15):
+        """
+        初始化排序器
+        
+        Args:
+            recency_weight: 新鲜度权重
+            importance_weight: 重要性权重
+            half_life_days: 新鲜度衰减到一半所需的天数
+            time_range_boost: 落在查询提到的时间范围内的记忆的加分
+        """
+        self.recency_weight = recency_weight
+        self.importance_weight = importance_weight
+        self.half_life_days = half_life_days
+        self.time_range_boost = time_range_boost
+    
+    def score(self, relevance: float, metadata: Dict[str, Any], now: Optional[float] = None,
+              time_range: Optional[Tuple[float, Optional[float]]] = None) -> float:
+        """
+        计算单条记忆的混合分数
+        
+        Args:
+            relevance: 0到1之间的相关度
+            metadata: 记忆的元数据
+            now: 当前时间戳
+            time_range: 查询提到的时间范围(起始, 结束)，结束为None表示到现在
+        
+        Returns:
+            混合分数
+        """
+        now = time.time() if now is None else now
+        ts = metadata.get("ts")
+        if ts is None:
+            ts = to_timestamp(metadata.get("timestamp"))
+        if ts is None or self.half_life_days <= 0:
+            recency = 0.0
+        else:
+            age_days = max(now - ts, 0.0) / 86400
+            recency = math.exp(-math.log(2) * age_days / self.half_life_days)
+        
+        importance = metadata.get("importance")
+        if importance is None:
+            importance = score_importance(
+                metadata.get("user_input", ""),
+                1 if metadata.get("type") == "conversation_with_extraction" else 0
+            )
+        
+        relevance_weight = 1.0 - self.recency_weight - self.importance_weight
+        score = relevance_weight * relevance + self.recency_weight * recency + self.importance_weight * importance
+        if time_range is not None and ts is not None and ts >= time_range[0] \
+                and (time_range[1] is None or ts < time_range[1]):
+            score += self.time_range_boost
+        return score
+    
+    def rank(self, candidates: List[Tuple[Document, float]], k: int,
+             time_range: Optional[Tuple[float, Optional[float]]] = None) -> List[Document]:
+        """
+        对候选记忆排序
+        
+        Args:
+            candidates: (文档, 0到1之间的相关度)列表
+            k: 返回条数
+            time_range: 查询提到的时间范围，范围内的记忆加分
+        
+        Returns:
+            排序后的前k条文档
+        """
+        if self.recency_weight == 0 and self.importance_weight == 0 and time_range is None:
+            ranked = sorted(candidates, key=lambda item: item[1], reverse=True)
+            return [doc for doc, _ in ranked[:k]]
+        now = time.time()
+        scored = [(self.score(relevance, doc.metadata, now, time_range), doc) for doc, relevance in candidates]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [doc for _, doc in scored[:k]]
\ No newline at end of file
@@ -2,25 +2,65 @@
 短期记忆实现
 """
 
-from typing import Any, Dict, List
-from langchain.memory import ConversationBufferMemory
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from .base import MemoryBase
+from .context_window import count_message_tokens
 
 class ShortTermMemory(MemoryBase):
-    """短期记忆实现，基于对话历史"""
+    """
+    短期记忆实现，分为两层：
+    - 最近的若干轮对话原样保存在定长环形缓冲区中
+    - 更早的对话由后台线程调用摘要函数压缩进一段滚动摘要
+    每个会话占用的内存有固定上限，不随对话轮数增长。
+    """
     
-    def __init__(self, memory_key: str = "chat_history", return_messages: bool = True):
+    # 摘要失败后的重试次数和首次退避时间（秒），每次重试退避时间翻倍；
+    # 仍失败时待摘要的轮次保留，下一轮对话再重新尝试
+    SUMMARY_RETRIES = 2
+    SUMMARY_BACKOFF = 1.0
+    
+    def __init__(self, memory_key: str = "chat_history", return_messages: bool = True,
+                 max_recent_turns: int = 10, max_pending_turns: int = 50,
+                 max_summary_chars: int = 2000, window_turns: int = 6,
+                 window_max_tokens: int = 2000, model: str = "deepseek-chat",
+                 summarizer: Optional[Callable[[str, List[BaseMessage]], str]] = None):
         """
         初始化短期记忆
         
         Args:
             memory_key: 记忆键名
             return_messages: 是否返回消息对象
+            max_recent_turns: 原样保存的最近对话轮数
+            max_pending_turns: 等待摘要的对话轮数上限，超出时丢弃最早的轮次
+            max_summary_chars: 摘要的最大字符数
+            window_turns: 注入提示词的最近对话轮数上限
+            window_max_tokens: 注入提示词的最近对话token数上限
+            model: 用于统计token的模型名称
+            summarizer: 摘要函数，接收已有摘要和待压缩的消息，返回新摘要；为None时直接丢弃旧对话
         """
-        self.memory = ConversationBufferMemory(
-            memory_key=memory_key,
-            return_messages=return_messages
-        )
+        self.memory_key = memory_key
+        self.return_messages = return_messages
+        self.max_summary_chars = max_summary_chars
+        self.window_turns = window_turns
+        self.window_max_tokens = window_max_tokens
+        self.model = model
+        self.summarizer = summarizer
+        
+        # 最近对话环形缓冲区，每个元素为 (用户消息, AI消息, token数)
+        self._recent = deque(maxlen=max_recent_turns)
+        # 等待摘要的对话
+        self._pending = deque(maxlen=max_pending_turns)
+        self.summary = ""
+        
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._summarizing = False
+        # clear时递增，用于丢弃清除前发起的摘要结果
+        self._generation = 0
     
     def save(self, key: str, value: Any) -> None:
         """
@@ -33,27 +73,185 @@ class ShortTermMemory(MemoryBase):
         if key == "context":
             # 保存对话上下文
             if isinstance(value, dict) and "input" in value and "output" in value:
-                self.memory.save_context(value["input"], value["output"])
+                human = HumanMessage(content=value["input"]["input"])
+                ai = AIMessage(content=value["output"]["output"])
+                turn = (human, ai, count_message_tokens(human, self.model) + count_message_tokens(ai, self.model))
+                with self._lock:
+                    if len(self._recent) == self._recent.maxlen:
+                        # 环形缓冲区已满，最早的一轮转入摘要层
+                        if self.summarizer is not None:
+                            self._pending.append(self._recent[0])
+                    self._recent.append(turn)
+                    start_summarizer = bool(self._pending) and not self._summarizing
+                    if start_summarizer:
+                        self._summarizing = True
+                
+                if start_summarizer:
+                    threading.Thread(
+                        target=self._run_summarizer,
+                        name="short-term-summarizer",
+                        daemon=True
+                    ).start()
     
-    def load(self, key: str) -> Any:
+    def load(self, key: str, **kwargs) -> Any:
         """
         加载记忆
         
         Args:
             key: 记忆键名
-            
+            **kwargs: 额外参数，key为recent时可用max_turns、max_tokens限制窗口大小
+        
         Returns:
             记忆值
         """
+        if key == "recent":
+            return self._get_window(
+                kwargs.get("max_turns", self.window_turns),
+                kwargs.get("max_tokens", self.window_max_tokens)
+            )
         if key == "chat_history":
-            return self.memory.load_memory_variables({}).get("chat_history", [])
+            messages = self._get_messages()
+            if self.return_messages:
+                return messages
+            return "\n".join(f"{self._role(msg)}: {msg.content}" for msg in messages)
+        if key == "summary":
+            return self.summary
         return None
     
+    def flush(self, timeout: float = None) -> bool:
+        """
+        等待后台摘要完成
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        
+        Returns:
+            是否在超时前完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._idle:
+            while self._summarizing:
+                if deadline is None:
+                    self._idle.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._idle.wait(remaining)
+        return True
+    
     def clear(self) -> None:
         """清除所有记忆"""
-        self.memory.clear()
+        with self._lock:
+            self._recent.clear()
+            self._pending.clear()
+            self.summary = ""
+            self._generation += 1
     
     def get_size(self) -> int:
         """获取记忆大小"""
-        chat_history = self.memory.load_memory_variables({}).get("chat_history", [])
-        return len(chat_history) if chat_history else 0
\ No newline at end of file
+        return 2 * len(self._recent)
+    
+    def _get_messages(self) -> List[BaseMessage]:
+        """
+        获取摘要和最近对话组成的消息列表
+        
+        Returns:
+            消息列表，存在摘要时以系统消息形式放在最前
+        """
+        with self._lock:
+            messages = []
+            if self.summary:
+                messages.append(SystemMessage(content=f"此前对话摘要：{self.summary}"))
+            for human, ai, _ in self._recent:
+                messages.extend([human, ai])
+            return messages
+    
+    def _get_window(self, max_turns: Optional[int], max_tokens: Optional[int]) -> List[BaseMessage]:
+        """
+        从最新的一轮开始向前选取对话，直到达到轮数或token上限
+        
+        Args:
+            max_turns: 最多选取的轮数，None表示不限
+            max_tokens: 最多选取的token数（含摘要），None表示不限
+            
+        Returns:
+            消息列表，存在摘要且预算允许时以系统消息形式放在最前
+        """
+        with self._lock:
+            summary = self.summary
+            turns = list(self._recent)
+        
+        used_tokens = 0
+        selected = []
+        for human, ai, tokens in reversed(turns):
+            if max_turns is not None and len(selected) >= max_turns:
+                break
+            if max_tokens is not None and used_tokens + tokens > max_tokens:
+                break
+            selected.append((human, ai))
+            used_tokens += tokens
+        
+        messages = []
+        if summary:
+            summary_message = SystemMessage(content=f"此前对话摘要：{summary}")
+            if max_tokens is None or used_tokens + count_message_tokens(summary_message, self.model) <= max_tokens:
+                messages.append(summary_message)
+        for human, ai in reversed(selected):
+            messages.extend([human, ai])
+        return messages
+    
+    def _run_summarizer(self) -> None:
+        """
+        后台摘要线程：持续压缩等待中的对话，直到没有新的待摘要轮次。
+        摘要失败时把这些轮次放回待摘要队列的最前面，退避后重试
+        """
+        failures = 0
+        while True:
+            with self._lock:
+                if not self._pending or failures > self.SUMMARY_RETRIES:
+                    self._summarizing = False
+                    self._idle.notify_all()
+                    return
+                turns = list(self._pending)
+                self._pending.clear()
+                summary = self.summary
+                generation = self._generation
+            
+            messages = [msg for human, ai, _ in turns for msg in (human, ai)]
+            try:
+                new_summary = self.summarizer(summary, messages)
+            except Exception as e:
+                print(f"短期记忆摘要出错: {e}")
+                failures += 1
+                with self._lock:
+                    if generation == self._generation:
+                        # 放回最前面，与期间新转入的轮次合计超过上限时丢弃最早的轮次
+                        requeued = turns + list(self._pending)
+                        self._pending.clear()
+                        self._pending.extend(requeued)
+                    if failures <= self.SUMMARY_RETRIES:
+                        self._idle.wait(self.SUMMARY_BACKOFF * 2 ** (failures - 1))
+                continue
+            
+            failures = 0
+            with self._lock:
+                if generation == self._generation:
+                    self.summary = new_summary[:self.max_summary_chars]
+    
+    @staticmethod
+    def _role(message: BaseMessage) -> str:
+        """
+        获取消息的角色名称
+        
+        Args:
+            message: 消息
+        
+        Returns:
+            角色名称
+        """
+        if isinstance(message, HumanMessage):
+            return "Human"
+        if isinstance(message, SystemMessage):
+            return "System"
+        return "AI"
\ No newline at end of file
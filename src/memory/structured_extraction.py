@@ -0,0 +1,489 @@
+"""
+结构化的画像信息提取
+
+LLM的自由文本输出经常带有markdown代码块、前后说明文字或尾随逗号，直接json.loads会失败，
+整次提取调用就浪费了。这里的提取器：
+1. 通过接口的JSON输出模式（response_format）或与画像类别对应的工具调用约束输出格式；
+2. 流式读取输出，用增量解析器追踪括号深度，顶层对象闭合后立即停止读取；
+3. 解析失败时先在本地修复接近JSON的文本，修复不了才重试；
+4. 统计浪费的调用（输出无法使用）比例，并与只用json.loads时的比例对照。
+"""
+
+import ast
+import json
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from langchain.schema import AIMessage, HumanMessage
+from .user_profile import DEFAULT_PROFILE
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+# 截断的对象后面紧跟的代码块结束标记；对象之前和闭合之后的文字（包括代码块标记）由解析器跳过
+_TRAILING_FENCE_PATTERN = re.compile(r"\s*```\s*$")
+_TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+_DANGLING_PATTERN = re.compile(r"[,:\s]*$")
+_DANGLING_KEY_PATTERN = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*$')
+
+RETRY_PROMPT = "上面的输出不是合法的JSON。请只返回一个JSON对象，不要包含代码块标记或其他文字。"
+
+PROFILE_TOOL_NAME = "record_user_profile"
+
+BATCH_TOOL_NAME = "record_user_profile_by_turn"
+
+def _profile_schema() -> Dict[str, Any]:
+    """
+    根据画像类别生成一组提取信息的JSON schema
+    
+    Returns:
+        对象类型的schema
+    """
+    properties = {}
+    for category, default in DEFAULT_PROFILE.items():
+        if isinstance(default, list):
+            properties[category] = {"type": "array", "items": {"type": "string"}}
+        elif default:
+            # 如preferences下的likes/dislikes
+            properties[category] = {
+                "type": "object",
+                "properties": {key: {"type": "array", "items": {"type": "string"}} for key in default}
+            }
+        else:
+            properties[category] = {"type": "object", "additionalProperties": {"type": "string"}}
+    return {"type": "object", "properties": properties}
+
+def build_profile_tool() -> Dict[str, Any]:
+    """
+    生成单轮提取的工具定义
+    
+    Returns:
+        OpenAI格式的工具定义
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": PROFILE_TOOL_NAME,
+            "description": "记录从对话中提取的用户画像信息，没有的类别省略",
+            "parameters": _profile_schema()
+        }
+    }
+
+def build_batch_tool() -> Dict[str, Any]:
+    """
+    生成多轮批量提取的工具定义，参数的键为轮次编号
+    
+    Returns:
+        OpenAI格式的工具定义
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": BATCH_TOOL_NAME,
+            "description": "按轮次记录从多轮对话中提取的用户画像信息，键为轮次编号，没有信息的轮次省略",
+            "parameters": {"type": "object", "additionalProperties": _profile_schema()}
+        }
+    }
+
+def split_batch_result(data: Dict[str, Any], turns: int) -> List[Dict[str, Any]]:
+    """
+    将批量提取的结果拆分到各轮
+    
+    Args:
+        data: 提取结果，键为从1开始的轮次编号
+        turns: 批次中的轮数
+    
+    Returns:
+        每轮的提取信息列表；没有轮次编号的键（模型按单轮格式返回，或混在编号中）归到最后一轮
+    """
+    infos = [{} for _ in range(turns)]
+    if not turns:
+        return infos
+    unnumbered = {}
+    for key, value in data.items():
+        if not str(key).strip().isdigit():
+            unnumbered[key] = value
+            continue
+        index = int(str(key).strip()) - 1
+        if 0 <= index < turns and isinstance(value, dict):
+            infos[index] = value
+    
+    last = dict(infos[-1])
+    for key, value in unnumbered.items():
+        current = last.get(key)
+        if isinstance(current, list) and isinstance(value, list):
+            last[key] = current + [item for item in value if item not in current]
+        elif isinstance(current, dict) and isinstance(value, dict):
+            last[key] = {**current, **value}
+        else:
+            last[key] = value
+    infos[-1] = last
+    return infos
+
+class IncrementalJSONParser:
+    """
+    增量JSON解析器
+    
+    逐段输入文本，跳过第一个左花括号之前的内容，跟踪字符串、转义和括号嵌套，
+    顶层对象闭合时即可解析，不必等待输出结束。
+    """
+    
+    def __init__(self):
+        """初始化解析器"""
+        self._chunks: List[str] = []
+        self._length = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._string_start: Optional[int] = None
+        self._escape = False
+    
+    @property
+    def complete(self) -> bool:
+        """顶层对象是否已经闭合"""
+        return self._end is not None
+    
+    @property
+    def text(self) -> str:
+        """目前收到的全部文本"""
+        return "".join(self._chunks)
+    
+    def feed(self, chunk: str) -> bool:
+        """
+        输入一段文本
+        
+        Args:
+            chunk: 文本片段
+        
+        Returns:
+            顶层对象是否已经闭合
+        """
+        if not chunk or self.complete:
+            return self.complete
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        for i, char in enumerate(chunk):
+            if self._start is None:
+                if char == "{":
+                    self._start = offset + i
+                    self._stack.append("}")
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                self._string_start = offset + i
+            elif char in "{[":
+                self._stack.append("}" if char == "{" else "]")
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if not self._stack:
+                    self._end = offset + i
+                    return True
+        return False
+    
+    def candidate(self) -> Optional[str]:
+        """
+        取出JSON对象的文本，未闭合时补齐引号和括号
+        
+        Returns:
+            JSON文本，还没有遇到左花括号时返回None
+        """
+        if self._start is None:
+            return None
+        text = self.text
+        if self.complete:
+            return text[self._start:self._end + 1]
+        # 输出被截断：去掉未闭合的字符串（不完整的值不可信）和最后一个不完整的键值，补齐括号
+        if self._in_string:
+            body = text[self._start:self._string_start]
+        else:
+            body = _TRAILING_FENCE_PATTERN.sub("", text[self._start:])
+        body = _DANGLING_PATTERN.sub("", body)
+        if self._stack[-1] == "}":
+            # 对象中最后一个只有键没有值的字符串
+            body = _DANGLING_PATTERN.sub("", _DANGLING_KEY_PATTERN.sub(r"\1", body))
+        return body + "".join(reversed(self._stack))
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    修复接近JSON的文本：去掉代码块标记和前后说明文字、尾随逗号，
+    补齐截断的括号，兼容Python字面量（单引号、True/False/None）
+    
+    Args:
+        text: LLM输出
+    
+    Returns:
+        解析结果，修复失败时返回None
+    """
+    parser = IncrementalJSONParser()
+    parser.feed(text or "")
+    candidate = parser.candidate()
+    if candidate is None:
+        return None
+    
+    attempts = [candidate, _TRAILING_COMMA_PATTERN.sub(r"\1", candidate)]
+    for attempt in attempts:
+        try:
+            return json.loads(attempt)
+        except ValueError:
+            pass
+    try:
+        return ast.literal_eval(attempts[-1])
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+
+def parse_json_object(text: str) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    解析LLM输出的JSON对象
+    
+    Args:
+        text: LLM输出
+    
+    Returns:
+        (解析结果, 状态)，状态为ok（可直接json.loads）、repaired（本地修复后可用）或failed
+    """
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data, "ok"
+    except (TypeError, ValueError):
+        pass
+    data = repair_json(text)
+    if isinstance(data, dict):
+        return data, "repaired"
+    return None, "failed"
+
+class StructuredExtractor:
+    """
+    结构化提取器，每个Agent创建一次，绑定了输出格式的LLM在首次提取时构建后复用
+    """
+    
+    MODES = ("json", "tool", "text")
+    
+    def __init__(self, llm: "ChatOpenAI", mode: str = "json", max_retries: int = 1, stream: bool = True,
+                 tool: Optional[Dict[str, Any]] = None):
+        """
+        初始化提取器
+        
+        Args:
+            llm: LLM客户端
+            mode: 输出约束方式，json为接口的JSON输出模式，tool为工具调用，text为不做约束的自由文本
+            max_retries: 修复失败后的重试次数
+            stream: 是否流式读取输出，顶层对象闭合后提前结束
+            tool: 工具调用模式使用的工具定义，默认为单轮提取的画像工具
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的提取模式: {mode}")
+        self.llm = llm
+        self.mode = mode
+        self.max_retries = max_retries
+        self.stream = stream
+        self.tool = tool or build_profile_tool()
+        self._runnable = None
+        self._lock = threading.Lock()
+        
+        # 统计：calls为LLM调用次数，strict_failures为只用json.loads时会失败的调用数，
+        # wasted为修复后仍无法使用的调用数
+        self.calls = 0
+        self.strict_failures = 0
+        self.repaired = 0
+        self.retries = 0
+        self.wasted = 0
+        self.failed_extractions = 0
+    
+    @property
+    def runnable(self) -> Any:
+        """
+        绑定输出格式的LLM，首次访问时构建
+        """
+        if self._runnable is None:
+            with self._lock:
+                if self._runnable is None:
+                    if self.mode == "json":
+                        self._runnable = self.llm.bind(response_format={"type": "json_object"})
+                    elif self.mode == "tool":
+                        self._runnable = self.llm.bind_tools([self.tool], tool_choice=self.tool["function"]["name"])
+                    else:
+                        self._runnable = self.llm
+        return self._runnable
+    
+    def extract(self, prompt: str) -> Dict[str, Any]:
+        """
+        提取画像信息
+        
+        Args:
+            prompt: 填充好的提取提示词
+        
+        Returns:
+            提取的信息
+        
+        Raises:
+            ValueError: 重试后仍无法解析时
+        """
+        messages = [HumanMessage(content=prompt)]
+        for attempt in range(self.max_retries + 1):
+            text = self._read(messages)
+            data = self._parse(text, attempt)
+            if data is not None:
+                return data
+            messages = self._retry_messages(prompt, text)
+        self._fail()
+        raise ValueError("提取结果无法解析为JSON")
+    
+    async def aextract(self, prompt: str) -> Dict[str, Any]:
+        """
+        异步提取画像信息
+        
+        Args:
+            prompt: 填充好的提取提示词
+        
+        Returns:
+            提取的信息
+        
+        Raises:
+            ValueError: 重试后仍无法解析时
+        """
+        messages = [HumanMessage(content=prompt)]
+        for attempt in range(self.max_retries + 1):
+            text = await self._aread(messages)
+            data = self._parse(text, attempt)
+            if data is not None:
+                return data
+            messages = self._retry_messages(prompt, text)
+        self._fail()
+        raise ValueError("提取结果无法解析为JSON")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取提取统计
+        
+        Returns:
+            包含调用次数、修复次数、重试次数和浪费调用比例的字典；
+            strict_wasted_rate为只用json.loads时的浪费比例，作为对照
+        """
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "calls": self.calls,
+                "repaired": self.repaired,
+                "retries": self.retries,
+                "wasted_calls": self.wasted,
+                "wasted_rate": self.wasted / self.calls if self.calls else 0.0,
+                "strict_wasted_rate": self.strict_failures / self.calls if self.calls else 0.0,
+                "failed_extractions": self.failed_extractions
+            }
+    
+    def _read(self, messages: List[Any]) -> str:
+        """
+        调用LLM并读取输出文本，流式模式下顶层对象闭合后停止读取
+        
+        Args:
+            messages: 消息列表
+        
+        Returns:
+            输出文本
+        """
+        if not self.stream:
+            return self._message_text(self.runnable.invoke(messages))
+        parser = IncrementalJSONParser()
+        for chunk in self.runnable.stream(messages):
+            if parser.feed(self._message_text(chunk)):
+                break
+        return parser.text
+    
+    async def _aread(self, messages: List[Any]) -> str:
+        """
+        异步调用LLM并读取输出文本
+        
+        Args:
+            messages: 消息列表
+        
+        Returns:
+            输出文本
+        """
+        if not self.stream:
+            return self._message_text(await self.runnable.ainvoke(messages))
+        parser = IncrementalJSONParser()
+        stream = self.runnable.astream(messages)
+        try:
+            async for chunk in stream:
+                if parser.feed(self._message_text(chunk)):
+                    break
+        finally:
+            await stream.aclose()
+        return parser.text
+    
+    def _message_text(self, message: Any) -> str:
+        """
+        取出消息或流式片段中的JSON文本，工具调用模式下为调用参数
+        
+        Args:
+            message: LLM返回的消息或片段
+        
+        Returns:
+            文本
+        """
+        if self.mode != "tool":
+            return message.content or ""
+        chunks = getattr(message, "tool_call_chunks", None)
+        if chunks:
+            return "".join(chunk.get("args") or "" for chunk in chunks)
+        calls = getattr(message, "tool_calls", None)
+        if calls:
+            return json.dumps(calls[0]["args"], ensure_ascii=False)
+        # 参数不是合法JSON时LangChain把原始文本放在invalid_tool_calls中
+        invalid = getattr(message, "invalid_tool_calls", None)
+        if invalid:
+            return invalid[0].get("args") or ""
+        return message.content or ""
+    
+    def _parse(self, text: str, attempt: int) -> Optional[Dict[str, Any]]:
+        """
+        解析一次调用的输出并记录统计
+        
+        Args:
+            text: 输出文本
+            attempt: 第几次尝试，从0开始
+        
+        Returns:
+            解析结果，失败时返回None
+        """
+        data, status = parse_json_object(text)
+        with self._lock:
+            self.calls += 1
+            if attempt > 0:
+                self.retries += 1
+            if status != "ok":
+                self.strict_failures += 1
+            if status == "repaired":
+                self.repaired += 1
+            elif status == "failed":
+                self.wasted += 1
+        return data
+    
+    def _fail(self) -> None:
+        """记录一次最终失败的提取"""
+        with self._lock:
+            self.failed_extractions += 1
+    
+    @staticmethod
+    def _retry_messages(prompt: str, text: str) -> List[Any]:
+        """
+        构造重试的消息：带上失败的输出，要求只返回JSON
+        
+        Args:
+            prompt: 提取提示词
+            text: 上次的输出
+        
+        Returns:
+            消息列表
+        """
+        return [HumanMessage(content=prompt), AIMessage(content=text), HumanMessage(content=RETRY_PROMPT)]
\ No newline at end of file
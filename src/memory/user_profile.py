@@ -2,95 +2,181 @@
 用户画像管理
 """
 
+import copy
 import json
-import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Hashable, Set, Tuple
+from .profile_store import ProfileStore
+
+# 默认画像结构
+DEFAULT_PROFILE = {
+    "personal_info": {},
+    "interests": [],
+    "preferences": {"likes": [], "dislikes": []},
+    "goals": [],
+    "experiences": [],
+    "relationships": [],
+    "habits": [],
+    "concerns": []
+}
 
 class UserProfile:
     """用户画像管理"""
     
-    def __init__(self, user_name: str, profile_file: str = None):
+    def __init__(self, user_name: str, profile_file: str = None, compact_every: int = 200):
         """
         初始化用户画像
         
         Args:
             user_name: 用户名
             profile_file: 画像文件路径，默认使用user_profile_<user_name>.json
+            compact_every: 变更日志累计多少条后压缩成快照
         """
         self.user_name = user_name
         self.profile_file = profile_file or f"user_profile_{user_name}.json"
+        self.store = ProfileStore(self.profile_file, compact_every=compact_every)
+        # 画像可能由后台提取线程更新，读写需加锁
+        self._lock = threading.RLock()
+        # 列表类画像项的去重索引
+        self._indexes: Dict[str, Set[Hashable]] = {}
+        # 画像每次变化时递增，供渲染缓存判断是否失效
+        self.version = 0
         self.profile = self._load_profile()
     
     def _load_profile(self) -> Dict[str, Any]:
         """
-        加载用户画像
+        加载用户画像：读取快照后重放变更日志
         
         Returns:
             用户画像字典
         """
-        if os.path.exists(self.profile_file):
-            with open(self.profile_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        
-        # 默认画像结构
-        return {
-            "personal_info": {},
-            "interests": [],
-            "preferences": {"likes": [], "dislikes": []},
-            "goals": [],
-            "experiences": [],
-            "relationships": [],
-            "habits": [],
-            "concerns": []
-        }
+        snapshot, records = self.store.load()
+        self.profile = snapshot if snapshot is not None else copy.deepcopy(DEFAULT_PROFILE)
+        self._rebuild_indexes()
+        for record in records:
+            self._apply(record)
+        self.version += 1
+        return self.profile
     
     def _save_profile(self) -> None:
         """
-        保存用户画像
+        保存用户画像：将完整画像压缩成快照
         """
-        with open(self.profile_file, 'w', encoding='utf-8') as f:
-            json.dump(self.profile, f, ensure_ascii=False, indent=2)
+        self.store.compact(self.profile)
     
     def update(self, extracted_info: Dict[str, Any]) -> None:
         """
-        更新用户画像
+        更新用户画像，只把实际发生的变更追加到日志
+        
+        Args:
+            extracted_info: 提取的用户信息
+        """
+        with self._lock:
+            delta = self._apply(extracted_info)
+            if not delta:
+                return
+            self.version += 1
+            if self.store.append(delta):
+                self._save_profile()
+    
+    def _apply(self, extracted_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将提取的信息合并进画像
         
         Args:
             extracted_info: 提取的用户信息
+        
+        Returns:
+            实际发生变更的部分
         """
+        delta = {}
         for category, value in extracted_info.items():
-            if category in self.profile:
-                if isinstance(self.profile[category], dict):
-                    # 更新字典类型的画像项
-                    self.profile[category].update(value)
-                elif isinstance(self.profile[category], list):
-                    # 更新列表类型的画像项
-                    if isinstance(value, list):
-                        for item in value:
-                            if item not in self.profile[category]:
-                                self.profile[category].append(item)
-                    else:
-                        if value not in self.profile[category]:
-                            self.profile[category].append(value)
+            if category not in self.profile:
+                continue
+            current = self.profile[category]
+            if isinstance(current, dict):
+                # 更新字典类型的画像项
+                if not isinstance(value, dict):
+                    continue
+                changed = {k: v for k, v in value.items() if k not in current or current[k] != v}
+                if changed:
+                    current.update(changed)
+                    delta[category] = changed
+            elif isinstance(current, list):
+                # 更新列表类型的画像项，通过集合索引O(1)去重
+                index = self._indexes[category]
+                added = []
+                for item in (value if isinstance(value, list) else [value]):
+                    key = self._item_key(item)
+                    if key not in index:
+                        index.add(key)
+                        current.append(item)
+                        added.append(item)
+                if added:
+                    delta[category] = added
+        return delta
+    
+    def _rebuild_indexes(self) -> None:
+        """
+        根据当前画像重建列表类画像项的去重索引
+        """
+        self._indexes = {
+            category: {self._item_key(item) for item in value}
+            for category, value in self.profile.items()
+            if isinstance(value, list)
+        }
+    
+    @staticmethod
+    def _item_key(item: Any) -> Hashable:
+        """
+        计算画像条目的去重键
+        
+        Args:
+            item: 画像条目
+        
+        Returns:
+            字符串条目本身，其他类型（如字典）使用规范化的JSON
+        """
+        if isinstance(item, str):
+            return item
+        return json.dumps(item, ensure_ascii=False, sort_keys=True)
+    
+    def snapshot(self) -> Tuple[int, Dict[str, Any]]:
+        """
+        获取画像的一致性副本
         
-        self._save_profile()
+        Returns:
+            (版本号, 画像副本)
+        """
+        with self._lock:
+            return self.version, copy.deepcopy(self.profile)
     
     def get_profile(self) -> Dict[str, Any]:
         """
         获取用户画像
         
         Returns:
-            用户画像字典
+            用户画像的副本，后台提取线程之后的更新不会影响调用方持有的结果
         """
-        return self.profile
+        with self._lock:
+            return copy.deepcopy(self.profile)
     
     def clear(self) -> None:
         """
         清除用户画像
         """
-        self.profile = self._load_profile()  # 重置为默认值
-        if os.path.exists(self.profile_file):
-            os.remove(self.profile_file)
+        with self._lock:
+            self.store.clear()
+            self._load_profile()  # 重置为默认值
+    
+    def close(self) -> None:
+        """
+        将未压缩的变更写入快照并关闭日志
+        """
+        with self._lock:
+            if self.store.pending_records:
+                self._save_profile()
+            self.store.close()
     
     def to_string(self) -> str:
         """
@@ -99,4 +185,5 @@ class UserProfile:
         Returns:
             用户画像字符串
         """
-        return json.dumps(self.profile, ensure_ascii=False, indent=2)
\ No newline at end of file
+        with self._lock:
+            return json.dumps(self.profile, ensure_ascii=False, indent=2)
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+长期记忆的向量存储后端
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from langchain.schema import Document
+
+# where条件支持的运算符
+WHERE_OPERATORS = ("$eq", "$in", "$gt", "$gte", "$lt", "$lte")
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    判断元数据是否满足where条件
+    
+    Args:
+        metadata: 文档元数据
+        where: 过滤条件
+    
+    Returns:
+        是否满足
+    """
+    for key, condition in (where or {}).items():
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                ok = value == operand
+            elif operator == "$in":
+                ok = value in operand
+            elif value is None:
+                ok = False
+            elif operator == "$gt":
+                ok = value > operand
+            elif operator == "$gte":
+                ok = value >= operand
+            elif operator == "$lt":
+                ok = value < operand
+            elif operator == "$lte":
+                ok = value <= operand
+            else:
+                raise ValueError(f"不支持的过滤运算符: {operator}")
+            if not ok:
+                return False
+    return True
+
+class VectorBackend(ABC):
+    """
+    向量存储后端接口
+    
+    嵌入由LongTermMemory统一计算（经过嵌入缓存）后传入，后端只负责存储向量、
+    文档和元数据，并按余弦相似度检索。
+    
+    where为元数据过滤条件，多个键之间为“且”的关系，值可以是等值条件或运算符字典：
+        {"user_name": "chenkx", "type": {"$in": ["conversation"]}, "ts": {"$gte": 1700000000}}
+    支持的运算符见WHERE_OPERATORS。
+    """
+    
+    @abstractmethod
+    def add(self, ids: List[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        """
+        写入文档
+        
+        Args:
+            ids: 文档ID
+            vectors: 文档向量
+            documents: 文档
+        """
+        pass
+    
+    @abstractmethod
+    def search(self, vector: List[float], k: int = 3,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+        检索最相似的文档
+        
+        Args:
+            vector: 查询向量
+            k: 返回条数
+            where: 元数据过滤条件
+        
+        Returns:
+            (文档, 余弦相似度)列表，按相似度从高到低排列
+        """
+        pass
+    
+    @abstractmethod
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """
+        删除文档
+        
+        Args:
+            ids: 要删除的文档ID
+            where: 要删除的文档需满足的元数据条件，ids和where都为空时不删除任何文档
+        """
+        pass
+    
+    @abstractmethod
+    def count(self, where: Optional[Dict[str, Any]] = None) -> int:
+        """
+        统计文档数
+        
+        Args:
+            where: 元数据过滤条件
+        
+        Returns:
+            文档数
+        """
+        pass
+    
+    @abstractmethod
+    def get(self, where: Optional[Dict[str, Any]] = None) -> Tuple[List[str], List[List[float]], List[Document]]:
+        """
+        读取满足条件的全部文档及其向量，供整理、归档等离线任务使用
+        
+        Args:
+            where: 元数据过滤条件
+        
+        Returns:
+            (文档ID列表, 向量列表, 文档列表)
+        """
+        pass
+    
+    @abstractmethod
+    def clear(self) -> None:
+        """删除全部文档"""
+        pass
+    
+    def compact(self) -> None:
+        """回收已删除文档占用的空间，默认不做任何事"""
+        pass
+    
+    def close(self) -> None:
+        """释放后端持有的资源"""
+        pass
+
+class ChromaVectorBackend(VectorBackend):
+    """基于Chroma的后端"""
+    
+    def __init__(self, collection_name: str, embeddings: Any,
+                 persist_directory: Optional[str] = None, client: Any = None):
+        """
+        初始化Chroma后端
+        
+        Args:
+            collection_name: 集合名称
+            embeddings: 嵌入模型，供LangChain的Chroma封装使用
+            persist_directory: 持久化目录，未传入client时使用
+            client: 共享的Chroma客户端
+        """
+        from langchain_community.vectorstores import Chroma
+        
+        if client is not None:
+            self.store = Chroma(
+                client=client,
+                collection_name=collection_name,
+                embedding_function=embeddings
+            )
+        else:
+            self.store = Chroma(
+                collection_name=collection_name,
+                embedding_function=embeddings,
+                persist_directory=persist_directory
+            )
+    
+    def add(self, ids: List[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        if not ids:
+            return
+        self.store._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            documents=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents]
+        )
+    
+    def search(self, vector: List[float], k: int = 3,
+               where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        results = self.store.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=self._where(where))
+        # Chroma默认返回L2距离的平方，对归一化向量有 cos = 1 - d / 2
+        return [(doc, 1.0 - distance / 2) for doc, distance in results]
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        if ids:
+            self.store._collection.delete(ids=ids)
+        elif where:
+            self.store._collection.delete(where=self._where(where))
+    
+    def count(self, where: Optional[Dict[str, Any]] = None) -> int:
+        if where:
+            return len(self.store.get(where=self._where(where), include=[])["ids"])
+        return self.store._collection.count()
+    
+    def get(self, where: Optional[Dict[str, Any]] = None) -> Tuple[List[str], List[List[float]], List[Document]]:
+        results = self.store._collection.get(
+            where=self._where(where),
+            include=["embeddings", "documents", "metadatas"]
+        )
+        documents = [
+            Document(page_content=content, metadata=metadata or {})
+            for content, metadata in zip(results["documents"], results["metadatas"])
+        ]
+        return list(results["ids"]), [list(vector) for vector in results["embeddings"]], documents
+    
+    def clear(self) -> None:
+        # 逐条删除而不是删除目录，客户端仍可继续使用
+        ids = self.store.get(include=[])["ids"]
+        if ids:
+            self.store._collection.delete(ids=ids)
+    
+    @staticmethod
+    def _where(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        转换为Chroma的where语法：每个条件一个子句，多个子句用$and连接
+        
+        Args:
+            where: 过滤条件
+        
+        Returns:
+            Chroma的where条件，无条件时为None
+        """
+        clauses = []
+        for key, condition in (where or {}).items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                clauses.append({key: {operator: operand}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
\ No newline at end of file
@@ -2,12 +2,31 @@
 提示词管理模块
 """
 
-from typing import Dict, Any
-from langchain.prompts import PromptTemplate, ChatPromptTemplate
+import threading
+from typing import Dict, Any, List, Tuple
+from langchain.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
 
 class PromptManager:
     """提示词管理类"""
     
+    # 编译为对话模板的模板及其消息布局，其余模板编译为普通文本模板。
+    # 布局中的每一项为(角色, 内容)：system角色的内容为同类别下的模板名称，placeholder为对话历史变量名，
+    # human为模板文本。稳定的部分（指令、画像快照、对话历史）在前，每轮变化的相关记忆和用户输入在后，
+    # 使相邻两轮请求共享尽可能长的前缀，命中服务端的上下文缓存。
+    CHAT_LAYOUTS = {
+        ("system", "memory_aware"): [
+            ("system", "memory_aware"),
+            ("system", "profile_snapshot"),
+            ("placeholder", "chat_history"),
+            ("system", "memory_context"),
+            ("human", "{input}")
+        ]
+    }
+    
+    # 各段都可以引用的变量。布局的首个模板若引用了其他段的其余变量（如沿用旧版单一模板，
+    # 在memory_aware中直接写{user_profile}、{relevant_memories}），则不再追加这些段，避免信息重复
+    SHARED_VARIABLES = {"user_name"}
+    
     def __init__(self):
         """初始化提示词模板"""
         self.templates = {
@@ -16,13 +35,18 @@ class PromptManager:
                 "memory_aware": """
 你是{user_name}的个人 AI 助手，具有长期记忆能力。
 
+请基于已知信息和相关历史记忆，提供个性化、贴心的回复。如果发现用户提到的新信息，自然地融入对话。
+                """,
+                "profile_snapshot": """
 关于{user_name}的已知信息：
 {user_profile}
+                """,
+                "memory_context": """
+与当前输入相关的其他已知信息：
+{profile_matches}
 
-相关历史记忆：
+与当前输入相关的历史记忆：
 {relevant_memories}
-
-请基于这些信息，提供个性化、贴心的回复。如果发现用户提到的新信息，自然地融入对话。
                 """
             },
             "extraction": {
@@ -42,11 +66,50 @@ class PromptManager:
 - habits: 生活习惯
 - concerns: 关注的问题
 
+只返回 JSON 格式，不要包含其他文字：
+                """,
+                "batch": """
+从以下多轮对话中提取关于{user_name}的重要信息，对话按轮次编号。
+
+对话内容：
+{conversation}
+
+请以 JSON 格式返回提取的信息：键为轮次编号，值为从该轮提取的信息，包括以下类别（如果有）：
+- personal_info: 个人基本信息（姓名、年龄、职业等）
+- interests: 兴趣爱好
+- preferences: 偏好（喜欢/不喜欢的事物）
+- goals: 目标和计划
+- experiences: 重要经历和事件
+- relationships: 人际关系
+- habits: 生活习惯
+- concerns: 关注的问题
+
+结合上下文理解每一轮（如代词、对前文的补充和更正），信息归到首次给出它的轮次，后面的更正归到更正的轮次。
+没有信息的轮次省略，例如：{{"1": {{"interests": ["跑步"]}}, "3": {{"goals": ["考研"]}}}}
+
 只返回 JSON 格式，不要包含其他文字：
                 """
+            },
+            "summary": {
+                "default": """
+请将以下新的对话内容合并进已有摘要，生成一段简洁的对话摘要，保留关于{user_name}的关键信息、未完成的话题和重要结论。
+
+已有摘要：
+{summary}
+
+新的对话内容：
+{conversation}
+
+只返回摘要内容，不要包含其他文字：
+                """
             }
         }
         
+        # 渲染结果和部分填充模板的缓存，键为(类别, 名称, 填充的变量)，模板变更时只清除该模板的条目
+        self._rendered = {}
+        self._partials = {}
+        self._cache_lock = threading.Lock()
+        
         # 编译后的提示词模板
         self.compiled_templates = self._compile_templates()
     
@@ -57,28 +120,117 @@ class PromptManager:
         Returns:
             编译后的提示词模板字典
         """
-        compiled = {
-            "system": {},
-            "extraction": {}
+        return {
+            category: {name: self._compile_template(category, name) for name in templates}
+            for category, templates in self.templates.items()
         }
+    
+    def _compile_template(self, category: str, template_name: str) -> Any:
+        """
+        编译单个提示词模板
+        
+        Args:
+            category: 模板类别
+            template_name: 模板名称
+            
+        Returns:
+            编译后的提示词模板
+        """
+        layout = self.CHAT_LAYOUTS.get((category, template_name))
+        if layout is None:
+            return PromptTemplate.from_template(self.templates[category][template_name])
+        
+        head = PromptTemplate.from_template(self.templates[category][layout[0][1]])
+        head_variables = set(head.input_variables) - self.SHARED_VARIABLES
         
-        # 编译系统提示词
-        compiled["system"]["default"] = PromptTemplate(
-            input_variables=["user_name"],
-            template=self.templates["system"]["default"]
-        )
+        messages = []
+        for index, (role, content) in enumerate(layout):
+            if role == "system" and index > 0:
+                segment = PromptTemplate.from_template(self.templates[category][content])
+                if head_variables & set(segment.input_variables):
+                    continue
+            if role == "placeholder":
+                messages.append(MessagesPlaceholder(variable_name=content))
+            elif role == "system":
+                messages.append(("system", self.templates[category][content]))
+            else:
+                messages.append((role, content))
+        return ChatPromptTemplate.from_messages(messages)
+    
+    def _dependents(self, category: str, template_name: str) -> List[Tuple[str, str]]:
+        """
+        获取受某个模板变更影响的模板，包括它自身和引用它的对话模板
         
-        compiled["system"]["memory_aware"] = ChatPromptTemplate.from_messages([
-            ("system", self.templates["system"]["memory_aware"])
-        ])
+        Args:
+            category: 模板类别
+            template_name: 模板名称
+            
+        Returns:
+            (类别, 名称)列表
+        """
+        keys = [(category, template_name)]
+        for key, layout in self.CHAT_LAYOUTS.items():
+            if key[0] == category and ("system", template_name) in layout and key not in keys:
+                keys.append(key)
+        return keys
+    
+    def _recompile(self, category: str, template_name: str) -> None:
+        """
+        只重新编译变更的模板和引用它的对话模板，并清除它们的渲染缓存
         
-        # 编译信息提取提示词
-        compiled["extraction"]["default"] = PromptTemplate(
-            input_variables=["conversation", "user_name"],
-            template=self.templates["extraction"]["default"]
-        )
+        Args:
+            category: 模板类别
+            template_name: 模板名称
+        """
+        affected = self._dependents(category, template_name)
+        compiled = {key: self._compile_template(*key) for key in affected}
+        with self._cache_lock:
+            for (key_category, key_name), template in compiled.items():
+                self.compiled_templates.setdefault(key_category, {})[key_name] = template
+            for cache in (self._rendered, self._partials):
+                for key in [key for key in cache if key[:2] in compiled]:
+                    del cache[key]
+    
+    def render(self, category: str, template_name: str = "default", **kwargs: Any) -> str:
+        """
+        渲染只依赖固定变量（如user_name）的模板，结果按变量值缓存，
+        同样的参数返回同一个字符串对象
         
-        return compiled
+        Args:
+            category: 模板类别
+            template_name: 模板名称
+            **kwargs: 模板变量
+            
+        Returns:
+            渲染后的文本
+        """
+        key = (category, template_name, tuple(sorted(kwargs.items())))
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = self.compiled_templates[category][template_name].format(**kwargs)
+            with self._cache_lock:
+                rendered = self._rendered.setdefault(key, rendered)
+        return rendered
+    
+    def get_partial(self, category: str, template_name: str = "default", **kwargs: Any) -> Any:
+        """
+        获取预先填充固定变量的模板，每轮只需填充其余变量；结果按变量值缓存
+        
+        Args:
+            category: 模板类别
+            template_name: 模板名称
+            **kwargs: 预先填充的模板变量
+            
+        Returns:
+            部分填充的提示词模板
+        """
+        key = (category, template_name, tuple(sorted(kwargs.items())))
+        partial = self._partials.get(key)
+        if partial is None:
+            partial = self.compiled_templates[category][template_name].partial(**kwargs)
+            with self._cache_lock:
+                partial = self._partials.setdefault(key, partial)
+        return partial
     
     def get_system_prompt(self, template_name: str = "default") -> Any:
         """
@@ -104,26 +256,38 @@ class PromptManager:
         """
         return self.compiled_templates["extraction"].get(template_name)
     
+    def get_summary_prompt(self, template_name: str = "default") -> Any:
+        """
+        获取对话摘要提示词模板
+        
+        Args:
+            template_name: 模板名称
+            
+        Returns:
+            对话摘要提示词模板
+        """
+        return self.compiled_templates["summary"].get(template_name)
+    
     def update_template(self, category: str, template_name: str, template: str) -> None:
         """
         更新提示词模板
         
         Args:
-            category: 模板类别（system/extraction）
+            category: 模板类别（system/extraction/summary）
             template_name: 模板名称
             template: 新的模板内容
         """
         if category in self.templates and template_name in self.templates[category]:
             self.templates[category][template_name] = template
-            # 重新编译模板
-            self.compiled_templates = self._compile_templates()
+            # 只重新编译变更的模板
+            self._recompile(category, template_name)
     
     def add_template(self, category: str, template_name: str, template: str) -> None:
         """
         添加新的提示词模板
         
         Args:
-            category: 模板类别（system/extraction）
+            category: 模板类别（system/extraction/summary）
             template_name: 模板名称
             template: 模板内容
         """
@@ -131,5 +295,5 @@ class PromptManager:
             self.templates[category] = {}
         
         self.templates[category][template_name] = template
-        # 重新编译模板
-        self.compiled_templates = self._compile_templates()
\ No newline at end of file
+        # 只编译新增的模板
+        self._recompile(category, template_name)
\ No newline at end of file
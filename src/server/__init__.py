@@ -0,0 +1,14 @@
+"""
+多用户服务包
+"""
+
+from .resources import SharedResources
+from .pool import AgentPool
+from .app import AgentServer, create_server
+
+__all__ = [
+    "SharedResources",
+    "AgentPool",
+    "AgentServer",
+    "create_server"
+]
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+多用户服务入口
+
+运行：
+    python -m src.server --agent memory --port 8000
+"""
+
+import argparse
+from .app import create_server
+
+def main():
+    """
+    主函数
+    """
+    parser = argparse.ArgumentParser(description="多用户Agent HTTP服务")
+    parser.add_argument("--agent", choices=["memory", "simple"], default="memory", help="Agent类型")
+    parser.add_argument("--host", default=None, help="监听地址")
+    parser.add_argument("--port", type=int, default=None, help="监听端口")
+    parser.add_argument("--max-agents", type=int, default=None, help="池中最多保留的Agent数")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Agent空闲淘汰时间（秒）")
+    args = parser.parse_args()
+    
+    server = create_server(
+        agent_type=args.agent,
+        host=args.host,
+        port=args.port,
+        max_agents=args.max_agents,
+        idle_timeout=args.idle_timeout
+    )
+    host, port = server.server_address[:2]
+    print(f"服务已启动: http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+多用户HTTP服务
+
+接口：
+    POST /chat         {"user": "...", "message": "..."} -> {"user": "...", "reply": "..."}
+    POST /chat/stream  同上，以SSE逐段返回 data: {"delta": "..."}，最后为 data: [DONE]
+    POST /clear        {"user": "..."} 清除该用户的记忆
+    GET  /profile?user=...
+    GET  /stats
+    GET  /health
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+from urllib.parse import parse_qs, urlparse
+from src.agents import BaseAgent, MemoryAgent, SimpleAgent
+from src.config import config
+from .pool import AgentPool
+from .resources import SharedResources
+
+# 用户名会拼进画像文件、Chroma目录和集合名、关键词索引等路径，只接受安全字符
+USER_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """把请求路由到对应用户的Agent"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    @property
+    def pool(self) -> AgentPool:
+        return self.server.agent_pool
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json({"status": "ok"})
+        elif url.path == "/stats":
+            self._send_json(self.pool.get_stats())
+        elif url.path == "/profile":
+            user_name = parse_qs(url.query).get("user", [""])[0]
+            if not user_name:
+                self._send_error(400, "缺少user参数")
+                return
+            if not USER_NAME_PATTERN.fullmatch(user_name):
+                self._send_error(400, "user只能包含字母、数字、下划线和短横线，最长64个字符")
+                return
+            try:
+                # 持有该用户的Agent时等待提取任务会阻塞他的对话请求，只做有上限的等待
+                with self.pool.acquire(user_name) as agent:
+                    profile = agent.get_profile(timeout=config.server_config["profile_flush_timeout"])
+            except Exception as e:
+                self._send_error(500, str(e))
+                return
+            self._send_json({"user": user_name, "profile": profile})
+        else:
+            self._send_error(404, "接口不存在")
+    
+    def do_POST(self):
+        path = urlparse(self.path).path
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_error(400, "请求体不是合法的JSON")
+            return
+        
+        user_name = body.get("user")
+        if not user_name:
+            self._send_error(400, "缺少user字段")
+            return
+        if not isinstance(user_name, str) or not USER_NAME_PATTERN.fullmatch(user_name):
+            self._send_error(400, "user只能包含字母、数字、下划线和短横线，最长64个字符")
+            return
+        
+        if path == "/clear":
+            try:
+                with self.pool.acquire(user_name) as agent:
+                    agent.clear_memory()
+            except Exception as e:
+                self._send_error(500, str(e))
+                return
+            self._send_json({"user": user_name, "status": "cleared"})
+            return
+        
+        if path not in ("/chat", "/chat/stream"):
+            self._send_error(404, "接口不存在")
+            return
+        
+        message = body.get("message")
+        if not message:
+            self._send_error(400, "缺少message字段")
+            return
+        
+        if path == "/chat":
+            try:
+                with self.pool.acquire(user_name) as agent:
+                    reply = agent.chat(message)
+            except Exception as e:
+                self._send_error(500, str(e))
+                return
+            self._send_json({"user": user_name, "reply": reply})
+        else:
+            self._send_stream(user_name, message)
+    
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("请求体必须是JSON对象")
+        return body
+    
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json({"error": message}, status)
+    
+    def _send_stream(self, user_name: str, message: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            with self.pool.acquire(user_name) as agent:
+                for chunk in agent.chat_stream(message):
+                    self._write_event({"delta": chunk})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            self._write_event({"error": str(e)})
+        try:
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+    
+    def _write_event(self, payload: Dict[str, Any]) -> None:
+        self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+class AgentServer(ThreadingHTTPServer):
+    """
+    多用户Agent服务：所有用户共享LLM、嵌入模型、Chroma客户端和线程池，
+    每个用户的对话状态由AgentPool按需创建和淘汰
+    """
+    
+    daemon_threads = True
+    request_queue_size = 1024
+    
+    def __init__(self, address: Tuple[str, int], agent_pool: AgentPool,
+                 resources: SharedResources):
+        """
+        初始化服务
+        
+        Args:
+            address: 监听地址
+            agent_pool: Agent池
+            resources: 共享资源
+        """
+        super().__init__(address, AgentRequestHandler)
+        self.agent_pool = agent_pool
+        self.resources = resources
+    
+    def start(self) -> threading.Thread:
+        """
+        在后台线程中运行服务
+        
+        Returns:
+            服务线程
+        """
+        thread = threading.Thread(target=self.serve_forever, name="agent-server", daemon=True)
+        thread.start()
+        return thread
+    
+    def server_close(self) -> None:
+        """关闭监听并落盘所有用户的数据"""
+        super().server_close()
+        self.agent_pool.close()
+        self.resources.close()
+
+def create_server(agent_type: str = "memory", host: str = None, port: int = None,
+                  max_agents: int = None, idle_timeout: float = None) -> AgentServer:
+    """
+    创建多用户服务
+    
+    Args:
+        agent_type: Agent类型，"memory"或"simple"
+        host: 监听地址，默认使用服务配置
+        port: 监听端口，默认使用服务配置，0表示自动分配
+        max_agents: 池中最多保留的Agent数，默认使用服务配置
+        idle_timeout: Agent空闲淘汰时间（秒），默认使用服务配置
+    
+    Returns:
+        服务实例
+    """
+    server_config = config.server_config
+    resources = SharedResources()
+    
+    def factory(user_name: str) -> BaseAgent:
+        if agent_type == "simple":
+            return SimpleAgent(user_name, llm=resources.llm)
+        return MemoryAgent(
+            user_name,
+            llm=resources.llm,
+            embeddings=resources.embeddings,
+            chroma_client=resources.chroma_client,
+            executor=resources.executor
+        )
+    
+    pool = AgentPool(
+        factory,
+        max_agents=max_agents or server_config["max_agents"],
+        idle_timeout=server_config["idle_timeout"] if idle_timeout is None else idle_timeout
+    )
+    address = (host or server_config["host"], server_config["port"] if port is None else port)
+    return AgentServer(address, pool, resources)
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+按用户复用Agent的LRU池
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from src.agents import BaseAgent
+
+class _PoolEntry:
+    """池中一个用户的Agent及其使用状态"""
+    
+    __slots__ = ("agent", "lock", "in_use", "last_used", "closed")
+    
+    def __init__(self):
+        self.agent: Optional[BaseAgent] = None
+        # 同一用户的请求串行执行，保证对话历史按顺序写入
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        # 被淘汰的Agent关闭完成后置位，同一用户的新Agent需等待它写完数据
+        self.closed = threading.Event()
+
+class AgentPool:
+    """
+    按用户名缓存Agent的LRU池
+    
+    用户首次请求时才创建Agent（从磁盘懒加载画像和记忆），超过容量或空闲超时的
+    Agent会被关闭并移出池，正在处理请求的Agent不会被淘汰。
+    """
+    
+    def __init__(self, factory: Callable[[str], BaseAgent], max_agents: int = 256,
+                 idle_timeout: Optional[float] = 600.0, reap_interval: Optional[float] = None):
+        """
+        初始化Agent池
+        
+        Args:
+            factory: 根据用户名创建Agent的函数
+            max_agents: 池中最多保留的Agent数
+            idle_timeout: 空闲多少秒后淘汰，None表示不按空闲时间淘汰
+            reap_interval: 后台清理空闲Agent的间隔（秒），默认取idle_timeout的一半
+        """
+        self.factory = factory
+        self.max_agents = max_agents
+        self.idle_timeout = idle_timeout
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._closing: Dict[str, _PoolEntry] = {}
+        self._lock = threading.Lock()
+        
+        # 统计
+        self.created = 0
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+        
+        self._stop_event = threading.Event()
+        self._reaper = None
+        if idle_timeout is not None:
+            interval = reap_interval or max(idle_timeout / 2, 1.0)
+            self._reaper = threading.Thread(
+                target=self._reap_loop,
+                args=(interval,),
+                name="agent-pool-reaper",
+                daemon=True
+            )
+            self._reaper.start()
+    
+    @contextmanager
+    def acquire(self, user_name: str) -> Iterator[BaseAgent]:
+        """
+        获取用户的Agent，同一用户的调用串行执行
+        
+        Args:
+            user_name: 用户名
+        
+        Yields:
+            该用户的Agent
+        """
+        with self._lock:
+            entry = self._entries.get(user_name)
+            if entry is None:
+                entry = _PoolEntry()
+                self._entries[user_name] = entry
+                self.misses += 1
+            else:
+                self._entries.move_to_end(user_name)
+                self.hits += 1
+            entry.in_use += 1
+            previous = self._closing.get(user_name)
+        
+        try:
+            with entry.lock:
+                if entry.agent is None:
+                    if previous is not None:
+                        previous.closed.wait()
+                    entry.agent = self.factory(user_name)
+                    with self._lock:
+                        self.created += 1
+                yield entry.agent
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                victims = self._pop_over_capacity()
+            self._close_entries(victims)
+    
+    def evict_idle(self) -> int:
+        """
+        淘汰空闲超时的Agent
+        
+        Returns:
+            淘汰的数量
+        """
+        if self.idle_timeout is None:
+            return 0
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            victims = [
+                (user_name, entry) for user_name, entry in self._entries.items()
+                if entry.in_use == 0 and entry.last_used <= deadline
+            ]
+            for user_name, entry in victims:
+                self._detach(user_name, entry)
+        self._close_entries(victims)
+        return len(victims)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取池的统计信息
+        
+        Returns:
+            包含当前Agent数、创建、淘汰和命中次数的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "active": len(self._entries),
+                "max_agents": self.max_agents,
+                "created": self.created,
+                "evicted": self.evicted,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+    
+    def close(self) -> None:
+        """
+        停止后台清理并关闭所有Agent
+        """
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5.0)
+        with self._lock:
+            victims = list(self._entries.items())
+            for user_name, entry in victims:
+                self._detach(user_name, entry)
+        self._close_entries(victims)
+    
+    def _pop_over_capacity(self) -> List[tuple]:
+        """
+        从最久未使用的一端移出超过容量的空闲Agent，调用方需持有池锁
+        
+        Returns:
+            被移出的(用户名, 条目)列表
+        """
+        victims = []
+        if len(self._entries) <= self.max_agents:
+            return victims
+        for user_name, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_agents:
+                break
+            if entry.in_use == 0:
+                self._detach(user_name, entry)
+                victims.append((user_name, entry))
+        return victims
+    
+    def _detach(self, user_name: str, entry: _PoolEntry) -> None:
+        """
+        将条目移出池并登记为关闭中，调用方需持有池锁
+        """
+        del self._entries[user_name]
+        self._closing[user_name] = entry
+        self.evicted += 1
+    
+    def _close_entries(self, victims: List[tuple]) -> None:
+        """
+        在池锁外关闭被淘汰的Agent，落盘缓冲的记忆和画像
+        
+        Args:
+            victims: (用户名, 条目)列表
+        """
+        for user_name, entry in victims:
+            try:
+                if entry.agent is not None:
+                    entry.agent.close()
+            except Exception as e:
+                print(f"关闭用户 {user_name} 的Agent失败: {str(e)}")
+            finally:
+                entry.closed.set()
+                with self._lock:
+                    if self._closing.get(user_name) is entry:
+                        del self._closing[user_name]
+    
+    def _reap_loop(self, interval: float) -> None:
+        """
+        后台定期淘汰空闲Agent
+        
+        Args:
+            interval: 清理间隔（秒）
+        """
+        while not self._stop_event.wait(interval):
+            self.evict_idle()
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+多用户共享资源
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from langchain_core.embeddings import Embeddings
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from src.config import config
+from src.memory import CachedEmbeddings
+from src.memory.chroma_client import get_shared_client
+
+class SharedResources:
+    """
+    所有用户共享的重量级资源：LLM客户端、嵌入模型、Chroma客户端和上下文线程池
+    
+    每个Agent单独创建这些对象时，连接池、缓存和线程都会随用户数线性增长；
+    集中创建后每个用户只保留自己的对话状态。各资源在首次使用时创建。
+    """
+    
+    def __init__(self, chroma_path: str = None, context_workers: int = None):
+        """
+        初始化共享资源
+        
+        Args:
+            chroma_path: Chroma持久化目录，默认使用服务配置
+            context_workers: 上下文收集线程池的线程数，默认使用服务配置
+        """
+        server_config = config.server_config
+        self.chroma_path = chroma_path or server_config["chroma_path"]
+        self.context_workers = context_workers or server_config["context_workers"]
+        self._lock = threading.Lock()
+        self._llm = None
+        self._embeddings = None
+        self._chroma_client = None
+        self._executor = None
+    
+    @property
+    def llm(self) -> ChatOpenAI:
+        """共享的LLM客户端"""
+        with self._lock:
+            if self._llm is None:
+                self._llm = ChatOpenAI(
+                    api_key=config.api_key,
+                    base_url=config.base_url,
+                    **config.llm_config
+                )
+            return self._llm
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        """共享的嵌入模型，带缓存"""
+        with self._lock:
+            if self._embeddings is None:
+                long_term = config.memory_config["long_term"]
+                model = config.embedding_config["model"]
+                self._embeddings = CachedEmbeddings(
+                    OpenAIEmbeddings(
+                        model=model,
+                        openai_api_key=config.api_key,
+                        openai_api_base=config.base_url
+                    ),
+                    model=model,
+                    cache_size=long_term["embedding_cache_size"],
+                    cache_path=long_term["embedding_cache_path"],
+                    max_disk_bytes=int(long_term["embedding_cache_max_disk_mb"] * 1024 * 1024)
+                )
+            return self._embeddings
+    
+    @property
+    def chroma_client(self) -> Any:
+        """共享的Chroma客户端，按长期记忆的存储布局使用独立集合或共享集合"""
+        with self._lock:
+            if self._chroma_client is None:
+                self._chroma_client = get_shared_client(self.chroma_path)
+            return self._chroma_client
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """共享的上下文收集线程池"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.context_workers,
+                    thread_name_prefix="context"
+                )
+            return self._executor
+    
+    def close(self) -> None:
+        """
+        关闭线程池，在所有Agent关闭后调用
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
\ No newline at end of file
@@ -0,0 +1,10 @@
+"""
+工具函数包
+"""
+
+from .cache import LRUCache
+from .lazy import lazy_exports
+from .text import tokenize
+from .usage import TokenUsageTracker, extract_token_usage
+
+__all__ = ["LRUCache", "lazy_exports", "tokenize", "TokenUsageTracker", "extract_token_usage"]
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+通用缓存工具
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class LRUCache:
+    """
+    线程安全的LRU缓存，可选按TTL过期，并统计命中率
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        初始化缓存
+        
+        Args:
+            maxsize: 最大条目数
+            ttl: 条目存活时间（秒），None表示不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # 每个值为 (写入时间, 值)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        获取缓存值
+        
+        Args:
+            key: 键
+            default: 未命中时的返回值
+        
+        Returns:
+            缓存值或default
+        """
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is not self._MISSING:
+                stored_at, value = item
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+    
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        写入缓存值，超出容量时淘汰最久未使用的条目
+        
+        Args:
+            key: 键
+            value: 值
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        删除并返回缓存值
+        
+        Args:
+            key: 键
+            default: 不存在时的返回值
+        
+        Returns:
+            缓存值或default
+        """
+        with self._lock:
+            item = self._data.pop(key, self._MISSING)
+            return default if item is self._MISSING else item[1]
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+        
+        Returns:
+            包含条目数、命中数、未命中数、淘汰数和命中率的字典
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+    
+    def __len__(self) -> int:
+        return len(self._data)
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+包导出的延迟导入
+"""
+
+import importlib
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+
+def lazy_exports(package: str, exports: Dict[str, str]) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    为包生成按需导入的__getattr__和__dir__，导出名第一次被访问时才导入所在模块
+    
+    Args:
+        package: 包名，传入__name__
+        exports: 导出名到模块名的映射，模块名可以是相对包的名称，如{"SimpleAgent": ".simple"}
+    
+    Returns:
+        (__getattr__, __dir__)
+    """
+    def __getattr__(name: str) -> Any:
+        module_name = exports.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name, package), name)
+        # 写回包的命名空间，之后的访问不再经过__getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+    
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+    
+    return __getattr__, __dir__
\ No newline at end of file
@@ -0,0 +1,334 @@
+"""
+LLM响应缓存
+
+测试、回放的会话和内容相同的对话提取会反复发出完全相同的请求。缓存以LangChain的BaseCache实现，
+通过cache参数挂到模型上：LangChain在调用前把消息和模型参数（模型名、temperature、绑定的
+response_format/tools等）序列化，这里对两者规范化后取哈希作为键，先查进程内LRU缓存，再查SQLite缓存。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from src.config import config
+from .cache import LRUCache
+
+# 缓存策略：extraction只缓存记忆提取调用；deterministic另外缓存temperature为0的对话调用；
+# all缓存所有调用（测试和回放会话），temperature大于0的对话回复也会被复用
+POLICIES = ("extraction", "deterministic", "all")
+
+def cache_allowed(policy: str, purpose: str, temperature: Optional[float]) -> bool:
+    """
+    判断某类调用是否使用缓存
+    
+    Args:
+        policy: 缓存策略
+        purpose: 调用用途，extraction或chat
+        temperature: 模型的temperature，只有明确为0时才视为确定性输出（None表示使用接口默认值，通常大于0）
+    
+    Returns:
+        是否使用缓存
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"不支持的缓存策略: {policy}")
+    if policy == "all" or purpose == "extraction":
+        return True
+    return policy == "deterministic" and temperature == 0
+
+class ResponseCache(BaseCache):
+    """
+    两级LLM响应缓存，磁盘缓存超出容量时淘汰最久未访问的条目
+    """
+    
+    def __init__(self, cache_size: int = 256, cache_path: Optional[str] = None,
+                 max_disk_bytes: int = 64 * 1024 * 1024):
+        """
+        初始化响应缓存
+        
+        Args:
+            cache_size: 进程内缓存的最大条目数
+            cache_path: SQLite缓存文件路径，None表示只使用进程内缓存
+            max_disk_bytes: 磁盘缓存中响应的最大总字节数
+        """
+        self.memory_cache = LRUCache(maxsize=cache_size)
+        self.max_disk_bytes = max_disk_bytes
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._disk_bytes = 0
+        if cache_path:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._db.commit()
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        """
+        查询缓存的响应
+        
+        Args:
+            prompt: LangChain序列化后的消息
+            llm_string: LangChain序列化后的模型参数
+        
+        Returns:
+            缓存的生成结果，未命中时返回None
+        """
+        key = self._key(prompt, llm_string)
+        value = self.memory_cache.get(key)
+        if value is not None:
+            with self._stats_lock:
+                self.memory_hits += 1
+            return self._loads(value)
+        
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+            if row is not None:
+                self.memory_cache.set(key, row[0])
+                with self._stats_lock:
+                    self.disk_hits += 1
+                return self._loads(row[0])
+        
+        with self._stats_lock:
+            self.misses += 1
+        return None
+    
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        """
+        写入响应
+        
+        Args:
+            prompt: LangChain序列化后的消息
+            llm_string: LangChain序列化后的模型参数
+            return_val: 生成结果
+        """
+        key = self._key(prompt, llm_string)
+        value = self._dumps(return_val)
+        self.memory_cache.set(key, value)
+        with self._stats_lock:
+            self.writes += 1
+        
+        if self._db is None:
+            return
+        size = len(value.encode("utf-8"))
+        if size > self.max_disk_bytes:
+            return
+        with self._db_lock:
+            row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._disk_bytes += size - (row[0] if row else 0)
+            evicted = self._evict()
+            self._db.commit()
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+    
+    def clear(self, **kwargs: Any) -> None:
+        """
+        清空两级缓存
+        """
+        self.memory_cache.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+        
+        Returns:
+            包含内存命中、磁盘命中、未命中次数、命中率和磁盘占用的字典
+        """
+        with self._stats_lock:
+            total = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0,
+                "writes": self.writes,
+                "memory_entries": len(self.memory_cache),
+                "disk_bytes": self._disk_bytes,
+                "disk_evictions": self.evictions
+            }
+    
+    def close(self) -> None:
+        """
+        关闭磁盘缓存
+        """
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+    
+    def _evict(self) -> int:
+        """
+        淘汰最久未访问的条目，直到总大小降到上限的90%，调用方需持有数据库锁
+        
+        Returns:
+            淘汰的条目数
+        """
+        if self._disk_bytes <= self.max_disk_bytes:
+            return 0
+        target = self._disk_bytes - int(self.max_disk_bytes * 0.9)
+        keys = []
+        freed = 0
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            keys.append(key)
+            freed += size
+            if freed >= target:
+                break
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            self._db.execute(f"DELETE FROM responses WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+        self._disk_bytes -= freed
+        return len(keys)
+    
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        """
+        计算缓存键，可解析为JSON的部分按键排序后再哈希，与字段顺序无关
+        
+        Args:
+            prompt: 序列化后的消息
+            llm_string: 序列化后的模型参数
+        
+        Returns:
+            哈希键
+        """
+        parts = []
+        for text in (llm_string, prompt):
+            try:
+                text = json.dumps(json.loads(text), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+            except ValueError:
+                pass
+            parts.append(text)
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _dumps(generations: Sequence[Generation]) -> str:
+        """
+        序列化生成结果，去掉token用量，命中缓存的调用不计入用量统计
+        
+        Args:
+            generations: 生成结果
+        
+        Returns:
+            JSON文本
+        """
+        items = []
+        for generation in generations:
+            if isinstance(generation, ChatGeneration):
+                message = message_to_dict(generation.message)
+                data = message["data"]
+                if data.get("usage_metadata") is not None:
+                    data["usage_metadata"] = None
+                metadata = dict(data.get("response_metadata") or {})
+                metadata.pop("token_usage", None)
+                metadata.pop("usage", None)
+                data["response_metadata"] = metadata
+                items.append({"message": message, "info": generation.generation_info})
+            else:
+                items.append({"text": generation.text, "info": generation.generation_info})
+        return json.dumps(items, ensure_ascii=False)
+    
+    @staticmethod
+    def _loads(value: str) -> List[Generation]:
+        """
+        反序列化生成结果，每次命中都返回新对象
+        
+        Args:
+            value: JSON文本
+        
+        Returns:
+            生成结果
+        """
+        generations = []
+        for item in json.loads(value):
+            if "message" in item:
+                message = messages_from_dict([item["message"]])[0]
+                generations.append(ChatGeneration(message=message, generation_info=item["info"]))
+            else:
+                generations.append(Generation(text=item["text"], generation_info=item["info"]))
+        return generations
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取进程内共享的响应缓存
+    
+    Returns:
+        响应缓存，配置中未启用时返回None
+    """
+    global _shared_cache
+    cache_config = config.llm_cache_config
+    if not cache_config["enabled"]:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                cache_size=cache_config["memory_size"],
+                cache_path=cache_config["path"],
+                max_disk_bytes=int(cache_config["max_disk_mb"] * 1024 * 1024)
+            )
+        return _shared_cache
+
+def with_response_cache(llm: Any, purpose: str) -> Any:
+    """
+    按缓存策略返回挂载了响应缓存的模型副本，副本与原模型共享HTTP客户端
+    
+    Args:
+        llm: LLM客户端
+        purpose: 调用用途，extraction或chat
+    
+    Returns:
+        挂载了缓存的副本；未启用缓存或策略不允许时返回原模型
+    """
+    cache = get_response_cache()
+    if cache is None or llm is None or uses_response_cache(llm):
+        return llm
+    if not cache_allowed(config.llm_cache_config["policy"], purpose, getattr(llm, "temperature", None)):
+        return llm
+    return llm.model_copy(update={"cache": cache})
+
+def uses_response_cache(llm: Any) -> bool:
+    """
+    模型是否挂载了响应缓存
+    
+    Args:
+        llm: LLM客户端
+    
+    Returns:
+        是否挂载
+    """
+    return isinstance(getattr(llm, "cache", None), ResponseCache)
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+文本处理工具
+"""
+
+import re
+from typing import List
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CJK_PATTERN = re.compile(r"[\u2e80-\u9fff\uf900-\ufaff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为检索用的词项
+    
+    英文和数字按单词切分并转小写；中日韩文本没有空格分词，
+    按相邻两字（字符bigram）切分，单字的片段保留单字。
+    
+    Args:
+        text: 文本
+    
+    Returns:
+        词项列表（可能重复）
+    """
+    if not text:
+        return []
+    text = text.lower()
+    terms = _WORD_PATTERN.findall(text)
+    for segment in _CJK_PATTERN.findall(text):
+        if len(segment) == 1:
+            terms.append(segment)
+        else:
+            terms.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return terms
\ No newline at end of file
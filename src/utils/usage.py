@@ -0,0 +1,105 @@
+"""
+LLM调用的token用量统计
+"""
+
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+def extract_token_usage(message: Any) -> Optional[Dict[str, int]]:
+    """
+    从LLM回复中读取token用量，兼容DeepSeek的prompt_cache_hit_tokens字段
+    和OpenAI的prompt_tokens_details.cached_tokens字段
+    
+    Args:
+        message: LLM返回的消息或流式片段
+    
+    Returns:
+        包含prompt_tokens、completion_tokens和cache_hit_tokens的字典，回复中没有用量信息时返回None
+    """
+    metadata = getattr(message, "response_metadata", None) or {}
+    raw = metadata.get("token_usage") or metadata.get("usage") or {}
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+    if not raw and not usage_metadata:
+        return None
+    
+    prompt_tokens = raw.get("prompt_tokens", usage_metadata.get("input_tokens", 0))
+    completion_tokens = raw.get("completion_tokens", usage_metadata.get("output_tokens", 0))
+    cache_hit_tokens = raw.get("prompt_cache_hit_tokens")
+    if cache_hit_tokens is None:
+        cache_hit_tokens = (raw.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cache_hit_tokens is None:
+        cache_hit_tokens = (usage_metadata.get("input_token_details") or {}).get("cache_read", 0)
+    return {
+        "prompt_tokens": prompt_tokens or 0,
+        "completion_tokens": completion_tokens or 0,
+        "cache_hit_tokens": cache_hit_tokens or 0
+    }
+
+class TokenUsageTracker:
+    """
+    累计每轮对话的token用量和服务端上下文缓存命中的token数
+    """
+    
+    def __init__(self, history_size: int = 100):
+        """
+        初始化统计
+        
+        Args:
+            history_size: 保留的最近几轮用量记录数
+        """
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit_tokens = 0
+    
+    def record(self, message: Any) -> Optional[Dict[str, int]]:
+        """
+        记录一轮对话的用量
+        
+        Args:
+            message: LLM返回的消息，流式调用时传入带用量信息的最后一个片段
+        
+        Returns:
+            本轮用量，回复中没有用量信息时返回None且不计入统计
+        """
+        usage = extract_token_usage(message)
+        if usage is None:
+            return None
+        with self._lock:
+            self.turns += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage["completion_tokens"]
+            self.cache_hit_tokens += usage["cache_hit_tokens"]
+            self._history.append(usage)
+        return usage
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取用量统计
+        
+        Returns:
+            包含累计token数、缓存命中率和最近一轮用量的字典
+        """
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "prompt_cache_hit_tokens": self.cache_hit_tokens,
+                "prompt_cache_miss_tokens": self.prompt_tokens - self.cache_hit_tokens,
+                "cache_hit_rate": self.cache_hit_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+                "last": self._history[-1] if self._history else None
+            }
+    
+    def get_history(self) -> List[Dict[str, int]]:
+        """
+        获取最近几轮的用量记录
+        
+        Returns:
+            用量记录列表，从旧到新
+        """
+        with self._lock:
+            return list(self._history)
\ No newline at end of file